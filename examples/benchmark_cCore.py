@@ -18,6 +18,7 @@ def main():
 	wave = machine.AddCircuit(type='waver',name='wave', amp=1, freq=1, pushed=True )
 	#adder= machine.AddCircuit(type='myCirc',name='add_0', pushed=True)
 	adder= machine.AddCircuit(type='myCirc',name='add_0', pushed=True)
+	#adder= machine.AddCircuit(type='myBlockCirc',name='add_0', block=1000, pushed=True)
 #	adder= machine.AddCircuit(type='myCirc',name='add_1', pushed=True)
 #	adder= machine.AddCircuit(type='myCirc',name='add_2', pushed=True)
 #	adder= machine.AddCircuit(type='myCirc',name='add_3', pushed=True)
@@ -40,6 +41,7 @@ def main():
 	
 	#machine.Wait(100000.0)	#10^7 steps	- 1.414s -	TPS = 7072135.785 -	PURE cCORE
 	#machine.Wait(10000.0)	#10^6 steps	- 3.222s -	TPS = 310366.232 -	cCORE + 1 PYCircuit
+	#machine.Wait(10000.0)	#10^6 steps	- 0.206s -	TPS = 4852700.0 -	cCORE + 1 BlockPYCircuit (block=1000)
 	#machine.WaitPY(1000.0)	#10^5 steps	- 8.265s -	TPS = 12099.2130 -	PURE PY
 
 	print(datetime.now()-startTime)
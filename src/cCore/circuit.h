@@ -24,9 +24,11 @@ struct circuit {
 
     int iplen;      //number of integer parameters
     int *iparams;   //array of integer parameters
+    int packed;     //1 if params and iparams live in the engine arena
 
     int vplen;      //number of whatever parameters
     void **vpparams;//array of whatever parameters lol
+    int *vpsizes;   //bytes of internal state pointed by each vpparams, 0 if not owned
     
     
     // for containers
@@ -44,27 +46,156 @@ struct circuit {
     int init;       //index of init function
     
     int pushed;     //0 is false, 1 is true
+    int every;      //updated once every this many steps, 1 for every step
 
 };
 //*********************************************************************
 
 
-extern double* GlobalSignals;
-extern double* GlobalBuffers;
-extern int GlobalChannelCounter;
+// DEFINITION OF SCHEDULE *********************************************
+typedef struct task task;
+typedef struct blockplan blockplan;
+typedef struct ensembleplan ensembleplan;
 
-extern circuit* circuits;
-extern int GlobalCircuitCounter;
+#define TASK_NONE 0     //no channel copy
+#define TASK_PUSH 1     //signal[i] = buffer[i]
+#define TASK_RELAY 2    //signal[o] = buffer[o] = signal[i] for (i,o) pairs
+#define TASK_RELAYOUT 3 //buffer[o] = signal[i] for (i,o) pairs
+#define TASK_TIME 4     //signal[i] and buffer[i] increase by dt
+#define TASK_CAPTURE 5  //block data[o+step in block] = signal[i] for (i,o) pairs
+
+///One entry of the flattened update sequence of an engine.
+struct task {
+    
+    circuit *c;     //circuit to update, NULL if none
+    int type;       //channel copies done after the update
+    int n;          //number of channel indexes
+    int *idx;       //channel indexes for the copies
+    int every;      //the circuit is updated once every this many steps
+    
+};
+//*********************************************************************
+
+// DEFINITION OF WAIT CONDITIONS *************************************
+typedef struct condition condition;
+
+#define COND_LT 0       //x < threshold
+#define COND_LE 1       //x <= threshold
+#define COND_GT 2       //x > threshold
+#define COND_GE 3       //x >= threshold
+#define COND_ABSLT 4    //|x| < threshold
+#define COND_ABSGT 5    //|x| > threshold
+#define COND_DELTALT 6  //|x - previous x| < threshold
+
+///Condition on a channel checked at every step by UpdateUntil.
+struct condition {
+    
+    int cindex, chindex, isInput; //channel to check
+    int op;             //one of the COND_ operators
+    double threshold;
+    int hold;           //steps the condition has to be true in a row
+    int *count;         //steps it has been true so far, for each replica
+    double *last;       //value at the previous step, for each replica
+    
+};
+//*********************************************************************
+
+// DEFINITION OF ENGINE ***********************************************
+typedef struct engine engine;
+
+///State of one independent simulation.
+///Each main machine owns one engine, so several setups can live in
+///the same process and be updated from different threads.
+struct engine {
+
+    double timestep;    //simulation timestep
+    unsigned long long int step; //steps done by the engine, for the circuits with a lower rate
+    unsigned long long int seed; //key of the random streams of the circuits
+    int random;         //1 if some circuit draws random numbers
+
+    double *signals;    //array containing all signals I and O
+    double *buffers;    //array containing all buffered I and O values
+    int nchannels;      //total number of channels
+    int stride;         //distance between consecutive channels in signals and buffers, the number of replicas sharing them
+    int channelcap;     //allocated size of signals and buffers
+    int pinned;         //1 while python views signals and buffers, no channels can be added
+
+    circuit *circuitlist; //list of circuits
+    int ncircuits;      //total number of circuits
+    int circuitcap;     //allocated size of circuitlist
+
+    int errors;         //number of errors while building the setup
+
+    int nreplicas;      //number of replicas updated together with this engine
+    engine **replicas;  //list of replicas, the first is the engine itself
+    int replica;        //index of this engine in the replicas list
+
+    int rebuild;        //index of the circuit to rebuild in place, -1 if none
+
+    task *schedule;     //flattened update sequence of the main container
+    int ntasks;         //number of tasks in the schedule
+    int *taskdata;      //channel indexes used by the tasks
+    int compiled;       //1 if the schedule is up to date with the setup
+    int *pushlist;      //channels to push at the end of each step
+    int npush;          //number of channels in pushlist
+    int blocksize;      //steps in a block of the feed-forward region, 0 to run everything step by step
+    blockplan *block;   //feed-forward region run in blocks, NULL if none
+    ensembleplan *ensemble; //lockstep update of the replicas, NULL if they are updated one by one
+    double *paramarena; //params of all circuits, packed in update order
+    int *iparamarena;   //iparams of all circuits, packed in update order
+
+    condition *conditions; //conditions checked by UpdateUntil
+    int nconditions;    //number of conditions
+
+    volatile unsigned long long int progress; //steps done by RunSteps since ResetRun
+    volatile int cancel;    //set to 1 from another thread to stop RunSteps
+
+    void (*runner)(void);   //runs one step of the schedule, chosen by CompileEngine
+    void (*native)(engine*); //generated step function for the compiled schedule, if any
+    int profiling;          //1 if the steps are timed
+    int proflen;            //size of the profiling arrays
+    double *proftime;       //ns spent in each circuit
+    unsigned long long int *profcalls; //number of updates of each circuit
+    double profrelays;      //ns spent in container relays
+    double profpush;        //ns spent pushing channels at the end of the step
+
+};
+//*********************************************************************
+
+///engine used by the calling thread, selected with UseEngine
+extern __thread engine *cEngine __attribute__((tls_model("initial-exec")));
+
+//the old global names now refer to the current engine
+#define GlobalSignals (cEngine->signals)
+#define GlobalBuffers (cEngine->buffers)
+#define GlobalChannelCounter (cEngine->nchannels)
+#define circuits (cEngine->circuitlist)
+#define GlobalCircuitCounter (cEngine->ncircuits)
+#define dt (cEngine->timestep)
+#define errorflag (cEngine->errors)
 
 extern void (**ufunctions)(circuit*);
 extern char **pynames;
 
-extern double dt;
-extern int errorflag;
-
 int AddToCircuits(circuit c, int containerindex);
 int GetCircuitIndex(char* type);
 circuit NewCircuit(void);
+void SetStateBuffer(circuit *c, int i, int bytes);
+#define STATE_VALUE -1  //SetStateBuffer size for vpparams holding a value instead of a pointer
+#define FEED_NONE 0     //write modes of ChannelFeeds: read only channel,
+#define FEED_BUFFER 1   //write the buffer only,
+#define FEED_BOTH 2     //write the buffer and the signal
+int Compile(void);
+void CompileEngine(void);
+void PackParameters(void);
+void ClearConditions_engine(engine *e);
+void RunSchedule(void);
+void RunScheduleProfiled(void);
+void RunNative(void);
+void RunBlockSchedule(void);
+void PlanBlocks(void);
+void FlushBlock(void);
+void FreeBlockPlan(engine *e);
 
 
 #endif
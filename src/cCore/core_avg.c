@@ -19,7 +19,7 @@ int Add_avg(int owner, int nsteps, int moving) {
     c.nO = 1;
 
 	c.iplen = 3;
-	c.iparams = (int*)calloc(c.plen,sizeof(double));
+	c.iparams = (int*)calloc(c.iplen,sizeof(int));
 	
 	c.iparams[0] = nsteps; 
 	c.iparams[1] = 0; //counter
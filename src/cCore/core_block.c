@@ -0,0 +1,502 @@
+/**********************************************************
+Feed-forward regions.
+Circuits that are not part of a feedback loop, and whose
+outputs are only read by other such circuits, like the
+filters, maths and outputs that process the signals of the
+oscillating loop, do not need to be updated together with
+the rest of the setup. The schedule only captures the values
+they read at each step, and every block of steps they are
+updated one after the other over the whole block, with one
+tight loop per circuit. The results are the same as the step
+by step update.
+*********************************************************/
+#include <stdlib.h>
+#include <string.h>
+
+#ifndef CIRCUIT
+#include "circuit.h"
+#endif
+
+#ifndef COREBLOCK
+#include "core_block.h"
+#endif
+
+#ifndef COREMATHS
+#include "core_maths.h"
+#endif
+
+#ifndef COREFILTERS
+#include "core_filters.h"
+#endif
+
+#ifndef COREOUTPUT
+#include "core_output.h"
+#endif
+
+#ifndef CORESIGNALS
+#include "core_signals.h"
+#endif
+
+
+///circuits with a block update
+static struct { void (*f)(circuit*); blockfunc bf; } blockfuncs[] = {
+	{opADD, opADD_block}, {opSUB, opSUB_block}, {opMUL, opMUL_block},
+	{opDIV, opDIV_block}, {opABS, opABS_block}, {opPOW, opPOW_block},
+	{opLINC, opLINC_block}, {opSIN, opSIN_block}, {opCOS, opCOS_block},
+	{SKLP, SKLP_block}, {SKHP, SKHP_block}, {RCLP, RCLP_block}, {RCHP, RCHP_block},
+	{noise, noise_block},
+	{NULL, NULL}
+};
+
+blockfunc BlockFunction(circuit *c) {
+
+	for (int i = 0; blockfuncs[i].f != NULL; i++)
+		if(blockfuncs[i].f == c->updatef)
+			return blockfuncs[i].bf;
+	return NULL;
+}
+
+/*********************************************************
+ * Sets the number of steps in a block of the feed-forward
+ * region for the current engine and its replicas, 0 to
+ * update all circuits step by step. Python callable.
+ * ******************************************************/
+int SetBlockSize(int n) {
+
+	engine *e = cEngine;
+
+	if(n < 0) n = 0;
+	for (int r = 0; r < e->nreplicas; r++) {
+		e->replicas[r]->blocksize = n;
+		e->replicas[r]->compiled = 0;
+	}
+
+	return 0;
+}
+
+void FreeBlockPlan(engine *e) {
+
+	blockplan *b = e->block;
+	if(b == NULL) return;
+
+	free(b->tasks);
+	free(b->data);
+	free(b->vecch);
+	free(b->vecpush);
+	free(b->capdata);
+	free(b->ptrs);
+	free(b->chs);
+	free(b->saved);
+	free(b);
+	e->block = NULL;
+}
+
+/*********************************************************
+ * Internal function. Marks the circuits that are part of a
+ * feedback loop: strongly connected components of the graph
+ * of circuits with more than one circuit, or circuits that
+ * read their own outputs. The graph is followed from each
+ * circuit to the writers of the channels it reads
+ * (reads[rstart[i]] to reads[rstart[i+1]]), without
+ * recursion.
+ * ******************************************************/
+void MarkCycles(int *rstart, int *reads, int *writer, char *cyclic) {
+
+	int n = GlobalCircuitCounter;
+	int *index = (int*)malloc((n+1)*sizeof(int));
+	int *low = (int*)malloc((n+1)*sizeof(int));
+	int *stack = (int*)malloc((n+1)*sizeof(int));
+	int *cstack = (int*)malloc((n+1)*sizeof(int));
+	int *cedge = (int*)malloc((n+1)*sizeof(int));
+	char *onstack = (char*)calloc(n+1, sizeof(char));
+	int counter = 0, sp = 0, csp = 0, v, w;
+
+	for (int i = 0; i < n; i++) index[i] = -1;
+
+	for (int root = 0; root < n; root++) {
+
+		if(index[root] >= 0 || circuits[root].isContainer == 1) continue;
+
+		index[root] = low[root] = counter++;
+		stack[sp++] = root; onstack[root] = 1;
+		cstack[csp] = root; cedge[csp] = rstart[root]; csp++;
+
+		while(csp > 0) {
+
+			v = cstack[csp-1];
+
+			//next channel read by v
+			if(cedge[csp-1] < rstart[v+1]) {
+				w = writer[reads[cedge[csp-1]++]];
+				if(w < 0) continue;
+				if(w == v) cyclic[v] = 1;
+
+				if(index[w] < 0) {
+					index[w] = low[w] = counter++;
+					stack[sp++] = w; onstack[w] = 1;
+					cstack[csp] = w; cedge[csp] = rstart[w]; csp++;
+				}
+				else if(onstack[w] && index[w] < low[v])
+					low[v] = index[w];
+				continue;
+			}
+
+			//all done, go back to the caller
+			csp--;
+			if(csp > 0 && low[v] < low[cstack[csp-1]])
+				low[cstack[csp-1]] = low[v];
+
+			if(low[v] == index[v]) {
+				int top = sp;
+				do {
+					w = stack[--sp];
+					onstack[w] = 0;
+				} while(w != v);
+				if(top-sp > 1)
+					for (int k = sp; k < top; k++)
+						cyclic[stack[k]] = 1;
+			}
+		}
+	}
+
+	free(index); free(low); free(stack);
+	free(cstack); free(cedge); free(onstack);
+}
+
+/*********************************************************
+ * Internal function. Puts the circuits of the region in
+ * order, each one after the region circuits it reads,
+ * starting from those updated first by the schedule.
+ * Returns the number of circuits in order.
+ * ******************************************************/
+int RegionOrder(int *rstart, int *reads, int *writer, char *inregion, int *pos, int *order) {
+
+	int n = GlobalCircuitCounter;
+	int *cstack = (int*)malloc((n+1)*sizeof(int));
+	int *cedge = (int*)malloc((n+1)*sizeof(int));
+	char *seen = (char*)calloc(n+1, sizeof(char));
+	int norder = 0, csp, v, w;
+
+	for (int t = 0; t < cEngine->ntasks; t++) {
+
+		circuit *c = cEngine->schedule[t].c;
+		if(c == NULL) continue;
+		int root = c - circuits;
+		if(inregion[root] == 0 || seen[root] == 1) continue;
+
+		seen[root] = 1;
+		csp = 0;
+		cstack[csp] = root; cedge[csp] = rstart[root]; csp++;
+
+		while(csp > 0) {
+
+			v = cstack[csp-1];
+			if(cedge[csp-1] < rstart[v+1]) {
+				w = writer[reads[cedge[csp-1]++]];
+				if(w >= 0 && inregion[w] == 1 && seen[w] == 0) {
+					seen[w] = 1;
+					cstack[csp] = w; cedge[csp] = rstart[w]; csp++;
+				}
+				continue;
+			}
+			order[norder++] = v;
+			csp--;
+		}
+	}
+
+	free(cstack); free(cedge); free(seen);
+	return norder;
+}
+
+/*********************************************************
+ * Finds the feed-forward region of the current engine and
+ * takes it out of the compiled schedule. Its circuits are
+ * replaced by tasks that capture the values they read from
+ * the rest of the setup. Called by CompileEngine, after the
+ * push list is done.
+ * ******************************************************/
+void PlanBlocks(void) {
+
+	FreeBlockPlan(cEngine);
+	//replicas sharing the signals are updated in lockstep instead
+	if(cEngine->blocksize <= 0 || cEngine->profiling == 1 || cEngine->stride > 1)
+		return;
+
+	int n = GlobalCircuitCounter, nch = GlobalChannelCounter;
+	int S = cEngine->blocksize+1; //length of the value vectors
+	circuit *c;
+
+	//position in the schedule and push of each circuit
+	int *pos = (int*)malloc((n+1)*sizeof(int));
+	char *pushed = (char*)calloc(n+1, sizeof(char));
+	for (int i = 0; i < n; i++) pos[i] = -1;
+	for (int t = 0; t < cEngine->ntasks; t++) {
+		c = cEngine->schedule[t].c;
+		if(c == NULL) continue;
+		pos[c - circuits] = t;
+		pushed[c - circuits] = (cEngine->schedule[t].type == TASK_PUSH);
+	}
+
+	//writer of each channel and channels read by each circuit
+	int *writer = (int*)malloc((nch+1)*sizeof(int));
+	int *rstart = (int*)calloc(n+2, sizeof(int));
+	for (int i = 0; i < nch; i++) writer[i] = -1;
+	for (int i = 0; i < n; i++) {
+		c = &(circuits[i]);
+		rstart[i+1] = rstart[i];
+		if(c->isContainer == 1) continue;
+		for (int k = 0; k < c->nO; k++)
+			writer[c->outputs[k]] = i;
+		rstart[i+1] += c->nI;
+		if(output_reads(c))
+			rstart[i+1] += output_feedlist(c, NULL);
+	}
+	int *reads = (int*)malloc((rstart[n]+1)*sizeof(int));
+	for (int i = 0; i < n; i++) {
+		c = &(circuits[i]);
+		if(c->isContainer == 1) continue;
+		memcpy(&(reads[rstart[i]]), c->inputs, c->nI*sizeof(int));
+		if(output_reads(c))
+			output_feedlist(c, &(reads[rstart[i]+c->nI]));
+	}
+
+	//circuits that can run in blocks and are not in a loop
+	char *inregion = (char*)calloc(n+1, sizeof(char));
+	char *cyclic = (char*)calloc(n+1, sizeof(char));
+	MarkCycles(rstart, reads, writer, cyclic);
+	for (int i = 0; i < n; i++) {
+		c = &(circuits[i]);
+		inregion[i] = (pos[i] >= 0 && c->every == 1 && cyclic[i] == 0 &&
+			(BlockFunction(c) != NULL || output_reads(c)));
+	}
+
+	//channels written in the region must be read only in the region
+	int *work = (int*)malloc((n+1)*sizeof(int));
+	int nwork = 0, v, w;
+	for (int i = 0; i < n; i++)
+		if(circuits[i].isContainer == 0 && inregion[i] == 0)
+			work[nwork++] = i;
+	while(nwork > 0) {
+		v = work[--nwork];
+		for (int k = rstart[v]; k < rstart[v+1]; k++) {
+			w = writer[reads[k]];
+			if(w >= 0 && inregion[w] == 1) {
+				inregion[w] = 0;
+				work[nwork++] = w;
+			}
+		}
+	}
+
+	int *order = work;
+	int norder = RegionOrder(rstart, reads, writer, inregion, pos, order);
+
+	if(norder > 0) {
+
+		blockplan *b = (blockplan*)calloc(1, sizeof(blockplan));
+		b->size = cEngine->blocksize;
+		b->ntasks = norder;
+		b->tasks = (blocktask*)calloc(norder, sizeof(blocktask));
+
+		//vectors: one for each channel written in the region, then
+		//one for each channel read from outside of it
+		int nin = 0, nout = 0, next = 0;
+		for (int i = 0; i < norder; i++) {
+			v = order[i];
+			nin += rstart[v+1]-rstart[v];
+			nout += circuits[v].nO;
+			for (int k = rstart[v]; k < rstart[v+1]; k++) {
+				w = writer[reads[k]];
+				if(w < 0 || inregion[w] == 0) next++;
+			}
+		}
+		b->nint = nout;
+		b->nvec = nout+next;
+		b->data = (double*)calloc(b->nvec*S+1, sizeof(double));
+		b->vecch = (int*)malloc((nout+1)*sizeof(int));
+		b->vecpush = (char*)calloc(nout+1, sizeof(char));
+		b->capdata = (int*)malloc((2*next+1)*sizeof(int));
+		b->ptrs = (double**)malloc((nin+nout+1)*sizeof(double*));
+		b->chs = (int*)malloc((nin+nout+1)*sizeof(int));
+		b->saved = (double*)malloc((nin+1)*sizeof(double));
+
+		char *inpush = (char*)calloc(nch+1, sizeof(char));
+		for (int k = 0; k < cEngine->npush; k++)
+			inpush[cEngine->pushlist[k]] = 1;
+
+		int *vecid = (int*)malloc((nch+1)*sizeof(int));
+		int j = 0;
+		for (int i = 0; i < norder; i++) {
+			c = &(circuits[order[i]]);
+			for (int k = 0; k < c->nO; k++) {
+				vecid[c->outputs[k]] = j;
+				b->vecch[j] = c->outputs[k];
+				b->vecpush[j] = pushed[order[i]] | inpush[c->outputs[k]];
+				j++;
+			}
+		}
+
+		int np = 0, ns = 0, nc = 0, ncap = 0;
+		for (int i = 0; i < norder; i++) {
+
+			v = order[i];
+			c = &(circuits[v]);
+			blocktask *bt = &(b->tasks[i]);
+			task *t = &(cEngine->schedule[pos[v]]);
+
+			bt->c = c;
+			bt->f = BlockFunction(c);
+			bt->nin = rstart[v+1]-rstart[v];
+			bt->nout = c->nO;
+			bt->in = &(b->ptrs[np]); bt->inch = &(b->chs[np]); bt->saved = &(b->saved[ns]);
+			np += bt->nin;
+			ns += bt->nin;
+			bt->out = &(b->ptrs[np]); bt->outch = &(b->chs[np]);
+			np += bt->nout;
+
+			//the schedule task now captures the values read from outside
+			t->c = NULL;
+			t->type = TASK_CAPTURE;
+			t->n = 0;
+			t->idx = &(b->capdata[2*ncap]);
+
+			for (int k = 0; k < bt->nin; k++) {
+				int ch = reads[rstart[v]+k];
+				w = writer[ch];
+				bt->inch[k] = ch;
+				if(w >= 0 && inregion[w] == 1) {
+					//read in the same step only if pushed by a circuit updated before
+					int now = (pushed[w] == 1 && pos[w] < pos[v]);
+					bt->in[k] = &(b->data[vecid[ch]*S + now]);
+				}
+				else {
+					int offset = (nout+nc)*S + 1;
+					bt->in[k] = &(b->data[offset]);
+					t->idx[t->n++] = ch;
+					t->idx[t->n++] = offset;
+					nc++;
+				}
+			}
+			ncap += t->n/2;
+			for (int k = 0; k < bt->nout; k++) {
+				bt->outch[k] = c->outputs[k];
+				bt->out[k] = &(b->data[vecid[c->outputs[k]]*S + 1]);
+			}
+		}
+
+		//remove the empty tasks
+		int nt = 0;
+		for (int t = 0; t < cEngine->ntasks; t++) {
+			task *tk = &(cEngine->schedule[t]);
+			if(tk->c == NULL && tk->type == TASK_CAPTURE && tk->n == 0)
+				continue;
+			cEngine->schedule[nt++] = *tk;
+		}
+		cEngine->ntasks = nt;
+
+		//channels of the region are pushed at the end of the block
+		int npush = 0;
+		for (int k = 0; k < cEngine->npush; k++) {
+			w = writer[cEngine->pushlist[k]];
+			if(w >= 0 && inregion[w] == 1) continue;
+			cEngine->pushlist[npush++] = cEngine->pushlist[k];
+		}
+		cEngine->npush = npush;
+
+		cEngine->block = b;
+		if(cEngine->replica == 0)
+			printf("cCore: %i circuits run in blocks of %i steps\n", norder, b->size);
+
+		free(inpush);
+		free(vecid);
+	}
+
+	free(pos); free(pushed); free(writer);
+	free(rstart); free(reads);
+	free(inregion); free(cyclic); free(work);
+}
+
+/*********************************************************
+ * Internal function. Updates the circuit of a block task
+ * step by step, putting the values it reads in the signals
+ * of its channels. The signals are restored at the end.
+ * ******************************************************/
+void BlockStepByStep(blocktask *t, int n) {
+
+	double *sig = GlobalSignals;
+	double *buf = GlobalBuffers;
+
+	for (int k = 0; k < t->nin; k++)
+		t->saved[k] = sig[t->inch[k]];
+
+	for (int s = 0; s < n; s++) {
+		for (int k = 0; k < t->nin; k++)
+			sig[t->inch[k]] = t->in[k][s];
+		t->c->updatef(t->c);
+		for (int k = 0; k < t->nout; k++)
+			t->out[k][s] = buf[t->outch[k]];
+	}
+
+	for (int k = t->nin-1; k >= 0; k--)
+		sig[t->inch[k]] = t->saved[k];
+}
+
+/*********************************************************
+ * Updates the region over the steps done in the current
+ * block, then sets its channels as the step by step update
+ * would have left them.
+ * ******************************************************/
+void RunBlock(blockplan *b) {
+
+	int n = b->pos, S = b->size+1;
+	double *v;
+
+	for (int i = 0; i < b->ntasks; i++) {
+		blocktask *t = &(b->tasks[i]);
+		if(t->f != NULL)
+			t->f(t->c, t->in, t->out, n);
+		else
+			BlockStepByStep(t, n);
+	}
+
+	for (int j = 0; j < b->nint; j++) {
+		v = &(b->data[j*S]);
+		GlobalBuffers[b->vecch[j]] = v[n];
+		if(b->vecpush[j] == 1)
+			GlobalSignals[b->vecch[j]] = v[n];
+	}
+
+	b->pos = 0;
+}
+
+/*********************************************************
+ * Runs one step of the compiled schedule, capturing the
+ * values read by the feed-forward region, which is updated
+ * when the block is complete.
+ * ******************************************************/
+void RunBlockSchedule(void) {
+
+	blockplan *b = cEngine->block;
+
+	//values of the region channels before the block
+	if(b->pos == 0)
+		for (int j = 0; j < b->nint; j++)
+			b->data[j*(b->size+1)] = GlobalSignals[b->vecch[j]];
+
+	RunSchedule();
+
+	b->pos++;
+	if(b->pos == b->size)
+		RunBlock(b);
+}
+
+/*********************************************************
+ * Updates the feed-forward region of the current engine
+ * over the steps of an incomplete block. Called at the end
+ * of each run, so that python sees all the channels up to
+ * date.
+ * ******************************************************/
+void FlushBlock(void) {
+
+	if(cEngine->block != NULL && cEngine->block->pos > 0)
+		RunBlock(cEngine->block);
+}
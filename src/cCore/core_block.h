@@ -0,0 +1,50 @@
+#ifndef COREBLOCK
+#define COREBLOCK
+
+///Update of a circuit over n steps: in[k] and out[k] hold the values of
+///input and output k at each step.
+typedef void (*blockfunc)(circuit*, double**, double**, int);
+
+typedef struct blocktask blocktask;
+
+///One circuit of the feed-forward region.
+struct blocktask {
+
+    circuit *c;
+    blockfunc f;    //block update, NULL to call updatef at each step
+    int nin, nout;  //number of channels read and written
+    double **in;    //values read at each step of the block
+    double **out;   //values written at each step of the block
+    int *inch;      //channels read, for the step by step update
+    int *outch;     //channels written, for the step by step update
+    double *saved;  //values of the channels read, kept during the step by step update
+
+};
+
+///Circuits of an engine that do not feed back into the rest of the
+///setup, updated one after the other over blocks of steps.
+struct blockplan {
+
+    int size;       //steps in a block
+    int pos;        //steps done in the current block
+
+    int ntasks;         //number of circuits in the region
+    blocktask *tasks;   //circuits of the region, each one after those it reads
+
+    int nvec;       //number of value vectors, size+1 values each
+    int nint;       //vectors written by the region, the first ones
+    double *data;   //value vectors
+    int *vecch;     //channel of each vector written by the region
+    char *vecpush;  //1 if the signal of the channel is pushed at the end of a step
+
+    int *capdata;   //channel and data offset pairs of the capture tasks
+    double **ptrs;  //in and out arrays of the tasks
+    int *chs;       //inch and outch arrays of the tasks
+    double *saved;  //saved arrays of the tasks
+
+};
+
+int SetBlockSize(int n);
+void RunBlock(blockplan *b);
+
+#endif
@@ -123,6 +123,37 @@ void RunCantilever(circuit *c) {
 
 }
 
+///Ensemble version of RunCantilever for the replicas, same operations.
+void RunCantilever_ensemble(circuit **cs, int n) {
+
+	circuit *c = cs[0];
+	double *holderz = GlobalSignals + c->inputs[0];
+	double *fz = GlobalSignals + c->inputs[1], *fexc = GlobalSignals + c->inputs[2];
+	double *ztip = GlobalBuffers + c->outputs[0], *vz = GlobalBuffers + c->outputs[2];
+	double *zabs = GlobalBuffers + c->outputs[1], *zabssig = GlobalSignals + c->outputs[1];
+	double *p;
+
+	for (int r = 0; r < n; r++) {
+
+		p = cs[r]->params;
+		if (p[9] == 1) {
+			double az = fz[r] + fexc[r]; //total force
+			p[4] = az*p[1] - p[2]*p[6]*p[6];
+			p[4] /= dt;
+			p[3] = p[3]*(1.0-p[0]) + 0.5*p[4];
+		}
+
+		p[2] += p[3]*dt*(1.0-p[0]) + 0.5*p[4]*dt;
+		p[3] = p[3]*(1.0-p[0]) + 0.5*p[4];
+		p[9] = 1;
+
+		ztip[r] = p[2];
+		vz[r] = p[3];
+		zabs[r] = holderz[r] + p[5] + p[2];
+		zabssig[r] = zabs[r];
+	}
+}
+
 /* ******************************************
  params
  [0] = holderx
@@ -243,6 +274,11 @@ int Add_AdvancedCantilever(int owner, int numberofmodesV, int numberofmodesL)
     c.vpparams[22] = (double*)calloc(numberofmodesL,sizeof(double)); 	//Yl
     c.vpparams[23] = (double*)calloc(numberofmodesL,sizeof(double)); 	//Zl
 
+    //all mode arrays are internal state
+    for (int i = 0; i < c.vplen; i++) {
+        SetStateBuffer(&c, i, ((i<12)? numberofmodesV : numberofmodesL)*sizeof(double));
+    }
+
 
 
 
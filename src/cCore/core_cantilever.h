@@ -3,6 +3,7 @@
 
 int Add_Cantilever(int owner, double Q, double k, double M, double f0, double startingz, double cantiz);
 void RunCantilever(circuit *c);
+void RunCantilever_ensemble(circuit **c, int n);
 
 int Add_AdvancedCantilever(int owner, int numberofmodesV, int numberofmodesL);
 void RunAdvancedCantilever(circuit *c);
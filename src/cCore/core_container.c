@@ -2,6 +2,9 @@
 Circuits container definitions.
  *********************************************************/
 #include <math.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
 
 #ifndef CIRCUIT
 #include "circuit.h"
@@ -11,6 +14,18 @@ Circuits container definitions.
 #include "core_container.h"
 #endif
 
+#ifndef COREOUTPUT
+#include "core_output.h"
+#endif
+
+#ifndef COREBLOCK
+#include "core_block.h"
+#endif
+
+#ifndef COREENSEMBLE
+#include "core_ensemble.h"
+#endif
+
 
 
 int Add_Container(int owner, int isMain) {
@@ -72,6 +87,8 @@ int Add_ChannelToContainer(int c, int isInput) {
 	
 	//allocate a new dummy
 	int dummyindex = Add_Dummy(-1); //dummy goes in no container, only in global circuits
+	if(dummyindex < 0)
+		return -1;
 	
 	//allocate the index slot
 	if(isInput == 1) {
@@ -161,4 +178,529 @@ void DoNothing(circuit *c) {
 }
 
 
+/*********************************************************
+ * Schedule compiler.
+ * The container tree is flattened in a list of tasks that
+ * does the same as ContainerUpdate_Main on the main machine,
+ * without recursion and without looking up the dummy relays
+ * at every step. The schedule has to be compiled again when
+ * circuits, connections or pushed flags change.
+ * ******************************************************/
+task* NewTask(circuit *c, int type, int *ndata) {
+	
+	task *t = &(cEngine->schedule[cEngine->ntasks]);
+	cEngine->ntasks++;
+	
+	t->c = c;
+	t->type = type;
+	t->n = 0;
+	t->idx = &(cEngine->taskdata[*ndata]);
+	t->every = (c != NULL)? c->every : 1;
+	
+	return t;
+}
+void AddTaskIndex(task *t, int i, int *ndata) {
+	
+	t->idx[t->n] = i;
+	t->n++;
+	(*ndata)++;
+}
+
+void FlattenContainer(int index, int *ndata) {
+	
+	circuit *c = &(circuits[index]);
+	circuit *d;
+	task *t;
+	
+	//relay all external inputs
+	if(c->nI > 0) {
+		t = NewTask(NULL, TASK_RELAY, ndata);
+		for (int i = 0; i < c->nI; i++) {
+			d = &(circuits[c->dummyin[i]]);
+			AddTaskIndex(t, d->inputs[0], ndata);
+			AddTaskIndex(t, d->outputs[0], ndata);
+		}
+	}
+	
+	//update subcircuits
+	for (int i = 0; i < c->nsubcircs; i++) {
+		
+		d = &(circuits[c->subcircuits[i]]);
+		
+		if(d->isContainer == 1 && d->updatef == ContainerUpdate) {
+			FlattenContainer(c->subcircuits[i], ndata);
+			continue;
+		}
+		
+		//push normal circuits only
+		if(d->pushed == 1 && d->isContainer == 0 && d->nO > 0) {
+			t = NewTask(d, TASK_PUSH, ndata);
+			for (int k = 0; k < d->nO; k++)
+				AddTaskIndex(t, d->outputs[k], ndata);
+		}
+		else
+			NewTask(d, TASK_NONE, ndata);
+	}
+	
+	//relay all external outputs
+	if(c->nO > 0) {
+		t = NewTask(NULL, (c->pushed == 1)? TASK_RELAY : TASK_RELAYOUT, ndata);
+		for (int i = 0; i < c->nO; i++) {
+			d = &(circuits[c->dummyout[i]]);
+			AddTaskIndex(t, d->inputs[0], ndata);
+			AddTaskIndex(t, d->outputs[0], ndata);
+		}
+	}
+	
+}
+
+/*********************************************************
+ * Finds the channels that have to be pushed at the end of
+ * the step: those whose signal is read by some circuit,
+ * written in the buffer by a circuit, and not already
+ * pushed by the schedule itself.
+ * ******************************************************/
+#define FEED_READ 1
+#define FEED_WRITTEN 2
+#define FEED_PUSHED 4
 
+void ComputePushList(void) {
+	
+	int nch = GlobalChannelCounter*cEngine->stride;
+	char *mark = (char*)calloc(nch+1, sizeof(char));
+	circuit *c;
+	task *t;
+	
+	for (int i = 0; i < GlobalCircuitCounter; i++) {
+		
+		c = &(circuits[i]);
+		if(c->isContainer == 1) continue;
+		
+		for (int k = 0; k < c->nI; k++)
+			mark[c->inputs[k]] |= FEED_READ;
+		for (int k = 0; k < c->nO; k++)
+			mark[c->outputs[k]] |= FEED_WRITTEN;
+		
+		if(output_reads(c))
+			output_feeds(c, mark, FEED_READ);
+	}
+	
+	for (int i = 0; i < cEngine->ntasks; i++) {
+		
+		t = &(cEngine->schedule[i]);
+		switch(t->type) {
+			case TASK_PUSH:
+			case TASK_TIME:
+				for (int k = 0; k < t->n; k++)
+					mark[t->idx[k]] |= FEED_PUSHED;
+				break;
+			case TASK_RELAY:
+				for (int k = 1; k < t->n; k+=2)
+					mark[t->idx[k]] |= FEED_PUSHED;
+				break;
+		}
+	}
+	
+	free(cEngine->pushlist);
+	cEngine->pushlist = (int*)malloc((GlobalChannelCounter+1)*sizeof(int));
+	cEngine->npush = 0;
+	
+	for (int i = 0; i < nch; i++) {
+		if((mark[i] & (FEED_READ|FEED_WRITTEN|FEED_PUSHED)) == (FEED_READ|FEED_WRITTEN)) {
+			cEngine->pushlist[cEngine->npush] = i;
+			cEngine->npush++;
+		}
+	}
+	
+	free(mark);
+}
+
+/*********************************************************
+ * Moves params and iparams of all circuits in two
+ * contiguous arenas, in the order they are updated by the
+ * schedule, so that a step reads them sequentially.
+ * ******************************************************/
+void PackCircuit(circuit *c, int *np, int *nip) {
+	
+	if(c->plen > 0) {
+		memcpy(&(cEngine->paramarena[*np]), c->params, c->plen*sizeof(double));
+		if(c->packed == 0) free(c->params);
+		c->params = &(cEngine->paramarena[*np]);
+		*np += c->plen;
+	}
+	if(c->iplen > 0) {
+		memcpy(&(cEngine->iparamarena[*nip]), c->iparams, c->iplen*sizeof(int));
+		if(c->packed == 0) free(c->iparams);
+		c->iparams = &(cEngine->iparamarena[*nip]);
+		*nip += c->iplen;
+	}
+	c->packed = 1;
+}
+
+void PackParameters(void) {
+	
+	double *oldparams = cEngine->paramarena;
+	int *oldiparams = cEngine->iparamarena;
+	int np = 0, nip = 0;
+	
+	for (int i = 0; i < GlobalCircuitCounter; i++) {
+		np += circuits[i].plen;
+		nip += circuits[i].iplen;
+	}
+	cEngine->paramarena = (double*)malloc((np+1)*sizeof(double));
+	cEngine->iparamarena = (int*)malloc((nip+1)*sizeof(int));
+	
+	//mark the circuits in the schedule
+	char *done = (char*)calloc(GlobalCircuitCounter+1, sizeof(char));
+	np = 0; nip = 0;
+	
+	for (int i = 0; i < cEngine->ntasks; i++) {
+		circuit *c = cEngine->schedule[i].c;
+		if(c == NULL) continue;
+		PackCircuit(c, &np, &nip);
+		done[c - circuits] = 1;
+	}
+	for (int i = 0; i < GlobalCircuitCounter; i++)
+		if(done[i] == 0)
+			PackCircuit(&(circuits[i]), &np, &nip);
+	
+	free(done);
+	free(oldparams);
+	free(oldiparams);
+}
+
+void CompileEngine(void) {
+	
+	//the lockstep update points to the old schedule
+	FreeEnsemble(cEngine);
+	free(cEngine->schedule);
+	free(cEngine->taskdata);
+	
+	//upper bounds for the number of tasks and indexes
+	int ntasks = 1, ndata = 1;
+	for (int i = 0; i < GlobalCircuitCounter; i++) {
+		if(circuits[i].isContainer == 1) {
+			ntasks += 2;
+			ndata += 2*(circuits[i].nI + circuits[i].nO);
+		}
+		else {
+			ntasks++;
+			ndata += circuits[i].nO;
+		}
+	}
+	cEngine->schedule = (task*)malloc(ntasks*sizeof(task));
+	cEngine->taskdata = (int*)malloc(ndata*sizeof(int));
+	cEngine->ntasks = 0;
+	
+	ndata = 0;
+	if(GlobalCircuitCounter > 0) {
+		
+		circuit *c = &(circuits[0]);
+		
+		if(c->isContainer == 1 && c->updatef == ContainerUpdate_Main) {
+			//update time
+			task *t = NewTask(NULL, TASK_TIME, &ndata);
+			AddTaskIndex(t, circuits[c->dummyout[0]].inputs[0], &ndata);
+			FlattenContainer(0, &ndata);
+		}
+		else if(c->isContainer == 1 && c->updatef == ContainerUpdate)
+			FlattenContainer(0, &ndata);
+		else
+			NewTask(c, TASK_NONE, &ndata);
+	}
+	
+	ComputePushList();
+	PlanBlocks();
+	PackParameters();
+	
+	//the timed loop is used only when profiling
+	cEngine->native = NULL;
+	cEngine->runner = (cEngine->block != NULL)? RunBlockSchedule : RunSchedule;
+	if(cEngine->profiling == 1) {
+		cEngine->runner = RunScheduleProfiled;
+		if(cEngine->proflen < GlobalCircuitCounter) {
+			cEngine->proftime = (double*)realloc(cEngine->proftime, GlobalCircuitCounter*sizeof(double));
+			cEngine->profcalls = (unsigned long long int*)realloc(cEngine->profcalls,
+				GlobalCircuitCounter*sizeof(unsigned long long int));
+			for (int i = cEngine->proflen; i < GlobalCircuitCounter; i++) {
+				cEngine->proftime[i] = 0;
+				cEngine->profcalls[i] = 0;
+			}
+			cEngine->proflen = GlobalCircuitCounter;
+		}
+	}
+	
+	cEngine->compiled = 1;
+}
+
+/*********************************************************
+ * Compiles the schedule of the current engine and of its
+ * replicas. Python callable.
+ * ******************************************************/
+int Compile(void) {
+	
+	engine *e = cEngine;
+	
+	for (int r = 0; r < e->nreplicas; r++)
+		e->replicas[r]->compiled = 0;
+	CompileReplicas(e);
+	
+	printf("cCore: compiled schedule with %i tasks, %i pushed channels out of %i\n",
+		e->ntasks, e->npush, e->nchannels);
+	return 0;
+}
+
+/*********************************************************
+ * Channel copies done after the update of task t.
+ * ******************************************************/
+static inline void RunTaskCopies(task *t, double *sig, double *buf) {
+	
+	int *idx = t->idx;
+	
+	switch(t->type) {
+		case TASK_PUSH:
+			for (int k = 0; k < t->n; k++)
+				sig[idx[k]] = buf[idx[k]];
+			break;
+		case TASK_RELAY:
+			for (int k = 0; k < t->n; k+=2)
+				sig[idx[k+1]] = buf[idx[k+1]] = sig[idx[k]];
+			break;
+		case TASK_RELAYOUT:
+			for (int k = 0; k < t->n; k+=2)
+				buf[idx[k+1]] = sig[idx[k]];
+			break;
+		case TASK_TIME:
+			buf[idx[0]] += dt;
+			sig[idx[0]] += dt;
+			break;
+		case TASK_CAPTURE: {
+			double *v = cEngine->block->data + cEngine->block->pos;
+			for (int k = 0; k < t->n; k+=2)
+				v[idx[k+1]] = sig[idx[k]];
+			break;
+		}
+	}
+}
+
+/*********************************************************
+ * Updates the circuit of a task with a lower rate, on the
+ * steps that are multiples of its rate divisor, with the
+ * timestep multiplied by the divisor. Returns 1 if the
+ * circuit was updated.
+ * ******************************************************/
+static inline int RunSlowTask(task *t) {
+	
+	if(cEngine->step % t->every != 0)
+		return 0;
+	
+	double h = dt;
+	dt = h*t->every;
+	t->c->updatef(t->c);
+	dt = h;
+	
+	return 1;
+}
+
+/*********************************************************
+ * Runs one step of the compiled schedule, followed by the
+ * push of the channels that are read in the next step.
+ * ******************************************************/
+void RunSchedule(void) {
+	
+	double *sig = GlobalSignals;
+	double *buf = GlobalBuffers;
+	task *t = cEngine->schedule;
+	task *end = t + cEngine->ntasks;
+	int *idx;
+	
+	for (; t < end; t++) {
+		
+		if(t->c != NULL) {
+			if(t->every == 1)
+				t->c->updatef(t->c);
+			else
+				RunSlowTask(t);
+		}
+		
+		RunTaskCopies(t, sig, buf);
+	}
+	
+	idx = cEngine->pushlist;
+	for (int k = 0; k < cEngine->npush; k++)
+		sig[idx[k]] = buf[idx[k]];
+	
+	cEngine->step++;
+}
+
+double ElapsedNS(struct timespec *t0, struct timespec *t1) {
+	
+	return (t1->tv_sec - t0->tv_sec)*1.0e9 + (t1->tv_nsec - t0->tv_nsec);
+}
+
+/*********************************************************
+ * Same as RunSchedule, but measures the time spent in each
+ * task. Channel copies of pushed circuits are counted in
+ * the circuit time.
+ * ******************************************************/
+void RunScheduleProfiled(void) {
+	
+	double *sig = GlobalSignals;
+	double *buf = GlobalBuffers;
+	task *t = cEngine->schedule;
+	task *end = t + cEngine->ntasks;
+	int *idx, i, updated;
+	struct timespec t0, t1;
+	
+	for (; t < end; t++) {
+		
+		clock_gettime(CLOCK_MONOTONIC, &t0);
+		
+		updated = 0;
+		if(t->c != NULL) {
+			if(t->every == 1) {
+				t->c->updatef(t->c);
+				updated = 1;
+			}
+			else
+				updated = RunSlowTask(t);
+		}
+		RunTaskCopies(t, sig, buf);
+		
+		clock_gettime(CLOCK_MONOTONIC, &t1);
+		
+		if(t->c != NULL) {
+			i = t->c - circuits;
+			cEngine->proftime[i] += ElapsedNS(&t0, &t1);
+			cEngine->profcalls[i] += updated;
+		}
+		else
+			cEngine->profrelays += ElapsedNS(&t0, &t1);
+	}
+	
+	clock_gettime(CLOCK_MONOTONIC, &t0);
+	idx = cEngine->pushlist;
+	for (int k = 0; k < cEngine->npush; k++)
+		sig[idx[k]] = buf[idx[k]];
+	clock_gettime(CLOCK_MONOTONIC, &t1);
+	cEngine->profpush += ElapsedNS(&t0, &t1);
+	
+	cEngine->step++;
+}
+
+
+/*********************************************************
+ * Sizes of the compiled schedule of the current engine:
+ * number of tasks, of task indexes, of pushed channels and
+ * of circuits. Python callable.
+ * ******************************************************/
+int ScheduleInfo(int *sizes) {
+	
+	if(cEngine->compiled == 0)
+		CompileEngine();
+	
+	sizes[0] = cEngine->ntasks;
+	sizes[1] = 0;
+	for (int i = 0; i < cEngine->ntasks; i++)
+		sizes[1] += cEngine->schedule[i].n;
+	sizes[2] = cEngine->npush;
+	sizes[3] = GlobalCircuitCounter;
+	
+	return 0;
+}
+
+/*********************************************************
+ * Copies the compiled schedule: for each task the circuit
+ * index (-1 if none), type, number of indexes and offset of
+ * the indexes in data, then the push list.
+ * Python callable.
+ * ******************************************************/
+int GetSchedule(int *tasks, int *data, int *push) {
+	
+	int n = 0;
+	
+	for (int i = 0; i < cEngine->ntasks; i++) {
+		
+		task *t = &(cEngine->schedule[i]);
+		tasks[4*i] = (t->c != NULL)? t->c - circuits : -1;
+		tasks[4*i+1] = t->type;
+		tasks[4*i+2] = t->n;
+		tasks[4*i+3] = n;
+		
+		memcpy(&(data[n]), t->idx, t->n*sizeof(int));
+		n += t->n;
+	}
+	memcpy(push, cEngine->pushlist, cEngine->npush*sizeof(int));
+	
+	return cEngine->ntasks;
+}
+
+/*********************************************************
+ * Returns the update function of circuit cindex, and puts
+ * the number of its inputs and outputs in nio[0] and nio[1]
+ * and its rate divisor in nio[2]. If ins and
+ * outs are not NULL, the current channel indexes are also
+ * copied there. Python callable.
+ * ******************************************************/
+void* CircuitInfo(int cindex, int *nio, int *ins, int *outs) {
+	
+	circuit *c = &(circuits[cindex]);
+	
+	nio[0] = (c->isContainer == 0)? c->nI : 0;
+	nio[1] = (c->isContainer == 0)? c->nO : 0;
+	nio[2] = c->every;
+	if(ins != NULL && nio[0] > 0) memcpy(ins, c->inputs, nio[0]*sizeof(int));
+	if(outs != NULL && nio[1] > 0) memcpy(outs, c->outputs, nio[1]*sizeof(int));
+	
+	return (void*)(c->updatef);
+}
+
+/*********************************************************
+ * Returns the number of params of circuit cindex, and
+ * copies them in p if it is not NULL. Python callable.
+ * ******************************************************/
+int CircuitParams(int cindex, double *p) {
+	
+	circuit *c = &(circuits[cindex]);
+	
+	if(p != NULL && c->plen > 0) memcpy(p, c->params, c->plen*sizeof(double));
+	return c->plen;
+}
+
+/*********************************************************
+ * Runs one step with the native step function.
+ * ******************************************************/
+void RunNative(void) {
+	
+	cEngine->native(cEngine);
+}
+
+/*********************************************************
+ * Makes the current engine and its replicas run the given
+ * step function, generated from the compiled schedule.
+ * It is dropped when the schedule is compiled again.
+ * Python callable.
+ * ******************************************************/
+int SetNative(void (*step)(engine*)) {
+	
+	engine *e = cEngine;
+	
+	for (int r = 0; r < e->nreplicas; r++) {
+		
+		cEngine = e->replicas[r];
+		if(cEngine->compiled == 0)
+			CompileEngine();
+		if(cEngine->block != NULL) {
+			printf("cERROR: the native step function cannot run a feed-forward region in blocks!\n");
+			cEngine = e;
+			return -1;
+		}
+		
+		cEngine->native = step;
+		if(cEngine->profiling == 0)
+			cEngine->runner = RunNative;
+	}
+	cEngine = e;
+	
+	return 0;
+}
@@ -53,6 +53,22 @@ void PIC( circuit *c ) {
     c->params[1] = KI*delta;
 
 }
+///Ensemble version of PIC for the replicas, same operations.
+void PIC_ensemble( circuit **c, int n ) {
+    
+    double *x = GlobalBuffers + c[0]->inputs[0], *set = GlobalBuffers + c[0]->inputs[1];
+    double *kp = GlobalSignals + c[0]->inputs[2], *ki = GlobalSignals + c[0]->inputs[3];
+    double *y = GlobalBuffers + c[0]->outputs[0];
+    double delta, *p;
+    
+    for(int r=0; r<n; r++) {
+        p = c[r]->params;
+        delta = set[r] - x[r];
+        p[0] += 0.5*( p[1] + ki[r]*delta )*dt;
+        y[r] = delta*kp[r] + p[0];
+        p[1] = ki[r]*delta;
+    }
+}
 
 /***********************************************************************
  * Channels:
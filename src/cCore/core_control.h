@@ -6,4 +6,7 @@ int Add_PID(int owner );
 void PIC( circuit *c );
 void PIDC( circuit *c );
 
+//ensemble version for the replicas
+void PIC_ensemble( circuit **c, int n );
+
 #endif
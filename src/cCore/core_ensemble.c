@@ -0,0 +1,318 @@
+/**********************************************************
+Replicas updated in lockstep.
+Once an engine is replicated, the signals and buffers of all
+the replicas are stored in two shared arrays, replica-major:
+the values of a channel in the n replicas are next to each
+other, so channel i of replica r is at i*n+r. Each replica
+sees the arrays from its own offset r, and its circuits have
+their channel indexes multiplied by n, so the update
+functions work unchanged on any of the replicas.
+The schedule is then run one task at a time for all the
+replicas: circuits with an ensemble update do all of them
+in one loop over the contiguous values, the others are
+updated replica by replica, and the channel copies of the
+task are done for all the replicas together.
+*********************************************************/
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+#ifndef CIRCUIT
+#include "circuit.h"
+#endif
+
+#ifndef COREENSEMBLE
+#include "core_ensemble.h"
+#endif
+
+#ifndef COREMATHS
+#include "core_maths.h"
+#endif
+
+#ifndef COREFILTERS
+#include "core_filters.h"
+#endif
+
+#ifndef CORECONTROL
+#include "core_control.h"
+#endif
+
+#ifndef CORECANTILEVER
+#include "core_cantilever.h"
+#endif
+
+
+///circuits with an ensemble update
+static struct { void (*f)(circuit*); ensemblefunc ef; } ensemblefuncs[] = {
+	{opADD, opADD_ensemble}, {opSUB, opSUB_ensemble}, {opMUL, opMUL_ensemble},
+	{opDIV, opDIV_ensemble}, {opABS, opABS_ensemble}, {opPOW, opPOW_ensemble},
+	{opLINC, opLINC_ensemble}, {opSIN, opSIN_ensemble}, {opCOS, opCOS_ensemble},
+	{SKLP, SKLP_ensemble}, {PIC, PIC_ensemble}, {RunCantilever, RunCantilever_ensemble},
+	{NULL, NULL}
+};
+
+ensemblefunc EnsembleFunction(circuit *c) {
+
+	for (int i = 0; ensemblefuncs[i].f != NULL; i++)
+		if(ensemblefuncs[i].f == c->updatef)
+			return ensemblefuncs[i].ef;
+	return NULL;
+}
+
+/*********************************************************
+ * Internal function. Multiplies (up=1) or divides (up=0)
+ * by n the channel indexes of the circuits of engine e.
+ * ******************************************************/
+void ScaleChannels(engine *e, int n, int up) {
+
+	for (int i = 0; i < e->ncircuits; i++) {
+
+		circuit *c = &(e->circuitlist[i]);
+		if(c->isContainer == 1) continue;
+
+		for (int k = 0; k < c->nI; k++) {
+			c->inputs[k] = (up == 1)? c->inputs[k]*n : c->inputs[k]/n;
+			c->oinputs[k] = (up == 1)? c->oinputs[k]*n : c->oinputs[k]/n;
+		}
+		for (int k = 0; k < c->nO; k++)
+			c->outputs[k] = (up == 1)? c->outputs[k]*n : c->outputs[k]/n;
+	}
+}
+
+/*********************************************************
+ * Moves the signals and buffers of the replicas of engine
+ * e, which must have just been cloned, in the shared
+ * replica-major arrays owned by e.
+ * ******************************************************/
+void ShareSignals(engine *e) {
+
+	int n = e->nreplicas, nch = e->nchannels;
+	if(n < 2) return;
+
+	int size = (nch > 0)? nch*n : 1;
+	double *sig = (double*)malloc(size*sizeof(double));
+	double *buf = (double*)malloc(size*sizeof(double));
+
+	for (int r = 0; r < n; r++) {
+
+		engine *re = e->replicas[r];
+		for (int i = 0; i < nch; i++) {
+			sig[i*n+r] = re->signals[i];
+			buf[i*n+r] = re->buffers[i];
+		}
+		free(re->signals);
+		free(re->buffers);
+
+		re->signals = sig + r;
+		re->buffers = buf + r;
+		re->channelcap = nch;
+		re->stride = n;
+		re->compiled = 0;
+		ScaleChannels(re, n, 1);
+	}
+}
+
+/*********************************************************
+ * Gives engine e back its own signals and buffers, with
+ * the values of replica 0. The other replicas must be
+ * freed afterwards.
+ * ******************************************************/
+void SplitSignals(engine *e) {
+
+	int n = e->stride, nch = e->nchannels;
+	if(n < 2) return;
+
+	int size = (nch > 0)? nch : 1;
+	double *sig = (double*)malloc(size*sizeof(double));
+	double *buf = (double*)malloc(size*sizeof(double));
+	for (int i = 0; i < nch; i++) {
+		sig[i] = e->signals[i*n];
+		buf[i] = e->buffers[i*n];
+	}
+	free(e->signals);
+	free(e->buffers);
+
+	e->signals = sig;
+	e->buffers = buf;
+	e->channelcap = size;
+	e->stride = 1;
+	e->compiled = 0;
+	ScaleChannels(e, n, 0);
+	FreeEnsemble(e);
+}
+
+void FreeEnsemble(engine *e) {
+
+	ensembleplan *p = e->ensemble;
+	if(p == NULL) return;
+
+	free(p->cs);
+	free(p->f);
+	free(p);
+	e->ensemble = NULL;
+}
+
+/*********************************************************
+ * Internal function. Lines up the tasks of the replicas of
+ * engine e. Nothing is planned when profiling, or if the
+ * schedules of the replicas do not match, and the replicas
+ * are then updated one by one.
+ * ******************************************************/
+void PlanEnsemble(engine *e) {
+
+	FreeEnsemble(e);
+
+	int n = e->nreplicas;
+	if(n < 2 || e->stride != n || e->profiling == 1)
+		return;
+
+	for (int r = 1; r < n; r++) {
+		engine *re = e->replicas[r];
+		if(re->ntasks != e->ntasks || re->npush != e->npush)
+			return;
+		for (int t = 0; t < e->ntasks; t++) {
+			task *a = &(e->schedule[t]), *b = &(re->schedule[t]);
+			if(a->type != b->type || a->n != b->n || (a->c == NULL) != (b->c == NULL))
+				return;
+			if(a->c != NULL && (a->c - e->circuitlist != b->c - re->circuitlist || a->c->updatef != b->c->updatef))
+				return;
+		}
+	}
+
+	ensembleplan *p = (ensembleplan*)calloc(1, sizeof(ensembleplan));
+	int ntasks = (e->ntasks > 0)? e->ntasks : 1;
+	p->n = n;
+	p->cs = (circuit**)malloc(ntasks*n*sizeof(circuit*));
+	p->f = (ensemblefunc*)calloc(ntasks, sizeof(ensemblefunc));
+
+	for (int t = 0; t < e->ntasks; t++) {
+		for (int r = 0; r < n; r++)
+			p->cs[t*n+r] = e->replicas[r]->schedule[t].c;
+		if(e->schedule[t].c != NULL && e->schedule[t].every == 1)
+			p->f[t] = EnsembleFunction(e->schedule[t].c);
+	}
+
+	e->ensemble = p;
+}
+
+/*********************************************************
+ * Compiles the replicas of engine e that need it, and
+ * plans their lockstep update.
+ * ******************************************************/
+void CompileReplicas(engine *e) {
+
+	int stale = (e->ensemble == NULL);
+
+	for (int r = 0; r < e->nreplicas; r++) {
+		cEngine = e->replicas[r];
+		if(cEngine->compiled == 0) {
+			CompileEngine();
+			stale = 1;
+		}
+	}
+	cEngine = e;
+
+	if(stale == 1)
+		PlanEnsemble(e);
+}
+
+/*********************************************************
+ * Internal function. Channel copies of task t in all the
+ * n replicas.
+ * ******************************************************/
+static inline void EnsembleCopies(task *t, double *sig, double *buf, int n) {
+
+	int *idx = t->idx;
+	double *s, *b;
+
+	switch(t->type) {
+		case TASK_PUSH:
+			for (int k = 0; k < t->n; k++)
+				memcpy(sig+idx[k], buf+idx[k], n*sizeof(double));
+			break;
+		case TASK_RELAY:
+			for (int k = 0; k < t->n; k+=2) {
+				s = sig+idx[k+1]; b = buf+idx[k+1];
+				for (int r = 0; r < n; r++)
+					s[r] = b[r] = sig[idx[k]+r];
+			}
+			break;
+		case TASK_RELAYOUT:
+			for (int k = 0; k < t->n; k+=2)
+				memcpy(buf+idx[k+1], sig+idx[k], n*sizeof(double));
+			break;
+		case TASK_TIME:
+			s = sig+idx[0]; b = buf+idx[0];
+			for (int r = 0; r < n; r++) {
+				b[r] += dt;
+				s[r] += dt;
+			}
+			break;
+	}
+}
+
+/*********************************************************
+ * Internal function. Runs one step of the schedule of
+ * engine e, which must be the current one, in all its
+ * replicas.
+ * ******************************************************/
+void RunEnsemble(engine *e) {
+
+	ensembleplan *p = e->ensemble;
+	engine **reps = e->replicas;
+	double *sig = GlobalSignals;
+	double *buf = GlobalBuffers;
+	task *t = e->schedule;
+	int n = p->n, *idx;
+
+	for (int i = 0; i < e->ntasks; i++, t++) {
+
+		circuit **cs = p->cs + i*n;
+
+		if(p->f[i] != NULL)
+			p->f[i](cs, n);
+		else if(t->c != NULL && e->step % t->every == 0) {
+			for (int r = 0; r < n; r++) {
+				cEngine = reps[r];
+				if(t->every == 1)
+					cs[r]->updatef(cs[r]);
+				else {
+					double h = dt;
+					dt = h*t->every;
+					cs[r]->updatef(cs[r]);
+					dt = h;
+				}
+			}
+			cEngine = e;
+		}
+		EnsembleCopies(t, sig, buf, n);
+	}
+
+	idx = e->pushlist;
+	for (int k = 0; k < e->npush; k++)
+		memcpy(sig+idx[k], buf+idx[k], n*sizeof(double));
+
+	for (int r = 0; r < n; r++)
+		reps[r]->step++;
+}
+
+/*********************************************************
+ * Runs one step of all the replicas of engine e, which
+ * must be compiled with CompileReplicas. The replicas are
+ * updated one by one when profiling or with a native step
+ * function.
+ * ******************************************************/
+void StepReplicas(engine *e) {
+
+	if(e->ensemble != NULL && e->native == NULL) {
+		cEngine = e;
+		RunEnsemble(e);
+		return;
+	}
+
+	for (int r = 0; r < e->nreplicas; r++) {
+		cEngine = e->replicas[r];
+		cEngine->runner();
+	}
+	cEngine = e;
+}
@@ -0,0 +1,24 @@
+#ifndef COREENSEMBLE
+#define COREENSEMBLE
+
+///Update of a circuit in all the n replicas: c[r] is the circuit of
+///replica r, and the value of a channel in replica r is found r places
+///after the one of replica 0.
+typedef void (*ensemblefunc)(circuit**, int);
+
+///Update of the replicas of an engine in lockstep, one task at a time.
+struct ensembleplan {
+
+    int n;              //number of replicas
+    circuit **cs;       //circuit of each task in each replica, n for each task
+    ensemblefunc *f;    //update of each task in all the replicas, NULL to update them one by one
+
+};
+
+void ShareSignals(engine *e);
+void SplitSignals(engine *e);
+void FreeEnsemble(engine *e);
+void CompileReplicas(engine *e);
+void StepReplicas(engine *e);
+
+#endif
@@ -0,0 +1,103 @@
+/**********************************************************
+Expression circuit.
+A formula is compiled by python into a list of operations
+on a small array of slots, holding the inputs, the constants
+and the intermediate results, which is run at every step.
+*********************************************************/
+#include <stdlib.h>
+#include <string.h>
+#include <math.h>
+
+#ifndef CIRCUIT
+#include "circuit.h"
+#endif
+
+#ifndef COREEXPR
+#include "core_expr.h"
+#endif
+
+
+/*********************************************************
+ * Creates an expression circuit with nI inputs.
+ * The slots are nI inputs, nconst constants and then the
+ * intermediate results, nslots in total. code has 4 ints
+ * for each of the ninstr operations: op, destination and
+ * the two operand slots. The output is the value of slot
+ * result. Python callable.
+ * 
+ * iparams: [0] ninstr, [1] result, then the code
+ * vpparams: [0] slots
+ * ******************************************************/
+int Add_Expr(int owner, int nI, int nslots, double *consts, int nconst,
+	int *code, int ninstr, int result) {
+	
+	circuit c = NewCircuit();
+	c.nI = nI;
+	c.nO = 1;
+	
+	c.iplen = 2 + 4*ninstr;
+	c.iparams = (int*)calloc(c.iplen,sizeof(int));
+	c.iparams[0] = ninstr;
+	c.iparams[1] = result;
+	memcpy(&(c.iparams[2]), code, 4*ninstr*sizeof(int));
+	
+	//constants are written once, after the inputs
+	c.vplen = 1;
+	c.vpparams = (void**)malloc(c.vplen*sizeof(void*));
+	c.vpparams[0] = calloc(nslots+1,sizeof(double));
+	memcpy((double*)(c.vpparams[0])+nI, consts, nconst*sizeof(double));
+	SetStateBuffer(&c, 0, (nslots+1)*sizeof(double));
+	
+	c.updatef = ExprUpdate;
+	
+	int index = AddToCircuits(c,owner);
+	printf("cCore: added expression with %i operations\n",ninstr);
+	return index;
+}
+
+void ExprUpdate( circuit *c ) {
+	
+	double *s = (double*)c->vpparams[0];
+	int n = c->iparams[0];
+	int *op = &(c->iparams[2]);
+	
+	for (int i = 0; i < c->nI; i++)
+		s[i] = GlobalSignals[c->inputs[i]];
+	
+	for (int k = 0; k < n; k++, op += 4) {
+		
+		double a = s[op[2]], b = s[op[3]];
+		double *d = &(s[op[1]]);
+		
+		switch(op[0]) {
+			case EXPR_ADD: *d = a + b; break;
+			case EXPR_SUB: *d = a - b; break;
+			case EXPR_MUL: *d = a * b; break;
+			case EXPR_DIV: *d = a / b; break;
+			case EXPR_POW: *d = pow(a, b); break;
+			case EXPR_MOD: *d = fmod(a, b); break;
+			case EXPR_NEG: *d = -a; break;
+			case EXPR_ABS: *d = fabs(a); break;
+			case EXPR_SQRT: *d = sqrt(a); break;
+			case EXPR_EXP: *d = exp(a); break;
+			case EXPR_LOG: *d = log(a); break;
+			case EXPR_SIN: *d = sin(a); break;
+			case EXPR_COS: *d = cos(a); break;
+			case EXPR_TAN: *d = tan(a); break;
+			case EXPR_ASIN: *d = asin(a); break;
+			case EXPR_ACOS: *d = acos(a); break;
+			case EXPR_ATAN: *d = atan(a); break;
+			case EXPR_SINH: *d = sinh(a); break;
+			case EXPR_COSH: *d = cosh(a); break;
+			case EXPR_TANH: *d = tanh(a); break;
+			case EXPR_FLOOR: *d = floor(a); break;
+			case EXPR_ATAN2: *d = atan2(a, b); break;
+			case EXPR_MIN: *d = fmin(a, b); break;
+			case EXPR_MAX: *d = fmax(a, b); break;
+			case EXPR_LOG10: *d = log10(a); break;
+			case EXPR_CEIL: *d = ceil(a); break;
+		}
+	}
+	
+	GlobalBuffers[c->outputs[0]] = s[c->iparams[1]];
+}
@@ -0,0 +1,34 @@
+#ifndef COREEXPR
+#define COREEXPR
+
+//operations of the expression circuit, same codes in vafmcircuits_math.py
+#define EXPR_ADD 0
+#define EXPR_SUB 1
+#define EXPR_MUL 2
+#define EXPR_DIV 3
+#define EXPR_POW 4
+#define EXPR_MOD 5
+#define EXPR_NEG 6
+#define EXPR_ABS 7
+#define EXPR_SQRT 8
+#define EXPR_EXP 9
+#define EXPR_LOG 10
+#define EXPR_SIN 11
+#define EXPR_COS 12
+#define EXPR_TAN 13
+#define EXPR_ASIN 14
+#define EXPR_ACOS 15
+#define EXPR_ATAN 16
+#define EXPR_SINH 17
+#define EXPR_COSH 18
+#define EXPR_TANH 19
+#define EXPR_FLOOR 20
+#define EXPR_ATAN2 21
+#define EXPR_MIN 22
+#define EXPR_MAX 23
+#define EXPR_LOG10 24
+#define EXPR_CEIL 25
+
+void ExprUpdate( circuit *c );
+
+#endif
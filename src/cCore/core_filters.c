@@ -65,6 +65,39 @@ void SKLP( circuit *c ) {
 	c->params[6] = v;
 	
 }
+///Block version of SKLP for the feed-forward regions, same operations.
+void SKLP_block( circuit *c, double **in, double **out, int n ) {
+	
+	double * restrict x = in[0], * restrict y = out[0];
+	double g = c->params[2]*c->params[3], gamma = c->params[4], alpha = c->params[5];
+	double yo = c->params[6], yoo = c->params[7], v;
+	
+	for (int s = 0; s < n; s++) {
+		v = g*x[s] + (2.0*yo-yoo) + gamma*yoo;
+		v = v * alpha;
+		y[s] = v;
+		yoo = yo;
+		yo = v;
+	}
+	
+	c->params[6] = yo;
+	c->params[7] = yoo;
+}
+///Ensemble version of SKLP for the replicas, same operations.
+void SKLP_ensemble( circuit **c, int n ) {
+	
+	double *x = GlobalSignals + c[0]->inputs[0], *y = GlobalBuffers + c[0]->outputs[0];
+	double v, *p;
+	
+	for (int r = 0; r < n; r++) {
+		p = c[r]->params;
+		v = p[2]*p[3]*x[r] + (2.0*p[6]-p[7]) + p[4]*p[7];
+		v = v * p[5];
+		y[r] = v;
+		p[7] = p[6];
+		p[6] = v;
+	}
+}
 
 
 /*********************************************************
@@ -138,6 +171,28 @@ void SKHP( circuit *c ) {
 
 
         
+}
+///Block version of SKHP for the feed-forward regions, same operations.
+void SKHP_block( circuit *c, double **in, double **out, int n ) {
+        
+        double * restrict x = in[0], * restrict y = out[0];
+        double g = c->params[2], gamma = c->params[4], alpha = c->params[5];
+        double yo = c->params[6], yoo = c->params[7], xo = c->params[8], xoo = c->params[9], v;
+        
+        for (int s = 0; s < n; s++) {
+                v = (2*yo-yoo) + gamma*yoo + g*(xoo-2.0*xo+x[s]);
+                v = v * alpha;
+                y[s] = v;
+                yoo = yo;
+                yo = v;
+                xoo = xo;
+                xo = x[s];
+        }
+        
+        c->params[6] = yo;
+        c->params[7] = yoo;
+        c->params[8] = xo;
+        c->params[9] = xoo;
 }
 
 
@@ -245,6 +300,8 @@ int Add_RCLP(int owner, double fcut, int order) {
     c.vpparams = (void**)malloc(c.vplen*sizeof(double*));
     c.vpparams[0] = (double*)calloc(order+2,sizeof(double)); //this is x
     c.vpparams[1] = (double*)calloc(order+2,sizeof(double)); //this is y
+    SetStateBuffer(&c, 0, (order+2)*sizeof(double));
+    SetStateBuffer(&c, 1, (order+2)*sizeof(double));
 
     c.updatef = RCLP;
     int index = AddToCircuits(c,owner);
@@ -271,6 +328,25 @@ void RCLP( circuit *c ) {
     GlobalBuffers[c->outputs[0]] = y[order];
     
 }
+///Block version of RCLP for the feed-forward regions, same operations.
+void RCLP_block( circuit *c, double **in, double **out, int n ) {
+    
+    double *x = (double*)c->vpparams[0];
+    double *y = (double*)c->vpparams[1];
+    int order = c->iparams[0];
+    double a = c->params[1];
+    
+    for (int s=0; s<n; s++)
+    {
+        y[0] = in[0][s];
+        for (int i=0; i<order;i++)
+        {
+            y[i+1] = (x[i]) + (y[i] - x[i]) *a;
+            x[i] = y[i+1];
+        }
+        out[0][s] = y[order];
+    }
+}
 
 
 
@@ -307,6 +383,8 @@ int Add_RCHP(int owner, double fcut, int order) {
     c.vpparams = (void**)malloc(c.vplen*sizeof(double*));
     c.vpparams[0] = (double*)calloc(order+2,sizeof(double)); //this is x
     c.vpparams[1] = (double*)calloc(order+2,sizeof(double)); //this is y
+    SetStateBuffer(&c, 0, (order+2)*sizeof(double));
+    SetStateBuffer(&c, 1, (order+2)*sizeof(double));
 
 
     printf("cCore: added RCHP filter\n");
@@ -338,4 +416,22 @@ void RCHP( circuit *c ) {
     GlobalBuffers[c->outputs[0]] = y[order];
 
 }
+///Block version of RCHP for the feed-forward regions, same operations.
+void RCHP_block( circuit *c, double **in, double **out, int n ) {
+
+    double *x = (double*)c->vpparams[0];
+    double *y = (double*)c->vpparams[1];
+    int order = c->iparams[0];
+    double a = c->params[1];
+
+    for (int s=0; s<n; s++)
+    {
+        y[0] = in[0][s];
+        for (int i=1; i<order+1;i++)
+            y[i] = ( x[i] + y[i-1] - x[i-1] ) *a;
+        for (int i=0; i<order+1;i++)
+            x[i] = y[i];
+        out[0][s] = y[order];
+    }
+}
 
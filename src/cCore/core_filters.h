@@ -14,4 +14,13 @@ void RCLP( circuit *c );
 int add_RCHP( int owner, double fcut, int order);
 void RCHP( circuit *c );
 
+//block versions for the feed-forward regions
+void SKLP_block( circuit *c, double **in, double **out, int n );
+void SKHP_block( circuit *c, double **in, double **out, int n );
+void RCLP_block( circuit *c, double **in, double **out, int n );
+void RCHP_block( circuit *c, double **in, double **out, int n );
+
+//ensemble versions for the replicas
+void SKLP_ensemble( circuit **c, int n );
+
 #endif
@@ -30,7 +30,7 @@ int Add_i3Dlin( int owner, int components) {
 
     circuit c = NewCircuit();
     c.nI = 3;
-    c.nO = components;
+    c.nO = components+1; //forces and the out of bounds flag
 
     c.iplen = 9;
     c.iparams = (int*)calloc(c.iplen,sizeof(int));
@@ -96,6 +96,25 @@ int i3Dlin_pbc( int c, int x, int y, int z) {
     
     return 0;
 }
+/***********************************************************************
+ * Makes circuit c use the given components of a force field, with the
+ * same grid, instead of its own ones. The shared field is never freed.
+ * The arrays of the circuit are freed if owned is 1, and with field NULL
+ * the circuit gets new arrays of its own, to be sized with i3Dlin_npts.
+ * Python callable.
+***********************************************************************/
+int i3Dlin_share( int c, double **field, int owned) {
+
+    for (int i = 0; i < circuits[c].iparams[0]; i++) {
+	if(owned == 1) free(circuits[c].vpparams[i]);
+	if(field != NULL)
+	    circuits[c].vpparams[i] = field[i];
+	else
+	    circuits[c].vpparams[i] = (double*)calloc(1, sizeof(double));
+    }
+
+    return 0;
+}
 
 void i3Dlin( circuit *c ) {
     
@@ -131,6 +150,7 @@ void i3Dlin( circuit *c ) {
     	oob = 1;
     for (int comp=0; comp<c->iparams[0]; comp++)
 	    GlobalBuffers[c->outputs[comp]] = 0;
+	GlobalBuffers[c->outputs[c->iparams[0]]] = 0;
 	return;
     }
 
@@ -141,8 +161,10 @@ void i3Dlin( circuit *c ) {
 	printf("WARNING! i3Dlin OOB!\n");
 	for (int comp=0; comp<c->iparams[0]; comp++)
 	    GlobalBuffers[c->outputs[comp]] = 0;
+	GlobalBuffers[c->outputs[c->iparams[0]]] = 1;
 	return;
     }
+    GlobalBuffers[c->outputs[c->iparams[0]]] = 0;
     
     //interpolate
     int idx[3], idxx[3];
@@ -264,7 +286,7 @@ int Add_i1Dlin( int owner, int components, double dx, int pbc) {
 	c.params[0] = dx;
 	c.params[1] = dx*2;
 	
-	c.iplen = 2;
+	c.iplen = 3;
 	c.iparams = (int*)calloc(c.iplen,sizeof(int));
 	c.iparams[0] = 2;
 	c.iparams[1] = components;
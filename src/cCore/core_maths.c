@@ -9,6 +9,10 @@ Arithmetic circuits definitions.
 #include "circuit.h"
 #endif
 
+#ifndef CORERANDOM
+#include "core_random.h"
+#endif
+
 #ifndef COREMATHS
 #include "core_maths.h"
 #endif
@@ -136,6 +140,140 @@ void opCOS( circuit *c ) {
  
 }
 
+/*********************************************************
+ * Block versions of the arithmetic circuits, used in the
+ * feed-forward regions (see core_block.c). in[k] and out[k]
+ * are the values of input and output k over n steps.
+ * The operations are done in the same order as above, so
+ * the results are the same.
+ * ******************************************************/
+void opADD_block( circuit *c, double **in, double **out, int n ) {
+    
+    double * restrict y = out[0];
+    for(int s=0; s<n; s++) y[s] = 0;
+    for(int i=0; i<c->nI; i++) {
+        double * restrict x = in[i];
+        for(int s=0; s<n; s++) y[s] += x[s];
+    }
+}
+void opSUB_block( circuit *c, double **in, double **out, int n ) {
+    
+    double * restrict y = out[0], * restrict a = in[0], * restrict b = in[1];
+    for(int s=0; s<n; s++) y[s] = a[s]-b[s];
+}
+void opMUL_block( circuit *c, double **in, double **out, int n ) {
+    
+    double * restrict y = out[0];
+    for(int s=0; s<n; s++) y[s] = 1;
+    for(int i=0; i<c->nI; i++) {
+        double * restrict x = in[i];
+        for(int s=0; s<n; s++) y[s] *= x[s];
+    }
+}
+void opDIV_block( circuit *c, double **in, double **out, int n ) {
+    
+    double * restrict y = out[0], * restrict a = in[0], * restrict b = in[1];
+    for(int s=0; s<n; s++) y[s] = a[s]/b[s];
+}
+void opABS_block( circuit *c, double **in, double **out, int n ) {
+    
+    double * restrict y = out[0], * restrict a = in[0];
+    for(int s=0; s<n; s++) y[s] = fabs(a[s]);
+}
+void opPOW_block( circuit *c, double **in, double **out, int n ) {
+    
+    double * restrict y = out[0], * restrict a = in[0], * restrict b = in[1];
+    for(int s=0; s<n; s++) y[s] = pow(a[s],b[s]);
+}
+void opLINC_block( circuit *c, double **in, double **out, int n ) {
+    
+    double * restrict y = out[0];
+    for(int s=0; s<n; s++) y[s] = 0;
+    for(int i=0; i < c->nI; i+=2) {
+        double * restrict a = in[i], * restrict b = in[i+1];
+        for(int s=0; s<n; s++) y[s] += a[s]*b[s];
+    }
+}
+void opSIN_block( circuit *c, double **in, double **out, int n ) {
+    
+    double * restrict y = out[0], * restrict a = in[0];
+    for(int s=0; s<n; s++) y[s] = sin(a[s]);
+}
+void opCOS_block( circuit *c, double **in, double **out, int n ) {
+    
+    double * restrict y = out[0], * restrict a = in[0];
+    for(int s=0; s<n; s++) y[s] = cos(a[s]);
+}
+
+/*********************************************************
+ * Ensemble versions of the arithmetic circuits, used to
+ * update all the replicas together (see core_ensemble.c).
+ * c[r] is the circuit of replica r, the values of a channel
+ * in the n replicas follow each other in the signals and
+ * buffers. The operations are done in the same order as
+ * above, so the results are the same.
+ * ******************************************************/
+void opADD_ensemble( circuit **c, int n ) {
+    
+    double * restrict y = GlobalBuffers + c[0]->outputs[0];
+    for(int r=0; r<n; r++) y[r] = 0;
+    for(int i=0; i<c[0]->nI; i++) {
+        double * restrict x = GlobalSignals + c[0]->inputs[i];
+        for(int r=0; r<n; r++) y[r] += x[r];
+    }
+}
+void opSUB_ensemble( circuit **c, int n ) {
+    
+    double * restrict y = GlobalBuffers + c[0]->outputs[0];
+    double * restrict a = GlobalSignals + c[0]->inputs[0], * restrict b = GlobalSignals + c[0]->inputs[1];
+    for(int r=0; r<n; r++) y[r] = a[r]-b[r];
+}
+void opMUL_ensemble( circuit **c, int n ) {
+    
+    double * restrict y = GlobalBuffers + c[0]->outputs[0];
+    for(int r=0; r<n; r++) y[r] = 1;
+    for(int i=0; i<c[0]->nI; i++) {
+        double * restrict x = GlobalSignals + c[0]->inputs[i];
+        for(int r=0; r<n; r++) y[r] *= x[r];
+    }
+}
+void opDIV_ensemble( circuit **c, int n ) {
+    
+    double * restrict y = GlobalBuffers + c[0]->outputs[0];
+    double * restrict a = GlobalSignals + c[0]->inputs[0], * restrict b = GlobalSignals + c[0]->inputs[1];
+    for(int r=0; r<n; r++) y[r] = a[r]/b[r];
+}
+void opABS_ensemble( circuit **c, int n ) {
+    
+    double * restrict y = GlobalBuffers + c[0]->outputs[0], * restrict a = GlobalSignals + c[0]->inputs[0];
+    for(int r=0; r<n; r++) y[r] = fabs(a[r]);
+}
+void opPOW_ensemble( circuit **c, int n ) {
+    
+    double * restrict y = GlobalBuffers + c[0]->outputs[0];
+    double * restrict a = GlobalSignals + c[0]->inputs[0], * restrict b = GlobalSignals + c[0]->inputs[1];
+    for(int r=0; r<n; r++) y[r] = pow(a[r],b[r]);
+}
+void opLINC_ensemble( circuit **c, int n ) {
+    
+    double * restrict y = GlobalBuffers + c[0]->outputs[0];
+    for(int r=0; r<n; r++) y[r] = 0;
+    for(int i=0; i < c[0]->nI; i+=2) {
+        double * restrict a = GlobalSignals + c[0]->inputs[i], * restrict b = GlobalSignals + c[0]->inputs[i+1];
+        for(int r=0; r<n; r++) y[r] += a[r]*b[r];
+    }
+}
+void opSIN_ensemble( circuit **c, int n ) {
+    
+    double * restrict y = GlobalBuffers + c[0]->outputs[0], * restrict a = GlobalSignals + c[0]->inputs[0];
+    for(int r=0; r<n; r++) y[r] = sin(a[r]);
+}
+void opCOS_ensemble( circuit **c, int n ) {
+    
+    double * restrict y = GlobalBuffers + c[0]->outputs[0], * restrict a = GlobalSignals + c[0]->inputs[0];
+    for(int r=0; r<n; r++) y[r] = cos(a[r]);
+}
+
 
 int Add_Perlin(int owner, double amp, double p, int oct, double period) {
     
@@ -156,20 +294,26 @@ int Add_Perlin(int owner, double amp, double p, int oct, double period) {
     c.iparams[1] = (int)floor(period/dt); //duration
     c.iparams[2] = 0;
     
-    c.vplen = oct;
+    c.vplen = oct+1;
     c.vpparams = (double**)malloc(c.vplen*sizeof(double*));
+    //the last one is the random stream
+    rng *r = NewRandom();
+    c.vpparams[oct] = r;
+    SetStateBuffer(&c, oct, sizeof(rng));
+    
     //each pointer points to an array for the octave
     int len = 1;
     for (int i = 0; i < oct; i++) {
-        double* octave = (double*)calloc(len+1,sizeof(double));
-        c.vpparams[i] = octave;
-        
-        for (int j = 0; j < len+1; j++) {
-            
-            octave[j] = (2*(rand()/(double)RAND_MAX)-1);
+        c.vpparams[i] = (double*)calloc(len+1,sizeof(double));
+        SetStateBuffer(&c, i, (len+1)*sizeof(double));
+        len *=2;
+    }
+    perlin_populate(c.vpparams, oct);
+    
+    len = 1;
+    for (int i = 0; i < oct; i++) {
+        for (int j = 0; j < len+1; j++)
             printf("cCore: %i %i %lf\n",i,j,((double*)c.vpparams[i])[j]);
-        }
-        
         len *=2;
     }
     
@@ -181,8 +325,23 @@ int Add_Perlin(int owner, double amp, double p, int oct, double period) {
     
 }
 
+///Fills the octaves with new random values, drawn from the stream in array[oct].
+void perlin_populate(void** array, int oct) {
+
+    rng *r = (rng*)array[oct];
+    int len = 1;
+    for (int i = 0; i < oct; i++) {
+        
+        double* w = (double*)array[i];
+        for (int j = 0; j < len+1; j++)
+            w[j] = 2*RandomUniform(r)-1;
+        len *=2;
+    }
+}
+
 void perlin_repopulate(void** array, int oct) {
 
+    rng *r = (rng*)array[oct];
     int len = 1;
     for (int i = 0; i < oct; i++) {
         
@@ -190,7 +349,7 @@ void perlin_repopulate(void** array, int oct) {
         w[0] = w[len]; //copy the last value to make the noise smooth
         
         for (int j = 1; j < len+1; j++) {
-            w[j] = (2*(rand()/(double)RAND_MAX)-1);
+            w[j] = 2*RandomUniform(r)-1;
             //printf("cCore: %i %i %lf\n",i,j,((double*)c.vpparams[i])[j]);
         }
         len *=2;
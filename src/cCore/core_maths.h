@@ -11,8 +11,31 @@ void opLINC( circuit *c );
 void opSIN( circuit *c );
 void opCOS( circuit *c );
 
+//block versions for the feed-forward regions
+void opADD_block( circuit *c, double **in, double **out, int n );
+void opSUB_block( circuit *c, double **in, double **out, int n );
+void opMUL_block( circuit *c, double **in, double **out, int n );
+void opDIV_block( circuit *c, double **in, double **out, int n );
+void opABS_block( circuit *c, double **in, double **out, int n );
+void opPOW_block( circuit *c, double **in, double **out, int n );
+void opLINC_block( circuit *c, double **in, double **out, int n );
+void opSIN_block( circuit *c, double **in, double **out, int n );
+void opCOS_block( circuit *c, double **in, double **out, int n );
+
+//ensemble versions for the replicas
+void opADD_ensemble( circuit **c, int n );
+void opSUB_ensemble( circuit **c, int n );
+void opMUL_ensemble( circuit **c, int n );
+void opDIV_ensemble( circuit **c, int n );
+void opABS_ensemble( circuit **c, int n );
+void opPOW_ensemble( circuit **c, int n );
+void opLINC_ensemble( circuit **c, int n );
+void opSIN_ensemble( circuit **c, int n );
+void opCOS_ensemble( circuit **c, int n );
+
 
 void perlin( circuit* c );
+void perlin_populate(void** array, int oct);
 void perlin_repopulate(void** array, int oct);
 
 
@@ -2,6 +2,10 @@
 Output circuits definitions.
  *********************************************************/
 #include <stdio.h>
+#include <math.h>
+#include <stdlib.h>
+#include <string.h>
+#include <unistd.h>
 
 #ifndef CIRCUIT
 #include "circuit.h"
@@ -11,6 +15,10 @@ Output circuits definitions.
 #include "core_output.h"
 #endif
 
+#ifndef COREWRITER
+#include "core_writer.h"
+#endif
+
 
 
 int Add_output(int owner, char* filename, int dump) {
@@ -20,17 +28,23 @@ int Add_output(int owner, char* filename, int dump) {
     c.nI = 1;
     c.nO = 0;
 
-    c.iplen = 4;
+    c.iplen = 8;
     c.iparams = (int*)calloc(c.iplen,sizeof(int));
     c.iparams[0] = dump;
     c.iparams[1] = 0; //step counter
     c.iparams[2] = 0; //number of channels to print
     c.iparams[3] = 1; // 0|1 stop|start
+    c.iparams[4] = OUTPUT_TEXT; //format of the records
+    c.iparams[5] = sizeof(double); //bytes of each binary value
+    c.iparams[6] = 0; //bytes of the header
+    c.iparams[7] = -1; //position of the record count in the header, -1 if none
 
-    c.vplen = 2;
-    c.vpparams = (void**)malloc(sizeof(FILE*));//one element
+    c.vplen = 4;
+    c.vpparams = (void**)malloc(c.vplen*sizeof(void*));
     c.vpparams[0] = (void*)fopen(filename, "w");
-    c.vpparams[1] = (int*)calloc(3,sizeof(int));//channels info
+    c.vpparams[1] = (int*)calloc(4,sizeof(int));//channels info
+    c.vpparams[2] = NewWriter((FILE*)c.vpparams[0]); //records waiting to be written
+    c.vpparams[3] = NULL; //accumulators of the reducers, if any
     
 
     c.updatef = output;
@@ -56,42 +70,48 @@ int output_stop(int c) {
 }
 
 
-int output_register(int outer, int cindex, int chindex, int isInput) {
+/***********************************************************************
+ * Adds a channel to the channels of output or recorder outer, with
+ * the reducer applied to its values between two records.
+ * Python callable.
+***********************************************************************/
+int output_register(int outer, int cindex, int chindex, int isInput, int reduce) {
 
-    circuits[outer].iparams[2]++; //increment the number of registered channels
-    //circuits[outer].iplen+=3;
-    //circuits[outer].iparams = (int*)realloc(circuits[outer].iparams,
-     //   circuits[outer].iplen*sizeof(int));
-    circuits[outer].vpparams[1] = (int*)realloc(circuits[outer].vpparams[1],
-        3*circuits[outer].iparams[2]*sizeof(int));
-    //printf("reallocating to size: %d\n",(2+circuits[outer].iparams[1]));
+    circuit *c = &(circuits[outer]);
+    c->iparams[2]++; //increment the number of registered channels
+    int n = c->iparams[2];
+    c->vpparams[1] = (int*)realloc(c->vpparams[1], 4*n*sizeof(int));
     
-    int* regs = (int*)circuits[outer].vpparams[1];
-    int reglen = 3*circuits[outer].iparams[2];
+    //the new channel has to be pushed at the end of the step
+    cEngine->compiled = 0;
+    
+    int* regs = (int*)c->vpparams[1];
+    int reglen = 4*n;
     
     circuit *owner = &(circuits[cindex]);
     if(owner->isContainer == 1) {
         
         int dummy = (isInput==1)? owner->dummyin[chindex] : owner->dummyout[chindex];
-        //circuits[outer].iparams[circuits[outer].iplen-3] = dummy;
-        regs[reglen-3] = dummy;
-        //circuits[outer].iparams[circuits[outer].iplen-2] = 0;
-        regs[reglen-2] = 0;
-        //circuits[outer].iparams[circuits[outer].iplen-1] = isInput;
-        regs[reglen-1] = isInput;
+        regs[reglen-4] = dummy;
+        regs[reglen-3] = 0;
+        regs[reglen-2] = isInput;
         
     }
     else {
         //circuit ID
-        //circuits[outer].iparams[circuits[outer].iplen-3] = cindex;
-        regs[reglen-3] = cindex;
-        //circuits[outer].iparams[circuits[outer].iplen-2] = chindex;
-        regs[reglen-2] = chindex;
-        //circuits[outer].iparams[circuits[outer].iplen-1] = isInput;
-        regs[reglen-1] = isInput;
+        regs[reglen-4] = cindex;
+        regs[reglen-3] = chindex;
+        regs[reglen-2] = isInput;
     }
+    regs[reglen-1] = reduce;
     
-    //printf("cCore: registering done\n");
+    //accumulators of the reducers, and the steps in the window
+    if(reduce != REDUCE_LAST || c->vpparams[3] != NULL) {
+        c->vpparams[3] = realloc(c->vpparams[3], (n+1)*sizeof(double));
+        ((double*)c->vpparams[3])[n] = 0;
+        ((double*)c->vpparams[3])[n-1] = 0;
+        SetStateBuffer(c, 3, (n+1)*sizeof(double));
+    }
     
     return 0;
 }
@@ -115,9 +135,70 @@ void output_dump( int index ) {
 }
 void output_dumpmessage( int index, char* message ) {
     
+    if(circuits[index].iparams[4] != OUTPUT_TEXT) {
+        printf("cERROR: output %d writes binary records, messages are not written!\n",index);
+        return;
+    }
     //circuits[index].updatef(&(circuits[index]));
-    fprintf(circuits[index].vpparams[0], "%s\n",message);
-    fflush(circuits[index].vpparams[0]);
+    outwriter *w = (outwriter*)circuits[index].vpparams[2];
+    if(w == NULL) return;
+    int n = strlen(message);
+    char *p = WriterReserve(w, n+1);
+    memcpy(p, message, n);
+    p[n] = '\n';
+    WriterCommit(w, n+1);
+}
+
+/***********************************************************************
+ * Internal function. Adds the values of this step to the accumulators
+ * of the reducers of c. The first step of a window starts them.
+***********************************************************************/
+static void output_accumulate( circuit *c ) {
+    
+    int* regs = (int*)c->vpparams[1];
+    double *acc = (double*)c->vpparams[3];
+    int n = c->iparams[2];
+    
+    for(int i=0; i < n; i++){
+        
+        int feedidx;
+        if(regs[4*i+2] == 1) 
+            feedidx = circuits[regs[4*i]].inputs[regs[4*i+1]];
+        else
+            feedidx = circuits[regs[4*i]].outputs[regs[4*i+1]];
+        double v = GlobalSignals[feedidx];
+        
+        switch(regs[4*i+3]) {
+            case REDUCE_MEAN: acc[i] = (acc[n] == 0)? v : acc[i]+v; break;
+            case REDUCE_RMS: acc[i] = (acc[n] == 0)? v*v : acc[i]+v*v; break;
+            case REDUCE_MIN: acc[i] = (acc[n] == 0 || v < acc[i])? v : acc[i]; break;
+            case REDUCE_MAX: acc[i] = (acc[n] == 0 || v > acc[i])? v : acc[i]; break;
+        }
+    }
+    acc[n] += 1;
+}
+
+/***********************************************************************
+ * Internal function. Value of registered channel i of c in a record:
+ * the reduction of its values in the window, or its value now.
+***********************************************************************/
+static inline double output_value( circuit *c, int i ) {
+    
+    int* regs = (int*)c->vpparams[1];
+    double *acc = (double*)c->vpparams[3];
+    int n = c->iparams[2];
+    
+    switch(regs[4*i+3]) {
+        case REDUCE_MEAN: return acc[i]/acc[n];
+        case REDUCE_RMS: return sqrt(acc[i]/acc[n]);
+        case REDUCE_MIN:
+        case REDUCE_MAX: return acc[i];
+        case REDUCE_COUNT: return acc[n];
+    }
+    
+    if(regs[4*i+2] == 1) 
+        return GlobalSignals[circuits[regs[4*i]].inputs[regs[4*i+1]]];
+    return GlobalSignals[circuits[regs[4*i]].outputs[regs[4*i+1]]];
 }
 
 /*void output_printout( circuit *c ) {
@@ -133,22 +214,69 @@ void output_dumpmessage( int index, char* message ) {
 }*/
 void output_printout( circuit *c ) {
     
+    outwriter *w = (outwriter*)c->vpparams[2];
+    int n = c->iparams[2];
+    if(w == NULL) return;
+    
+    //one fixed size record with all the values
+    if(c->iparams[4] == OUTPUT_BINARY) {
+        
+        char *rec = WriterReserve(w, n*c->iparams[5]);
+        for(int i=0; i < n; i++) {
+            if(c->iparams[5] == sizeof(float))
+                ((float*)rec)[i] = (float)output_value(c, i);
+            else
+                ((double*)rec)[i] = output_value(c, i);
+        }
+        WriterCommit(w, n*c->iparams[5]);
+    }
+    else {
+        //room for the longest %e of each value
+        char *line = WriterReserve(w, 16*n+1), *p = line;
+        for(int i=0; i < n; i++)
+            p += sprintf(p, "%e ", output_value(c, i));
+        *(p++) = '\n';
+        WriterCommit(w, p-line);
+    }
+    
+    //start a new window
+    if(c->vpparams[3] != NULL)
+        ((double*)c->vpparams[3])[n] = 0;
+}
+
+/***********************************************************************
+ * Adds flag to mark[i] for all the feeds i printed by output circuit c.
+ * Used by the schedule compiler to find the signals that are read.
+***********************************************************************/
+void output_feeds( circuit *c, char *mark, char flag ) {
+    
     int* regs = (int*)c->vpparams[1];
     
     for(int i=0; i < c->iparams[2]; i++){
         
-        //printf("%lf ",GlobalSignals[regs[3*i]]);
-        int feedidx;
-        if(regs[3*i+2] == 1) 
-            feedidx = circuits[regs[3*i]].inputs[regs[3*i+1]];
+        if(regs[4*i+2] == 1) 
+            mark[circuits[regs[4*i]].inputs[regs[4*i+1]]] |= flag;
         else
-            feedidx = circuits[regs[3*i]].outputs[regs[3*i+1]];
-        
-        fprintf((c->vpparams[0]), "%e ", GlobalSignals[feedidx]);
+            mark[circuits[regs[4*i]].outputs[regs[4*i+1]]] |= flag;
+    }
+}
+
+/***********************************************************************
+ * Puts the feeds printed by output circuit c in feeds, if it is not
+ * NULL, and returns their number.
+***********************************************************************/
+int output_feedlist( circuit *c, int *feeds ) {
+    
+    int* regs = (int*)c->vpparams[1];
+    
+    for(int i=0; i < c->iparams[2] && feeds != NULL; i++){
         
+        if(regs[4*i+2] == 1) 
+            feeds[i] = circuits[regs[4*i]].inputs[regs[4*i+1]];
+        else
+            feeds[i] = circuits[regs[4*i]].outputs[regs[4*i+1]];
     }
-    //printf("\n");
-    fprintf((c->vpparams[0]), "\n");
+    return c->iparams[2];
 }
 
 void output_printout_old( circuit *c ) {
@@ -158,7 +286,7 @@ void output_printout_old( circuit *c ) {
     for(int i=0; i < c->iplen; i++){
         
         //printf("%lf ",GlobalSignals[c->iparams[i]]);
-        printf("%lf ",GlobalSignals[regs[3*i]]);
+        printf("%lf ",GlobalSignals[regs[4*i]]);
         int feedidx;
         if(c->iparams[i+2] == 1) 
             feedidx = circuits[c->iparams[i]].inputs[c->iparams[i+1]];
@@ -172,10 +300,89 @@ void output_printout_old( circuit *c ) {
     fprintf((c->vpparams[0]), "\n");
 }
 
+/***********************************************************************
+ * Sets the format of the records of output circuit outer: OUTPUT_TEXT,
+ * or OUTPUT_BINARY with values of width bytes (4 or 8). The file is
+ * started again with the n bytes of header. The number of records is
+ * written at byte countpos of the header when the file is flushed,
+ * unless countpos is -1. The format cannot change once some records
+ * were written. Python callable.
+***********************************************************************/
+int output_format(int outer, int format, int width, char *header, int n, int countpos) {
+    
+    circuit *c = &(circuits[outer]);
+    FILE *f = (FILE*)c->vpparams[0];
+    
+    if(c->vpparams[2] == NULL)
+        return 1;
+    WriterDrain((outwriter*)c->vpparams[2]);
+    if(ftell(f) != c->iparams[6]) {
+        printf("cERROR: output %d already wrote some records, the format cannot change!\n",outer);
+        return 1;
+    }
+    
+    rewind(f);
+    ftruncate(fileno(f), 0);
+    fwrite(header, 1, n, f);
+    
+    c->iparams[4] = format;
+    c->iparams[5] = width;
+    c->iparams[6] = n;
+    c->iparams[7] = countpos;
+    
+    return 0;
+}
+
+///Writes the records of output circuit outer in the file, waits
+///until they are written, and returns the size of the file, or -1
+///if it is closed. Python callable.
+long long output_flush(int outer) {
+  
+  circuit *c = &(circuits[outer]);
+  FILE *f = (FILE*)c->vpparams[0];
+  if(c->vpparams[2] == NULL)
+    return -1;
+  
+  WriterDrain((outwriter*)c->vpparams[2]);
+  long long size = (long long)ftell(f);
+  
+  //update the record count in the header
+  if(c->iparams[7] >= 0 && c->iparams[2] > 0) {
+    long long record = c->iparams[5]*c->iparams[2];
+    if(c->updatef == scope)
+        record *= c->iparams[0] + c->iparams[8]; //one record per event
+    long long records = (size - c->iparams[6]) / record;
+    fseek(f, c->iparams[7], SEEK_SET);
+    fprintf(f, "%20lld", records);
+    fseek(f, size, SEEK_SET);
+    fflush(f);
+  }
+  
+  return size;
+}
+
+///Writes n bytes of data in the file of output circuit outer.
+///Python callable.
+int output_write(int outer, char *data, int n) {
+  
+  if(circuits[outer].vpparams[2] == NULL)
+    return 1;
+  WriterWrite((outwriter*)circuits[outer].vpparams[2], data, n);
+  return 0;
+}
+
 int output_close(int outer) {
   
+  if(circuits[outer].vpparams[2] == NULL)
+    return 1;
+  output_flush(outer);
+  WriterClose((outwriter*)circuits[outer].vpparams[2]);
   fclose(circuits[outer].vpparams[0]);
   
+  //nothing is written after closing
+  circuits[outer].vpparams[2] = NULL;
+  circuits[outer].iparams[3] = 0;
+  
   return 0;
 }
 
@@ -186,6 +393,12 @@ void output( circuit *c ) {
     if(c->iparams[3] == 0) {
         return;
     }
+    //replicas share the file, only the first one writes
+    if(cEngine->replica > 0) {
+        return;
+    }
+    if(c->vpparams[3] != NULL)
+        output_accumulate(c);
 
     if(c->iparams[0] <= 0) {
         //printf("asd!\n");
@@ -208,3 +421,408 @@ void output( circuit *c ) {
 }
 
 
+/*************************************
+    in[0]: record
+    iparams[0]: dump
+    iparams[1]: step counter
+    iparams[2]: number of channels to record
+    iparams[3]: 0|1 stop|start
+    vpparams[0]: recorded data
+    vpparams[1]: channels info, as in output
+    vpparams[3]: accumulators of the reducers, as in output
+ * **********************************/
+int Add_recorder(int owner, int dump, int capacity, int ring) {
+
+    circuit c = NewCircuit();
+
+    c.nI = 1;
+    c.nO = 0;
+
+    c.iplen = 4;
+    c.iparams = (int*)calloc(c.iplen,sizeof(int));
+    c.iparams[0] = dump;
+    c.iparams[1] = 0;
+    c.iparams[2] = 0;
+    c.iparams[3] = 1;
+
+    recbuffer *r = (recbuffer*)calloc(1,sizeof(recbuffer));
+    r->cap = (capacity > 0)? capacity : 1;
+    r->ring = ring;
+
+    c.vplen = 4;
+    c.vpparams = (void**)malloc(c.vplen*sizeof(void*));
+    c.vpparams[0] = r;
+    c.vpparams[1] = (int*)calloc(4,sizeof(int));
+    c.vpparams[2] = NULL; //no writer
+    c.vpparams[3] = NULL; //accumulators of the reducers, if any
+
+    c.updatef = recorder;
+
+    int index = AddToCircuits(c, owner);
+
+    printf("cCore: added recorder %i.\n",index);
+    return index;
+}
+
+/***********************************************************************
+ * Internal function. Space for the next record of r, with n values.
+ * The buffer doubles when it is full, unless it is a ring. Previous
+ * buffers are kept until recorder_clear, since python may have views.
+***********************************************************************/
+static double* recorder_next(recbuffer *r, int n) {
+
+    //first record, or the channels changed after a clear
+    if(r->data == NULL || r->width != n) {
+        if(r->data != NULL) {
+            r->old = (double**)realloc(r->old, (r->nold+1)*sizeof(double*));
+            r->old[r->nold++] = r->data;
+        }
+        r->data = (double*)malloc(r->cap*n*sizeof(double)+1);
+        r->width = n;
+    }
+
+    if(r->ring == 0 && r->n == r->cap) {
+        double *data = (double*)malloc(2*r->cap*n*sizeof(double));
+        memcpy(data, r->data, r->cap*n*sizeof(double));
+        r->old = (double**)realloc(r->old, (r->nold+1)*sizeof(double*));
+        r->old[r->nold++] = r->data;
+        r->data = data;
+        r->cap *= 2;
+    }
+
+    return &(r->data[(r->n++ % r->cap)*n]);
+}
+
+///Stores the values of the registered channels in a new record.
+void recorder_store( circuit *c ) {
+
+    int n = c->iparams[2];
+    double *rec = recorder_next((recbuffer*)c->vpparams[0], n);
+
+    for(int i=0; i < n; i++)
+        rec[i] = output_value(c, i);
+
+    //start a new window
+    if(c->vpparams[3] != NULL)
+        ((double*)c->vpparams[3])[n] = 0;
+}
+
+void recorder( circuit *c ) {
+
+    if(c->iparams[3] == 0)
+        return;
+    //only the first replica records
+    if(cEngine->replica > 0)
+        return;
+    if(c->vpparams[3] != NULL)
+        output_accumulate(c);
+
+    if(c->iparams[0] <= 0) {
+        if(GlobalSignals[c->inputs[0]] > 0)
+            recorder_store(c);
+        return;
+    }
+
+    c->iparams[1]++;
+    if(c->iparams[1] >= c->iparams[0]) {
+        recorder_store(c);
+        c->iparams[1] = 0;
+    }
+}
+
+///Records of recorder c, or events of scope c.
+static recbuffer* recorder_buffer( circuit *c ) {
+
+    return (recbuffer*)((c->updatef == scope)? c->vpparams[4] : c->vpparams[0]);
+}
+
+/***********************************************************************
+ * Puts in info the number of records written since the last clear,
+ * the capacity and the index of the oldest record kept, and returns
+ * the number of records kept. Python callable.
+***********************************************************************/
+long long recorder_info(int outer, long long *info) {
+
+    recbuffer *r = recorder_buffer(&(circuits[outer]));
+    long long kept = (r->n < r->cap)? r->n : r->cap;
+
+    info[0] = r->n;
+    info[1] = r->cap;
+    info[2] = (r->n > r->cap)? r->n % r->cap : 0;
+    return kept;
+}
+
+///Buffer of the records of recorder outer, NULL if empty. Python callable.
+double* recorder_data(int outer) {
+
+    return recorder_buffer(&(circuits[outer]))->data;
+}
+
+/***********************************************************************
+ * Appends the last n records of a run that wrote total records, with
+ * the values of the registered channels. Used to replay cached runs.
+ * Python callable.
+***********************************************************************/
+int recorder_append(int outer, double *data, long long n, long long total) {
+
+    circuit *c = &(circuits[outer]);
+    recbuffer *r = recorder_buffer(c);
+    int nch = c->iparams[2];
+    if(c->updatef == scope)
+        nch *= c->iparams[0] + c->iparams[8]; //one record per event
+
+    r->n += total - n;
+    for(long long i=0; i < n; i++)
+        memcpy(recorder_next(r, nch), &(data[i*nch]), nch*sizeof(double));
+
+    return 0;
+}
+
+/***********************************************************************
+ * Removes the records of recorder outer, and frees the previous buffers.
+ * Python callable.
+***********************************************************************/
+int recorder_clear(int outer) {
+
+    recbuffer *r = recorder_buffer(&(circuits[outer]));
+
+    r->n = 0;
+    for(int i=0; i < r->nold; i++)
+        free(r->old[i]);
+    free(r->old);
+    r->old = NULL;
+    r->nold = 0;
+
+    return 0;
+}
+
+/*************************************
+    in[0]: trigger
+    out[0]: events
+    iparams[0]: pre-trigger samples
+    iparams[1]: samples in the ring, up to pre+post
+    iparams[2]: number of channels to capture
+    iparams[3]: 0|1 stop|start
+    iparams[4..7]: format of the file, as in output
+    iparams[8]: post-trigger samples, the trigger one included
+    iparams[9]: hold-off steps after an event
+    iparams[10]: maximum number of events, 0 for no limit with a file
+    iparams[11]: edge: 1 rising, -1 falling, 0 both
+    iparams[12]: post-trigger samples still to capture, 0 if armed
+    iparams[13]: hold-off steps left
+    iparams[14]: events captured
+    iparams[15]: position of the next sample in the ring
+    iparams[16]: 1 if params[1] has the previous trigger value
+    params[0]: trigger level
+    params[1]: previous trigger value
+    vpparams[0]: file, NULL to keep the events in memory
+    vpparams[1]: channels info, as in output
+    vpparams[2]: writer of the file, NULL if none
+    vpparams[3]: unused, the channels are not reduced
+    vpparams[4]: events kept in memory, NULL with a file
+    vpparams[5]: ring of the last pre+post samples
+ * **********************************/
+int Add_scope(int owner, char* filename, int pre, int post, int holdoff, int maxevents, int edge, double level) {
+
+    if(pre < 0 || post < 1) {
+        printf("cERROR: scope needs pre >= 0 and post >= 1 samples!\n");
+        return -1;
+    }
+    if(filename == NULL && maxevents < 1) {
+        printf("cERROR: scope without a file needs maxevents >= 1!\n");
+        return -1;
+    }
+
+    circuit c = NewCircuit();
+
+    c.nI = 1;
+    c.nO = 1;
+
+    c.iplen = 17;
+    c.iparams = (int*)calloc(c.iplen,sizeof(int));
+    c.iparams[0] = pre;
+    c.iparams[3] = 1;
+    c.iparams[4] = OUTPUT_BINARY;
+    c.iparams[5] = sizeof(double);
+    c.iparams[7] = -1;
+    c.iparams[8] = post;
+    c.iparams[9] = holdoff;
+    c.iparams[10] = maxevents;
+    c.iparams[11] = edge;
+
+    c.plen = 2;
+    c.params = (double*)calloc(c.plen,sizeof(double));
+    c.params[0] = level;
+
+    c.vplen = 6;
+    c.vpparams = (void**)calloc(c.vplen,sizeof(void*));
+    c.vpparams[1] = (int*)calloc(4,sizeof(int));
+    if(filename != NULL) {
+        c.vpparams[0] = (void*)fopen(filename, "w");
+        c.vpparams[2] = NewWriter((FILE*)c.vpparams[0]);
+    }
+    else {
+        //room for all the events, it never grows
+        recbuffer *r = (recbuffer*)calloc(1,sizeof(recbuffer));
+        r->cap = maxevents;
+        c.vpparams[4] = r;
+    }
+    c.vpparams[5] = malloc(sizeof(double));
+
+    c.updatef = scope;
+
+    int index = AddToCircuits(c, owner);
+
+    printf("cCore: added scope %i.\n",index);
+    return index;
+}
+
+/***********************************************************************
+ * Adds a channel to the channels captured by scope outer, and resizes
+ * its ring. The ring starts empty. Python callable.
+***********************************************************************/
+int scope_register(int outer, int cindex, int chindex, int isInput) {
+
+    output_register(outer, cindex, chindex, isInput, REDUCE_LAST);
+
+    circuit *c = &(circuits[outer]);
+    int len = c->iparams[0] + c->iparams[8];
+    int bytes = len*c->iparams[2]*sizeof(double);
+
+    c->vpparams[5] = realloc(c->vpparams[5], bytes);
+    SetStateBuffer(c, 5, bytes);
+    c->iparams[1] = 0;
+    c->iparams[15] = 0;
+
+    return 0;
+}
+
+/***********************************************************************
+ * Internal function. Writes the samples in the ring of c, from the
+ * oldest, as one event. Samples taken before the ring was full are NaN.
+***********************************************************************/
+static void scope_event( circuit *c ) {
+
+    int n = c->iparams[2];
+    int len = c->iparams[0] + c->iparams[8];
+    int missing = len - c->iparams[1];
+    double *ring = (double*)c->vpparams[5];
+    outwriter *w = (outwriter*)c->vpparams[2];
+    int width = (w != NULL)? c->iparams[5] : sizeof(double);
+    char *ev;
+
+    if(w != NULL)
+        ev = WriterReserve(w, len*n*width);
+    else
+        ev = (char*)recorder_next((recbuffer*)c->vpparams[4], len*n);
+
+    for(int k=0; k < len; k++) {
+        double *s = &(ring[((c->iparams[15]+k) % len)*n]);
+        for(int i=0; i < n; i++) {
+            double v = (k < missing)? NAN : s[i];
+            if(width == sizeof(float))
+                ((float*)ev)[k*n+i] = (float)v;
+            else
+                ((double*)ev)[k*n+i] = v;
+        }
+    }
+
+    if(w != NULL)
+        WriterCommit(w, len*n*width);
+    c->iparams[14]++;
+}
+
+/***********************************************************************
+ * Internal function. Samples the channels of scope c, and looks for
+ * the trigger when it is armed.
+***********************************************************************/
+static void scope_step( circuit *c ) {
+
+    if(c->iparams[3] == 0)
+        return;
+    //only the first replica captures
+    if(cEngine->replica > 0)
+        return;
+    if(c->iparams[10] > 0 && c->iparams[14] >= c->iparams[10])
+        return;
+    //no room left in memory, until the events are cleared
+    recbuffer *r = (recbuffer*)c->vpparams[4];
+    if(r != NULL && r->n >= r->cap)
+        return;
+
+    int n = c->iparams[2];
+    int len = c->iparams[0] + c->iparams[8];
+
+    //sample the channels in the ring
+    double *s = &(((double*)c->vpparams[5])[c->iparams[15]*n]);
+    for(int i=0; i < n; i++)
+        s[i] = output_value(c, i);
+    c->iparams[15] = (c->iparams[15]+1) % len;
+    if(c->iparams[1] < len)
+        c->iparams[1]++;
+
+    double v = GlobalSignals[c->inputs[0]];
+    double prev = c->params[1];
+    int first = (c->iparams[16] == 0);
+    c->params[1] = v;
+    c->iparams[16] = 1;
+
+    //capturing the post-trigger samples
+    if(c->iparams[12] > 0) {
+        c->iparams[12]--;
+        if(c->iparams[12] == 0) {
+            scope_event(c);
+            c->iparams[13] = c->iparams[9];
+        }
+        return;
+    }
+    if(c->iparams[13] > 0) {
+        c->iparams[13]--;
+        return;
+    }
+    if(first)
+        return;
+
+    double level = c->params[0];
+    int rise = (prev < level && v >= level);
+    int fall = (prev > level && v <= level);
+    if((c->iparams[11] >= 0 && rise) || (c->iparams[11] <= 0 && fall)) {
+        //the trigger sample is the first post-trigger one
+        c->iparams[12] = c->iparams[8]-1;
+        if(c->iparams[12] == 0) {
+            scope_event(c);
+            c->iparams[13] = c->iparams[9];
+        }
+    }
+}
+
+void scope( circuit *c ) {
+
+    scope_step(c);
+    GlobalBuffers[c->outputs[0]] = c->iparams[14];
+}
+
+/***********************************************************************
+ * Arms scope outer again after it captured its maximum number of
+ * events: the event count, the capture and the hold-off are reset,
+ * and the ring and the previous trigger value are discarded, so the
+ * next event has no samples from before. Python callable.
+***********************************************************************/
+int scope_arm(int outer) {
+
+    circuit *c = &(circuits[outer]);
+    c->iparams[1] = 0;
+    c->iparams[12] = 0;
+    c->iparams[13] = 0;
+    c->iparams[14] = 0;
+    c->iparams[15] = 0;
+    c->iparams[16] = 0;
+
+    return 0;
+}
+
+///1 if circuit c reads the channels registered with output_register.
+int output_reads( circuit *c ) {
+
+    return (c->updatef == output || c->updatef == recorder || c->updatef == scope);
+}
@@ -1,12 +1,55 @@
 #ifndef COREOUTPUT
 #define COREOUTPUT
 
+#define OUTPUT_TEXT 0   //formats of the records: one line of text
+#define OUTPUT_BINARY 1 //fixed size binary values
+
+#define REDUCE_LAST 0   //reducers of the registered channels: value at the record,
+#define REDUCE_MEAN 1   //mean,
+#define REDUCE_MIN 2    //minimum,
+#define REDUCE_MAX 3    //maximum,
+#define REDUCE_RMS 4    //root mean square,
+#define REDUCE_COUNT 5  //number of steps since the previous record
+
+typedef struct recbuffer recbuffer;
+
+///Records of a recorder circuit.
+struct recbuffer {
+
+    double *data;       //records, with the values of the registered channels
+    long long cap;      //records that fit in data
+    int width;          //values in a record
+    long long n;        //records written since the last clear
+    int ring;           //1 to overwrite the oldest records when data is full
+    int nold;           //number of previous buffers
+    double **old;       //previous buffers, kept valid for the views in python
+
+};
 
 int Add_output( int owner, char* filename, int dump );
 void output( circuit *c );
 //int output_register (int, int, int);
 //int output_register_feed(int outer, int feedid);
+int output_register(int outer, int cindex, int chindex, int isInput, int reduce);
 int output_close(int outer);
+long long output_flush(int outer);
+int output_format(int outer, int format, int width, char *header, int n, int countpos);
+int output_write(int outer, char *data, int n);
 void output_printout( circuit *c ); //this is the function that prints stuff to file
+void output_feeds( circuit *c, char *mark, char flag ); //marks the feeds read by the output
+int output_feedlist( circuit *c, int *feeds ); //lists the feeds read by the output
+int output_reads( circuit *c ); //1 if c reads registered channels (output or recorder)
+
+int Add_recorder( int owner, int dump, int capacity, int ring );
+void recorder( circuit *c );
+long long recorder_info(int outer, long long *info);
+double* recorder_data(int outer);
+int recorder_append(int outer, double *data, long long n, long long total);
+int recorder_clear(int outer);
+
+int Add_scope( int owner, char* filename, int pre, int post, int holdoff, int maxevents, int edge, double level );
+void scope( circuit *c );
+int scope_register(int outer, int cindex, int chindex, int isInput);
+int scope_arm(int outer);
 
 #endif
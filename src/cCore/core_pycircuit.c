@@ -65,3 +65,68 @@ void PYUpdate(circuit* c) {
     */
 	
 }
+
+
+/**********************************************************
+ * Python circuit working on blocks of samples.
+ * The inputs are collected for K steps, then the python
+ * callback gets the whole block and computes K steps of
+ * outputs, that are given out during the next K steps.
+ * The outputs are therefore delayed by K steps.
+ * 
+ * iparams: [0] block length K, [1] position in the block
+ * vpparams: [0] input block, [1] output block
+ * blocks are stored channel by channel: in[i*K + k]
+ * ******************************************************/
+int Add_BlockPYCircuit(int owner, void (*pyupd)(), int nI, int nO, int K) {
+	
+	if(K < 1) {
+		printf("cERROR: the block length of a BlockPYCircuit must be positive!\n");
+		errorflag++;
+		K = 1;
+	}
+	
+	circuit c = NewCircuit();
+	c.nI = nI;
+	c.nO = nO;
+	
+	c.iplen = 2;
+	c.iparams = (int*)calloc(c.iplen,sizeof(int));
+	c.iparams[0] = K;
+	c.iparams[1] = 0;
+	
+	c.vplen = 2;
+	c.vpparams = (void**)malloc(c.vplen*sizeof(void*));
+	c.vpparams[0] = calloc(K*nI+1,sizeof(double));
+	c.vpparams[1] = calloc(K*nO+1,sizeof(double));
+	SetStateBuffer(&c, 0, (K*nI+1)*sizeof(double));
+	SetStateBuffer(&c, 1, (K*nO+1)*sizeof(double));
+	
+	c.pyupdater = pyupd;
+	c.updatef = PYBlockUpdate;
+	
+	int index = AddToCircuits(c,owner);
+	printf("cCore: added BlockPYCircuit (block of %i steps)\n",K);
+	return index;
+}
+
+void PYBlockUpdate(circuit* c) {
+	
+	int K = c->iparams[0];
+	int k = c->iparams[1];
+	double *in = (double*)c->vpparams[0];
+	double *out = (double*)c->vpparams[1];
+	
+	//outputs come from the previous block
+	for (int i = 0; i < c->nI; i++)
+		in[i*K + k] = GlobalSignals[c->inputs[i]];
+	for (int o = 0; o < c->nO; o++)
+		GlobalBuffers[c->outputs[o]] = out[o*K + k];
+	
+	k++;
+	if(k == K) {
+		c->pyupdater(in, out);
+		k = 0;
+	}
+	c->iparams[1] = k;
+}
@@ -2,6 +2,7 @@
 #define COREPY
 
 void PYUpdate( circuit* c );
+void PYBlockUpdate( circuit* c );
 
 #endif
 
@@ -0,0 +1,184 @@
+/**********************************************************
+Random numbers.
+Every circuit that needs random numbers gets its own stream
+from a counter based generator (Philox4x32-10): the n-th block
+of the stream is a function of the seed of the engine, the index
+of the circuit, the replica and n only. Runs with the same seed
+are reproducible, replicas and circuits get independent streams,
+and the position in the stream is part of the circuit state.
+*********************************************************/
+#include <math.h>
+#include <stdlib.h>
+#include <time.h>
+#include <unistd.h>
+
+#ifndef CIRCUIT
+#include "circuit.h"
+#endif
+
+#ifndef CORERANDOM
+#include "core_random.h"
+#endif
+
+#ifndef COREMATHS
+#include "core_maths.h"
+#endif
+
+#ifndef CORESIGNALS
+#include "core_signals.h"
+#endif
+
+#define PHILOX_M0 0xD2511F53u
+#define PHILOX_M1 0xCD9E8D57u
+#define PHILOX_W0 0x9E3779B9u
+#define PHILOX_W1 0xBB67AE85u
+
+#define TWO_M53 (1.0/9007199254740992.0)
+
+
+/*********************************************************
+ * Internal function. Mixes the bits of x (splitmix64).
+ * ******************************************************/
+static unsigned long long Mix64(unsigned long long x) {
+    
+    x += 0x9E3779B97F4A7C15ULL;
+    x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9ULL;
+    x = (x ^ (x >> 27)) * 0x94D049BB133111EBULL;
+    return x ^ (x >> 31);
+}
+
+/*********************************************************
+ * Seed of a new engine when none is given: different for
+ * every engine and process.
+ * ******************************************************/
+unsigned long long DefaultSeed(void *salt) {
+    
+    static unsigned long long count = 0;
+    
+    unsigned long long x = (unsigned long long)time(NULL);
+    x = Mix64(x ^ ((unsigned long long)getpid() << 32));
+    x = Mix64(x ^ (unsigned long long)(size_t)salt);
+    return Mix64(x ^ (count++));
+}
+
+/*********************************************************
+ * Sets the seed of the current engine and its replicas.
+ * Circuits added after this call draw their first numbers
+ * from the new seed, so set it before building the setup.
+ * Python callable.
+ * ******************************************************/
+int SetSeed(unsigned long long seed) {
+    
+    for (int r = 0; r < cEngine->nreplicas; r++)
+        cEngine->replicas[r]->seed = seed;
+    
+    printf("cCore: seed %llu\n",seed);
+    return 0;
+}
+
+/*********************************************************
+ * Seed of the current engine. Python callable.
+ * ******************************************************/
+unsigned long long GetSeed() {
+    return cEngine->seed;
+}
+
+/*********************************************************
+ * Creates the random stream of the circuit being added:
+ * its substream is the index the circuit will have.
+ * ******************************************************/
+rng* NewRandom() {
+    
+    rng *r = (rng*)calloc(1,sizeof(rng));
+    r->stream = (cEngine->rebuild >= 0)? cEngine->rebuild : GlobalCircuitCounter;
+    cEngine->random = 1;
+    return r;
+}
+
+/*********************************************************
+ * Internal function. Goes back to the start of the stream.
+ * ******************************************************/
+static void RewindRandom(rng *r) {
+    
+    r->counter = 0;
+    r->nuni = 0;
+    r->ngauss = 0;
+}
+
+/*********************************************************
+ * Makes the circuits of replica e, just cloned, start from
+ * the beginning of their own streams: the numbers buffered
+ * by the engine it was cloned from are dropped, and those
+ * drawn when the circuits were added (Perlin octaves) are
+ * drawn again.
+ * ******************************************************/
+void RestartRandom(engine *e) {
+    
+    engine *current = cEngine;
+    cEngine = e; //the replica is part of the stream
+    
+    for (int i = 0; i < e->ncircuits; i++) {
+        
+        circuit *c = &(e->circuitlist[i]);
+        if(c->updatef == noise)
+            RewindRandom((rng*)c->vpparams[0]);
+        else if(c->updatef == perlin) {
+            RewindRandom((rng*)c->vpparams[c->iparams[0]]);
+            perlin_populate(c->vpparams, c->iparams[0]);
+        }
+    }
+    cEngine = current;
+}
+
+/*********************************************************
+ * Internal function. Block number counter of the stream,
+ * as 4 random words.
+ * ******************************************************/
+static inline void Philox(rng *r, unsigned long long counter, unsigned int *out) {
+    
+    unsigned int c0 = (unsigned int)counter, c1 = (unsigned int)(counter >> 32);
+    unsigned int c2 = r->stream, c3 = (unsigned int)cEngine->replica;
+    unsigned int k0 = (unsigned int)cEngine->seed, k1 = (unsigned int)(cEngine->seed >> 32);
+    
+    for (int i = 0; i < 10; i++) {
+        unsigned long long p0 = (unsigned long long)PHILOX_M0 * c0;
+        unsigned long long p1 = (unsigned long long)PHILOX_M1 * c2;
+        c0 = (unsigned int)(p1 >> 32) ^ c1 ^ k0;
+        c1 = (unsigned int)p1;
+        c2 = (unsigned int)(p0 >> 32) ^ c3 ^ k1;
+        c3 = (unsigned int)p0;
+        k0 += PHILOX_W0;
+        k1 += PHILOX_W1;
+    }
+    
+    out[0] = c0; out[1] = c1; out[2] = c2; out[3] = c3;
+}
+
+/*********************************************************
+ * Fills out with n uniform numbers in [0,1), n even.
+ * ******************************************************/
+void RandomUniforms(rng *r, double *out, int n) {
+    
+    unsigned int w[4];
+    for (int i = 0; i < n; i += 2) {
+        Philox(r, r->counter++, w);
+        out[i]   = (double)((((unsigned long long)w[0] << 32) | w[1]) >> 11) * TWO_M53;
+        out[i+1] = (double)((((unsigned long long)w[2] << 32) | w[3]) >> 11) * TWO_M53;
+    }
+}
+
+/*********************************************************
+ * Fills out with n normal numbers, n even (Box-Muller).
+ * ******************************************************/
+void RandomGaussians(rng *r, double *out, int n) {
+    
+    unsigned int w[4];
+    for (int i = 0; i < n; i += 2) {
+        Philox(r, r->counter++, w);
+        double u1 = 1.0 - (double)((((unsigned long long)w[0] << 32) | w[1]) >> 11) * TWO_M53; //(0,1]
+        double u2 = (double)((((unsigned long long)w[2] << 32) | w[3]) >> 11) * TWO_M53;
+        double rad = sqrt(-2.0*log(u1));
+        out[i]   = rad*cos(2*PI*u2);
+        out[i+1] = rad*sin(2*PI*u2);
+    }
+}
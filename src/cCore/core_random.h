@@ -0,0 +1,49 @@
+#ifndef CORERANDOM
+#define CORERANDOM
+
+#define RNG_BUFFER 64 //random numbers generated at once
+
+typedef struct rng rng;
+
+///Random stream of a circuit: Philox4x32-10 keyed with the seed of the
+///engine, counting blocks in a substream given by the circuit index and
+///the replica. The numbers are generated RNG_BUFFER at a time and kept
+///in the state buffer of the circuit, so snapshots continue the stream.
+struct rng {
+
+    unsigned int stream;        //substream, the index of the circuit
+    unsigned long long counter; //blocks of 4 words generated so far
+    int nuni, ngauss;           //numbers left in the buffers
+    double uni[RNG_BUFFER];     //uniform in [0,1)
+    double gauss[RNG_BUFFER];   //normal, zero mean and unit variance
+
+};
+
+int SetSeed(unsigned long long seed);
+unsigned long long GetSeed(void);
+unsigned long long DefaultSeed(void *salt);
+
+rng* NewRandom(void);
+void RestartRandom(engine *e);
+void RandomUniforms(rng *r, double *out, int n);
+void RandomGaussians(rng *r, double *out, int n);
+
+///Uniform number in [0,1) from the stream of the circuit.
+static inline double RandomUniform(rng *r) {
+    if(r->nuni == 0) {
+        RandomUniforms(r, r->uni, RNG_BUFFER);
+        r->nuni = RNG_BUFFER;
+    }
+    return r->uni[RNG_BUFFER - (r->nuni--)];
+}
+
+///Normal number from the stream of the circuit.
+static inline double RandomGaussian(rng *r) {
+    if(r->ngauss == 0) {
+        RandomGaussians(r, r->gauss, RNG_BUFFER);
+        r->ngauss = RNG_BUFFER;
+    }
+    return r->gauss[RNG_BUFFER - (r->ngauss--)];
+}
+
+#endif
@@ -37,6 +37,8 @@ int Scanner( int owner ) {
 
     c.vplen = 4;
     c.vpparams = (unsigned long long int*)calloc(c.vplen,sizeof(unsigned long long int));    
+    for (int i = 0; i < c.vplen; i++)
+        SetStateBuffer(&c, i, STATE_VALUE); //step counters
    
     c.updatef = Scanner_DoIdle; //this is the default scanner update function
     
@@ -2,12 +2,17 @@
 Signal generators circuits definitions.
  *********************************************************/
 #include <math.h>
+#include <stdlib.h>
 
 
 #ifndef CIRCUIT
 #include "circuit.h"
 #endif
 
+#ifndef CORERANDOM
+#include "core_random.h"
+#endif
+
 #ifndef CORESIGNALS
 #include "core_signals.h"
 #define ONEoverTWOPI 0.159154943
@@ -113,5 +118,45 @@ void square(circuit *c) {
     
 }
 
-
-
+/*************************************
+    in[0]: signal
+    params[0]: sigma
+    vpparams[0]: random stream
+    out[0]: out
+ * **********************************/
+int Add_noise(int owner, double sigma) {
+    
+    circuit c = NewCircuit();
+    
+    c.nI = 1;
+    c.nO = 1;
+    
+    c.plen = 1;
+    c.params = (double*) calloc(c.plen,sizeof(double));
+    c.params[0] = sigma;
+    
+    c.vplen = 1;
+    c.vpparams = (void**) malloc(c.vplen*sizeof(void*));
+    c.vpparams[0] = NewRandom();
+    SetStateBuffer(&c, 0, sizeof(rng));
+    
+    c.updatef = noise;
+    
+    //*** ALLOCATE IN LIST *********************
+    int index = AddToCircuits(c,owner);
+    
+    printf("cCore: added gaussian noise %d\n",index);
+    
+    return index;
+}
+void noise(circuit *c) {
+    
+    GlobalBuffers[c->outputs[0]] = GlobalSignals[c->inputs[0]] + c->params[0]*RandomGaussian((rng*)c->vpparams[0]);
+}
+void noise_block( circuit *c, double **in, double **out, int n ) {
+    
+    rng *r = (rng*)c->vpparams[0];
+    double sigma = c->params[0];
+    double * restrict y = out[0], * restrict a = in[0];
+    for(int s=0; s<n; s++) y[s] = a[s] + sigma*RandomGaussian(r);
+}
@@ -7,4 +7,8 @@ int Add_waver( int owner );
 int Add_square( int owner );
 void square(circuit *c);
 
+int Add_noise( int owner, double sigma );
+void noise( circuit *c );
+void noise_block( circuit *c, double **in, double **out, int n );
+
 #endif
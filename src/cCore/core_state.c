@@ -0,0 +1,231 @@
+/**********************************************************
+Engine checkpoints.
+The state of an engine and of its replicas (signals, buffers, step counter,
+seed, circuit parameters and internal state buffers) is copied in
+a flat block of memory, that python can keep as a snapshot
+or write to disk, and later restore in the same setup.
+*********************************************************/
+#include <stdlib.h>
+#include <string.h>
+
+#ifndef CIRCUIT
+#include "circuit.h"
+#endif
+
+#ifndef CORESTATE
+#include "core_state.h"
+#endif
+
+
+//update functions are stored relative to this one
+int Update(unsigned long long int steps);
+
+/*********************************************************
+ * Internal function. Moves n bytes between the state block
+ * at *p and the engine memory at data, in the direction
+ * given by mode. STATE_CHECK compares the bytes instead,
+ * STATE_SKIP only moves the pointer.
+ * ******************************************************/
+int StateBytes(char **p, void *data, int n, int mode) {
+
+    if(mode == STATE_SAVE)
+        memcpy(*p, data, n);
+    else if(mode == STATE_LOAD)
+        memcpy(data, *p, n);
+    else if(mode == STATE_CHECK && memcmp(*p, data, n) != 0)
+        return -1;
+
+    *p += n;
+    return 0;
+}
+
+/*********************************************************
+ * Internal function. Same as StateBytes for the values of
+ * all the channels in the signals or buffers at data, that
+ * are stride values apart when shared by replicas.
+ * ******************************************************/
+void StateChannels(char **p, double *data, int mode) {
+
+    int s = cEngine->stride;
+
+    if(s == 1) {
+        StateBytes(p, data, GlobalChannelCounter*sizeof(double), mode);
+        return;
+    }
+    for (int i = 0; i < GlobalChannelCounter; i++)
+        StateBytes(p, &(data[i*s]), sizeof(double), mode);
+}
+
+/*********************************************************
+ * Internal function. Walks the state of the current engine,
+ * saving it in p, loading it from p or checking that p has
+ * the same layout. Returns the number of bytes, or -1 if the
+ * layout does not match. When p is NULL only the size is
+ * computed.
+ * ******************************************************/
+long long StateWalk(char *p, int mode) {
+
+    char *start = p;
+    long long size = 0;
+    int err = 0;
+
+    //size only
+    if(p == NULL) {
+        size = 2*sizeof(double)*GlobalChannelCounter + sizeof(cEngine->step) + sizeof(cEngine->seed);
+        for (int i = 0; i < GlobalCircuitCounter; i++) {
+            circuit *c = &(circuits[i]);
+            size += sizeof(long long) + 3*sizeof(int);
+            size += c->plen*sizeof(double) + c->iplen*sizeof(int);
+            for (int k = 0; k < c->vplen && c->vpsizes != NULL; k++) {
+                size += sizeof(int);
+                if(c->vpsizes[k] == STATE_VALUE) size += sizeof(void*);
+                else if(c->vpsizes[k] > 0) size += c->vpsizes[k];
+            }
+        }
+        return size;
+    }
+
+    //sizes are checked but never overwritten, values are not checked
+    int smode = (mode == STATE_LOAD)? STATE_SKIP : mode;
+    int dmode = (mode == STATE_CHECK)? STATE_SKIP : mode;
+
+    StateChannels(&p, GlobalSignals, dmode);
+    StateChannels(&p, GlobalBuffers, dmode);
+    StateBytes(&p, &(cEngine->step), sizeof(cEngine->step), dmode);
+    //the seed is left out when nothing draws random numbers, so that the
+    //same setup gives the same state whatever seed it got
+    unsigned long long int seed = (cEngine->random == 1)? cEngine->seed : 0;
+    StateBytes(&p, &seed, sizeof(seed), dmode);
+    if(mode == STATE_LOAD && cEngine->random == 1)
+        cEngine->seed = seed;
+
+    for (int i = 0; i < GlobalCircuitCounter && err == 0; i++) {
+
+        circuit *c = &(circuits[i]);
+
+        //the update function can change at runtime (Scanner)
+        long long f = (char*)(c->updatef) - (char*)Update;
+        StateBytes(&p, &f, sizeof(long long), dmode);
+        if(mode == STATE_LOAD)
+            c->updatef = (void (*)(circuit*))((char*)Update + f);
+
+        err += StateBytes(&p, &(c->plen), sizeof(int), smode);
+        err += StateBytes(&p, &(c->iplen), sizeof(int), smode);
+        err += StateBytes(&p, &(c->vplen), sizeof(int), smode);
+        if(err != 0) break;
+
+        StateBytes(&p, c->params, c->plen*sizeof(double), dmode);
+        StateBytes(&p, c->iparams, c->iplen*sizeof(int), dmode);
+
+        for (int k = 0; k < c->vplen && c->vpsizes != NULL; k++) {
+            err += StateBytes(&p, &(c->vpsizes[k]), sizeof(int), smode);
+            if(err != 0) break;
+            if(c->vpsizes[k] == STATE_VALUE)
+                StateBytes(&p, &(c->vpparams[k]), sizeof(void*), dmode);
+            else if(c->vpsizes[k] > 0)
+                StateBytes(&p, c->vpparams[k], c->vpsizes[k], dmode);
+        }
+    }
+
+    if(err != 0)
+        return -1;
+    return p - start;
+}
+
+/*********************************************************
+ * Internal function. Runs StateWalk on all the replicas of
+ * the current engine, after the header.
+ * ******************************************************/
+long long StateAll(char *p, int mode) {
+
+    engine *e = cEngine;
+    long long size = sizeof(stateheader), s;
+
+    for (int r = 0; r < e->nreplicas; r++) {
+        cEngine = e->replicas[r];
+        s = StateWalk((p == NULL)? NULL : p+size, mode);
+        if(s < 0) {
+            size = -1;
+            break;
+        }
+        size += s;
+    }
+    cEngine = e;
+
+    return size;
+}
+
+void StateHeader(stateheader *h) {
+
+    memset(h, 0, sizeof(stateheader));
+    h->magic = STATE_MAGIC;
+    h->version = STATE_VERSION;
+    h->build = (char*)StateSize - (char*)Update;
+    h->nreplicas = cEngine->nreplicas;
+    h->nchannels = GlobalChannelCounter;
+    h->ncircuits = GlobalCircuitCounter;
+    h->size = StateAll(NULL, STATE_SKIP);
+}
+
+/*********************************************************
+ * Returns the size in bytes of the state of the current
+ * engine and its replicas. Python callable.
+ * ******************************************************/
+long long StateSize(void) {
+
+    return StateAll(NULL, STATE_SKIP);
+}
+
+/*********************************************************
+ * Copies the state of the current engine and its replicas
+ * in p, which must be StateSize() bytes long.
+ * Python callable.
+ * ******************************************************/
+int SaveState(char *p) {
+
+    stateheader h;
+    StateHeader(&h);
+    memcpy(p, &h, sizeof(stateheader));
+
+    StateAll(p, STATE_SAVE);
+    return 0;
+}
+
+/*********************************************************
+ * Restores the state saved in p, of the given size in
+ * bytes. The setup must be the same that saved it, and the
+ * same build of the cCore. Returns 0 on success, nothing is
+ * changed if the state does not match. Python callable.
+ * ******************************************************/
+int LoadState(char *p, long long size) {
+
+    stateheader h, ph;
+    StateHeader(&h);
+
+    if(size < (long long)sizeof(stateheader)) {
+        printf("cERROR: the state is too short!\n");
+        return -1;
+    }
+    memcpy(&ph, p, sizeof(stateheader));
+
+    if(ph.magic != h.magic || ph.version != h.version) {
+        printf("cERROR: this is not a valid state!\n");
+        return -1;
+    }
+    if(ph.build != h.build) {
+        printf("cERROR: the state was saved by a different build of the cCore!\n");
+        return -1;
+    }
+    if(ph.nreplicas != h.nreplicas || ph.nchannels != h.nchannels ||
+        ph.ncircuits != h.ncircuits || ph.size != h.size || size != h.size) {
+        printf("cERROR: the state was saved from a different setup!\n");
+        return -1;
+    }
+    if(StateAll(p, STATE_CHECK) < 0) {
+        printf("cERROR: the state was saved from a different setup!\n");
+        return -1;
+    }
+
+    StateAll(p, STATE_LOAD);
+    return 0;
+}
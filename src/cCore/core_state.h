@@ -0,0 +1,29 @@
+#ifndef CORESTATE
+#define CORESTATE
+
+#define STATE_MAGIC 0x53464156 //"VAFS"
+#define STATE_VERSION 3
+
+//directions of StateWalk
+#define STATE_SKIP 0
+#define STATE_SAVE 1
+#define STATE_LOAD 2
+#define STATE_CHECK 3
+
+typedef struct stateheader stateheader;
+
+///Header of a saved state, used to check it matches the setup.
+struct stateheader {
+    
+    int magic, version;
+    long long build;    //offset between two cCore functions, changes with the build
+    int nreplicas, nchannels, ncircuits;
+    long long size;     //total bytes including this header
+    
+};
+
+long long StateSize(void);
+int SaveState(char *p);
+int LoadState(char *p, long long size);
+
+#endif
@@ -0,0 +1,165 @@
+/**********************************************************
+Wait conditions.
+The engine is updated until some conditions on its channels
+are met, checking them at every step without going back to
+python.
+*********************************************************/
+#include <stdlib.h>
+#include <math.h>
+
+#ifndef CIRCUIT
+#include "circuit.h"
+#endif
+
+#ifndef COREWAIT
+#include "core_wait.h"
+#endif
+
+#ifndef COREENSEMBLE
+#include "core_ensemble.h"
+#endif
+
+double ChannelToPy(int cindex, int chindex, int isInput);
+
+
+/*********************************************************
+ * Adds a condition on a channel of the current engine.
+ * The condition is met when op(value, threshold) has been
+ * true for hold steps in a row. Returns the index of the
+ * condition. Python callable.
+ * ******************************************************/
+int AddCondition(int cindex, int chindex, int isInput, int op, double threshold, int hold) {
+
+	if(op < COND_LT || op > COND_DELTALT) {
+		printf("cERROR: unknown condition operator %i!\n",op);
+		return -1;
+	}
+
+	cEngine->nconditions++;
+	cEngine->conditions = (condition*)realloc(cEngine->conditions,
+		cEngine->nconditions*sizeof(condition));
+
+	condition *c = &(cEngine->conditions[cEngine->nconditions-1]);
+	c->cindex = cindex;
+	c->chindex = chindex;
+	c->isInput = isInput;
+	c->op = op;
+	c->threshold = threshold;
+	c->hold = (hold > 0)? hold : 1;
+	c->count = NULL;
+	c->last = NULL;
+
+	return cEngine->nconditions-1;
+}
+
+void ClearConditions_engine(engine *e) {
+
+	for (int i = 0; i < e->nconditions; i++) {
+		free(e->conditions[i].count);
+		free(e->conditions[i].last);
+	}
+	free(e->conditions);
+	e->conditions = NULL;
+	e->nconditions = 0;
+}
+
+/*********************************************************
+ * Removes all the conditions of the current engine.
+ * Python callable.
+ * ******************************************************/
+int ClearConditions(void) {
+
+	ClearConditions_engine(cEngine);
+	return 0;
+}
+
+/*********************************************************
+ * Internal function. Checks condition c on the current
+ * engine, which is replica r. Returns 1 if it was true for
+ * the required number of steps.
+ * ******************************************************/
+int CheckCondition(condition *c, int r) {
+
+	double x = ChannelToPy(c->cindex, c->chindex, c->isInput);
+	int ok = 0;
+
+	switch(c->op) {
+		case COND_LT: ok = (x < c->threshold); break;
+		case COND_LE: ok = (x <= c->threshold); break;
+		case COND_GT: ok = (x > c->threshold); break;
+		case COND_GE: ok = (x >= c->threshold); break;
+		case COND_ABSLT: ok = (fabs(x) < c->threshold); break;
+		case COND_ABSGT: ok = (fabs(x) > c->threshold); break;
+		case COND_DELTALT: ok = (fabs(x - c->last[r]) < c->threshold); break;
+	}
+	c->last[r] = x;
+	c->count[r] = (ok)? c->count[r]+1 : 0;
+
+	return (c->count[r] >= c->hold);
+}
+
+/*********************************************************
+ * Updates the current engine and its replicas until the
+ * conditions are met in all the replicas, or maxsteps steps
+ * were done. With mode WAIT_ALL all the conditions have to
+ * be met together, with WAIT_ANY one is enough.
+ * Returns the number of steps done, and the reason why it
+ * stopped in reason (WAIT_MET or WAIT_TIMEOUT).
+ * Python callable.
+ * ******************************************************/
+unsigned long long int UpdateUntil(unsigned long long int maxsteps, int mode, int *reason) {
+
+	engine *e = cEngine;
+	int n = e->nreplicas;
+	condition *conds = e->conditions;
+	unsigned long long int t;
+
+	CompileReplicas(e);
+
+	//reset the counters
+	for (int i = 0; i < e->nconditions; i++) {
+		conds[i].count = (int*)realloc(conds[i].count, n*sizeof(int));
+		conds[i].last = (double*)realloc(conds[i].last, n*sizeof(double));
+		for (int r = 0; r < n; r++) {
+			cEngine = e->replicas[r];
+			conds[i].count[r] = 0;
+			conds[i].last[r] = ChannelToPy(conds[i].cindex, conds[i].chindex, conds[i].isInput);
+		}
+	}
+	cEngine = e;
+
+	*reason = WAIT_TIMEOUT;
+	for (t = 0; t < maxsteps; t++) {
+
+		//the conditions can read channels of the feed-forward region
+		StepReplicas(e);
+		for (int r = 0; r < n; r++) {
+			cEngine = e->replicas[r];
+			FlushBlock();
+		}
+		cEngine = e;
+
+		int met = (mode == WAIT_ALL)? 1 : 0;
+		for (int i = 0; i < e->nconditions; i++) {
+
+			//check all replicas, to keep the counters going
+			int cmet = 1;
+			for (int r = 0; r < n; r++) {
+				cEngine = e->replicas[r];
+				cmet &= CheckCondition(&(conds[i]), r);
+			}
+
+			if(mode == WAIT_ALL) met &= cmet;
+			else met |= cmet;
+		}
+
+		if(met == 1 && e->nconditions > 0) {
+			*reason = WAIT_MET;
+			t++;
+			break;
+		}
+	}
+	cEngine = e;
+
+	return t;
+}
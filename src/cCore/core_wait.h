@@ -0,0 +1,14 @@
+#ifndef COREWAIT
+#define COREWAIT
+
+#define WAIT_ALL 0      //stop when all conditions are met
+#define WAIT_ANY 1      //stop when any condition is met
+
+#define WAIT_TIMEOUT 0  //stopped after the maximum number of steps
+#define WAIT_MET 1      //stopped because the conditions were met
+
+int AddCondition(int cindex, int chindex, int isInput, int op, double threshold, int hold);
+int ClearConditions(void);
+unsigned long long int UpdateUntil(unsigned long long int maxsteps, int mode, int *reason);
+
+#endif
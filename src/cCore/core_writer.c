@@ -0,0 +1,279 @@
+/**********************************************************
+Background writing of the output files.
+The output circuits fill chunks of memory, and a thread
+writes the full chunks to the files while the simulation
+goes on. At most WRITER_CHUNKS chunks wait to be written:
+when the queue is full, the simulation waits for the thread.
+*********************************************************/
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <pthread.h>
+
+#ifndef COREWRITER
+#include "core_writer.h"
+#endif
+
+
+static pthread_mutex_t lock = PTHREAD_MUTEX_INITIALIZER;
+static pthread_cond_t work = PTHREAD_COND_INITIALIZER; //a chunk was queued
+static pthread_cond_t done = PTHREAD_COND_INITIALIZER; //a chunk was written
+
+static outchunk *head = NULL, *tail = NULL; //queue of chunks to write
+static outchunk *freelist = NULL;   //chunks ready to be filled
+static int nqueued = 0;             //chunks in the queue or being written
+static int busy = 0;                //1 while the thread is writing a chunk
+static int running = 0;             //1 once the thread is started
+static int handlers = 0;            //1 once the exit and fork handlers are set
+static outwriter *writers = NULL;   //open writers
+
+
+/*********************************************************
+ * Internal function. Writes the queued chunks, forever.
+ * ******************************************************/
+static void* WriterThread(void *arg) {
+    
+    pthread_mutex_lock(&lock);
+    while(1) {
+        
+        while(head == NULL)
+            pthread_cond_wait(&work, &lock);
+        
+        outchunk *k = head;
+        head = k->next;
+        if(head == NULL) tail = NULL;
+        busy = 1;
+        pthread_mutex_unlock(&lock);
+        
+        fwrite(k->data, 1, k->len, k->w->f);
+        fflush(k->w->f);
+        
+        pthread_mutex_lock(&lock);
+        busy = 0;
+        nqueued--;
+        k->w->queued--;
+        k->len = 0;
+        k->next = freelist;
+        freelist = k;
+        pthread_cond_broadcast(&done);
+    }
+    return NULL;
+}
+
+/*********************************************************
+ * Internal function. Queues the current chunk of w, if it
+ * has some data, or writes it if there is no thread.
+ * Called with the lock held.
+ * ******************************************************/
+static void Submit(outwriter *w) {
+    
+    outchunk *k = w->current;
+    if(k == NULL || k->len == 0)
+        return;
+    
+    if(running == 0) {
+        fwrite(k->data, 1, k->len, w->f);
+        k->len = 0;
+        return;
+    }
+    
+    k->w = w;
+    k->next = NULL;
+    if(tail == NULL) head = k;
+    else tail->next = k;
+    tail = k;
+    
+    w->queued++;
+    nqueued++;
+    w->current = NULL;
+    pthread_cond_signal(&work);
+}
+
+/*********************************************************
+ * Internal function. Empty chunk of at least size bytes,
+ * waiting for the thread if the queue is full.
+ * Called with the lock held.
+ * ******************************************************/
+static outchunk* TakeChunk(int size) {
+    
+    while(nqueued >= WRITER_CHUNKS)
+        pthread_cond_wait(&done, &lock);
+    
+    outchunk *k;
+    if(freelist != NULL) {
+        k = freelist;
+        freelist = k->next;
+    }
+    else
+        k = (outchunk*)calloc(1,sizeof(outchunk));
+    
+    if(k->size < size) {
+        k->data = (char*)realloc(k->data, size);
+        k->size = size;
+    }
+    k->len = 0;
+    k->next = NULL;
+    return k;
+}
+
+/*********************************************************
+ * Internal function. Waits for the queue to be written.
+ * Called with the lock held.
+ * ******************************************************/
+static void WaitQueue() {
+    
+    while(head != NULL || busy)
+        pthread_cond_wait(&done, &lock);
+}
+
+/*********************************************************
+ * Internal function. Writes everything before the process
+ * exits.
+ * ******************************************************/
+static void WriterExit() {
+    
+    for (outwriter *w = writers; w != NULL; w = w->next)
+        WriterDrain(w);
+}
+
+/*********************************************************
+ * Internal functions. The child of a fork has no writer
+ * thread and must not write the files of the parent, so
+ * everything is written before forking, and the child
+ * starts with no writers.
+ * ******************************************************/
+static void ForkPrepare() {
+    
+    pthread_mutex_lock(&lock);
+    for (outwriter *w = writers; w != NULL; w = w->next)
+        Submit(w);
+    WaitQueue();
+    for (outwriter *w = writers; w != NULL; w = w->next)
+        fflush(w->f);
+}
+static void ForkParent() {
+    pthread_mutex_unlock(&lock);
+}
+static void ForkChild() {
+    
+    for (outwriter *w = writers; w != NULL; w = w->next) {
+        if(w->current != NULL) {
+            w->current->next = freelist;
+            freelist = w->current;
+            w->current = NULL;
+        }
+    }
+    
+    pthread_mutex_init(&lock, NULL);
+    pthread_cond_init(&work, NULL);
+    pthread_cond_init(&done, NULL);
+    running = 0;
+    nqueued = 0;
+    writers = NULL;
+}
+
+/*********************************************************
+ * Creates a writer for file f, starting the thread if
+ * needed.
+ * ******************************************************/
+outwriter* NewWriter(FILE *f) {
+    
+    outwriter *w = (outwriter*)calloc(1,sizeof(outwriter));
+    w->f = f;
+    
+    pthread_mutex_lock(&lock);
+    
+    if(running == 0) {
+        pthread_t thread;
+        if(pthread_create(&thread, NULL, WriterThread, NULL) == 0) {
+            pthread_detach(thread);
+            running = 1;
+        }
+        else
+            printf("cERROR: the writer thread could not start!\n");
+    }
+    if(handlers == 0) {
+        atexit(WriterExit);
+        pthread_atfork(ForkPrepare, ForkParent, ForkChild);
+        handlers = 1;
+    }
+    
+    w->next = writers;
+    writers = w;
+    
+    pthread_mutex_unlock(&lock);
+    return w;
+}
+
+/*********************************************************
+ * Queues the current chunk of w and gives a new one with
+ * space for n bytes. Use WriterReserve instead.
+ * ******************************************************/
+char* WriterReserveSlow(outwriter *w, int n) {
+    
+    pthread_mutex_lock(&lock);
+    Submit(w);
+    if(w->current == NULL)
+        w->current = TakeChunk((n > WRITER_CHUNK)? n : WRITER_CHUNK);
+    else if(w->current->size < n) { //empty but too small
+        w->current->data = (char*)realloc(w->current->data, n);
+        w->current->size = n;
+    }
+    pthread_mutex_unlock(&lock);
+    
+    return w->current->data;
+}
+
+/*********************************************************
+ * Appends n bytes of data.
+ * ******************************************************/
+void WriterWrite(outwriter *w, const char *data, int n) {
+    
+    while(n > 0) {
+        int len = (n < WRITER_CHUNK)? n : WRITER_CHUNK;
+        memcpy(WriterReserve(w, len), data, len);
+        WriterCommit(w, len);
+        data += len;
+        n -= len;
+    }
+}
+
+/*********************************************************
+ * Writes all the data of w in its file, and waits until it
+ * is done.
+ * ******************************************************/
+void WriterDrain(outwriter *w) {
+    
+    pthread_mutex_lock(&lock);
+    
+    Submit(w);
+    while(w->queued > 0)
+        pthread_cond_wait(&done, &lock);
+    
+    pthread_mutex_unlock(&lock);
+    fflush(w->f);
+}
+
+/*********************************************************
+ * Writes all the data of w and frees it. The file is not
+ * closed.
+ * ******************************************************/
+void WriterClose(outwriter *w) {
+    
+    WriterDrain(w);
+    
+    pthread_mutex_lock(&lock);
+    for (outwriter **p = &writers; *p != NULL; p = &((*p)->next)) {
+        if(*p == w) {
+            *p = w->next;
+            break;
+        }
+    }
+    if(w->current != NULL) {
+        w->current->next = freelist;
+        freelist = w->current;
+    }
+    pthread_mutex_unlock(&lock);
+    
+    free(w);
+}
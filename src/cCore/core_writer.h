@@ -0,0 +1,50 @@
+#ifndef COREWRITER
+#define COREWRITER
+
+#include <stdio.h>
+
+#define WRITER_CHUNK (1<<20) //bytes of a chunk
+#define WRITER_CHUNKS 16     //chunks waiting to be written at most, for all the files
+
+typedef struct outchunk outchunk;
+typedef struct outwriter outwriter;
+
+///Block of data waiting to be written.
+struct outchunk {
+
+    char *data;
+    int size, len;      //allocated and used bytes
+    outwriter *w;       //writer of the file
+    outchunk *next;     //next in the queue or in the free list
+
+};
+
+///File written by the writer thread, in chunks.
+struct outwriter {
+
+    FILE *f;
+    outchunk *current;  //chunk being filled, NULL if none
+    int queued;         //chunks of this file in the queue
+    outwriter *next;    //next in the list of open writers
+
+};
+
+outwriter* NewWriter(FILE *f);
+char* WriterReserveSlow(outwriter *w, int n);
+void WriterWrite(outwriter *w, const char *data, int n);
+void WriterDrain(outwriter *w);
+void WriterClose(outwriter *w);
+
+///Space for n bytes at the end of the data of w.
+static inline char* WriterReserve(outwriter *w, int n) {
+    if(w->current != NULL && w->current->size - w->current->len >= n)
+        return w->current->data + w->current->len;
+    return WriterReserveSlow(w, n);
+}
+
+///n bytes were written in the space given by WriterReserve.
+static inline void WriterCommit(outwriter *w, int n) {
+    w->current->len += n;
+}
+
+#endif
@@ -1,4 +1,7 @@
 #include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
 
 
 /**********************************************************
@@ -13,13 +16,17 @@ and run it at uberspeed.
 
 //#include "core_maths.h"
 
+#ifndef CORERANDOM
+#include "core_random.h"
+#endif
+
+#ifndef COREENSEMBLE
+#include "core_ensemble.h"
+#endif
+
 // *** GLOBAL DEFINITIONS **********************************
-///simulation timestep
-double dt;
-///total number of channels
-int GlobalChannelCounter = 0; 
-///total number of citcuits
-int GlobalCircuitCounter = 0;
+///engine used by the calling thread
+__thread engine *cEngine __attribute__((tls_model("initial-exec"))) = NULL;
 
 ///number of update functions? should be bigger than the total 
 ///amount of circuits defined in the library
@@ -32,28 +39,32 @@ void (**ufunctions)(circuit*);
 //list of python names for the circuits
 char **pynames;    
 
-//array containing all signals I and O
-double *GlobalSignals;
-//array containing all buffered I and O values
-double *GlobalBuffers; 
-
-///List of circuits
-circuit *circuits;
 ///Main circuit container - the virtual machine
 circuit Machine;
 
 int newcircuits = 1;
 
-int errorflag = 0;
+///1 once the circuit templates are setup
+int templatesready = 0;
 
 // *********************************************************
 int AllocateCircuits(void);
+engine* NewEngine(void);
+int UpdateReplicas(unsigned long long int  steps);
+double ChannelToPy(int cindex, int chindex, int isInput);
+int PyToChannel(int cindex, int chindex, int isInput, double value);
 
 
 int INIT(void) {
   
-    srand(time(NULL));
-    AllocateCircuits();
+    if(templatesready == 0) {
+        AllocateCircuits();
+        templatesready = 1;
+    }
+    
+    //scripts that do not use engines explicitly get a default one
+    if(cEngine == NULL)
+        cEngine = NewEngine();
 
     printf("VAFMCORE: initialised!\n");
 
@@ -76,13 +87,6 @@ int AllocateCircuits() {
   ufunctions = (void**)malloc(GlobalNFunctions*sizeof(void*));
   pynames = (char**)malloc(GlobalNFunctions*sizeof(char*));
   
-  
-  circuits = (circuit*)calloc(1,sizeof(circuit));
-  
-  GlobalSignals = (double*)calloc(1,sizeof(double)); //signal 0 is the time
-  GlobalBuffers = (double*)calloc(1,sizeof(double)); //signal 0 is the time
-  GlobalChannelCounter = 0;
-
   //setup name-update info for boring circuits with same topology
   int i=0;
   INIT_MATHS(&i);
@@ -92,6 +96,285 @@ int AllocateCircuits() {
   return 0;
 }
 
+/***********************************************************************
+ * Creates a new empty engine: an independent set of circuits, signals
+ * and timestep. Python callable, the returned handle is then given to
+ * UseEngine.
+***********************************************************************/
+engine* NewEngine() {
+    
+    engine *e = (engine*)calloc(1,sizeof(engine));
+    
+    e->circuitlist = (circuit*)calloc(1,sizeof(circuit));
+    e->signals = (double*)calloc(1,sizeof(double)); //signal 0 is the time
+    e->buffers = (double*)calloc(1,sizeof(double)); //signal 0 is the time
+    e->nchannels = 0;
+    e->stride = 1;
+    e->ncircuits = 0;
+    e->channelcap = 1;
+    e->circuitcap = 1;
+    
+    e->nreplicas = 1;
+    e->replicas = (engine**)malloc(sizeof(engine*));
+    e->replicas[0] = e;
+    e->replica = 0;
+    e->rebuild = -1;
+    e->seed = DefaultSeed(e);
+    
+    e->schedule = NULL;
+    e->taskdata = NULL;
+    e->ntasks = 0;
+    e->compiled = 0;
+    e->pushlist = NULL;
+    e->npush = 0;
+    e->paramarena = NULL;
+    e->iparamarena = NULL;
+    e->conditions = NULL;
+    e->nconditions = 0;
+    e->runner = RunSchedule;
+    
+    printf("cCore: new engine %p\n",(void*)e);
+    return e;
+}
+
+/***********************************************************************
+ * Makes e the engine used by all the following calls from this thread.
+ * Python callable.
+***********************************************************************/
+int UseEngine(engine *e) {
+    
+    cEngine = e;
+    return 0;
+}
+
+/***********************************************************************
+ * Internal function. Deallocates the arrays owned by circuit c.
+***********************************************************************/
+void FreeCircuit(circuit *c) {
+    
+    if(c->isContainer == 0) {
+        if(c->nI > 0) { free(c->inputs); free(c->oinputs); }
+        if(c->nO > 0) free(c->outputs);
+    } else {
+        free(c->dummyin); free(c->dummyout);
+        if(c->nsubcircs > 0) free(c->subcircuits);
+    }
+    if(c->packed == 0) {
+        if(c->plen > 0) free(c->params);
+        if(c->iplen > 0) free(c->iparams);
+    }
+    if(c->vplen > 0) {
+        if(c->vpsizes != NULL) {
+            for(int i=0; i<c->vplen; i++)
+                if(c->vpsizes[i] > 0) free(c->vpparams[i]);
+            free(c->vpsizes);
+        }
+        free(c->vpparams);
+    }
+}
+
+/***********************************************************************
+ * Internal function. Makes dst a deep copy of circuit src: channel
+ * indexes, parameters and internal state buffers are duplicated, other
+ * vpparams (force fields, files...) are shared.
+***********************************************************************/
+void CopyCircuit(circuit *dst, circuit *src) {
+    
+    *dst = *src;
+    dst->packed = 0;
+    
+    if(src->isContainer == 0) {
+        if(src->nI > 0) {
+            dst->inputs = (int*)malloc(src->nI*sizeof(int));
+            dst->oinputs = (int*)malloc(src->nI*sizeof(int));
+            memcpy(dst->inputs, src->inputs, src->nI*sizeof(int));
+            memcpy(dst->oinputs, src->oinputs, src->nI*sizeof(int));
+        }
+        if(src->nO > 0) {
+            dst->outputs = (int*)malloc(src->nO*sizeof(int));
+            memcpy(dst->outputs, src->outputs, src->nO*sizeof(int));
+        }
+    } else {
+        int n = (src->nI > 0)? src->nI : 1;
+        dst->dummyin = (int*)malloc(n*sizeof(int));
+        memcpy(dst->dummyin, src->dummyin, n*sizeof(int));
+        n = (src->nO > 0)? src->nO : 1;
+        dst->dummyout = (int*)malloc(n*sizeof(int));
+        memcpy(dst->dummyout, src->dummyout, n*sizeof(int));
+        if(src->nsubcircs > 0) {
+            dst->subcircuits = (int*)malloc(src->nsubcircs*sizeof(int));
+            memcpy(dst->subcircuits, src->subcircuits, src->nsubcircs*sizeof(int));
+        }
+    }
+    
+    if(src->plen > 0) {
+        dst->params = (double*)malloc(src->plen*sizeof(double));
+        memcpy(dst->params, src->params, src->plen*sizeof(double));
+    }
+    if(src->iplen > 0) {
+        dst->iparams = (int*)malloc(src->iplen*sizeof(int));
+        memcpy(dst->iparams, src->iparams, src->iplen*sizeof(int));
+    }
+    if(src->vplen > 0) {
+        dst->vpparams = (void**)malloc(src->vplen*sizeof(void*));
+        memcpy(dst->vpparams, src->vpparams, src->vplen*sizeof(void*));
+        if(src->vpsizes != NULL) {
+            dst->vpsizes = (int*)malloc(src->vplen*sizeof(int));
+            memcpy(dst->vpsizes, src->vpsizes, src->vplen*sizeof(int));
+            for(int i=0; i<src->vplen; i++) {
+                if(src->vpsizes[i] > 0) {
+                    dst->vpparams[i] = malloc(src->vpsizes[i]);
+                    memcpy(dst->vpparams[i], src->vpparams[i], src->vpsizes[i]);
+                }
+            }
+        }
+    }
+}
+
+/***********************************************************************
+ * Internal function. Creates a copy of engine src, with its own
+ * signals, parameters and internal states.
+***********************************************************************/
+engine* CloneEngine(engine *src) {
+    
+    engine *e = (engine*)malloc(sizeof(engine));
+    *e = *src;
+    
+    int n = (src->nchannels > 0)? src->nchannels : 1;
+    e->signals = (double*)malloc(n*sizeof(double));
+    e->buffers = (double*)malloc(n*sizeof(double));
+    memcpy(e->signals, src->signals, n*sizeof(double));
+    memcpy(e->buffers, src->buffers, n*sizeof(double));
+    
+    n = (src->ncircuits > 0)? src->ncircuits : 1;
+    e->circuitlist = (circuit*)calloc(n,sizeof(circuit));
+    for(int i=0; i<src->ncircuits; i++)
+        CopyCircuit(&(e->circuitlist[i]), &(src->circuitlist[i]));
+    
+    e->channelcap = (src->nchannels > 0)? src->nchannels : 1;
+    e->circuitcap = n;
+    
+    e->nreplicas = 1;
+    e->replicas = NULL;
+    e->rebuild = -1;
+    e->block = NULL;
+    e->ensemble = NULL;
+    
+    //the schedule points to the circuits of src
+    e->schedule = NULL;
+    e->taskdata = NULL;
+    e->ntasks = 0;
+    e->compiled = 0;
+    e->pushlist = NULL;
+    e->npush = 0;
+    e->paramarena = NULL;
+    e->iparamarena = NULL;
+    e->conditions = NULL;
+    e->nconditions = 0;
+    e->proftime = NULL;
+    e->profcalls = NULL;
+    e->proflen = 0;
+    
+    return e;
+}
+
+/***********************************************************************
+ * Deallocates the engine e and its circuits, including its replicas.
+ * Shared resources in vpparams (files, force fields) are not released.
+ * Python callable.
+***********************************************************************/
+int FreeEngine(engine *e) {
+    
+    for(int r=1; r<e->nreplicas; r++)
+        FreeEngine(e->replicas[r]);
+    free(e->replicas);
+    
+    for(int i=0; i<e->ncircuits; i++)
+        FreeCircuit(&(e->circuitlist[i]));
+    
+    free(e->circuitlist);
+    //replicas share the signals of the first one
+    if(e->replica == 0 || e->stride == 1) {
+        free(e->signals);
+        free(e->buffers);
+    }
+    free(e->schedule);
+    free(e->taskdata);
+    free(e->pushlist);
+    free(e->paramarena);
+    free(e->iparamarena);
+    ClearConditions_engine(e);
+    FreeBlockPlan(e);
+    FreeEnsemble(e);
+    free(e->proftime);
+    free(e->profcalls);
+    
+    if(cEngine == e)
+        cEngine = NULL;
+    free(e);
+    
+    return 0;
+}
+
+/***********************************************************************
+ * Creates n replicas of the current engine, including itself: copies of
+ * the same setup, with their own circuit states, that are updated
+ * together in Update. Their signals and buffers are shared, replica-major
+ * (see core_ensemble.c). Previous replicas are discarded.
+ * Python callable.
+***********************************************************************/
+int MakeReplicas(int n) {
+    
+    engine *e = cEngine;
+    
+    //the shared arrays would move under the views of python
+    if(e->pinned == 1) {
+        printf("cERROR: the signal arrays are pinned, the engine cannot be replicated!\n");
+        return -1;
+    }
+    
+    SplitSignals(e);
+    for(int r=1; r<e->nreplicas; r++)
+        FreeEngine(e->replicas[r]);
+    
+    if(n < 1) n = 1;
+    e->nreplicas = n;
+    e->replicas = (engine**)realloc(e->replicas, n*sizeof(engine*));
+    e->replicas[0] = e;
+    
+    for(int r=1; r<n; r++) {
+        e->replicas[r] = CloneEngine(e);
+        e->replicas[r]->replica = r;
+        RestartRandom(e->replicas[r]);
+    }
+    ShareSignals(e);
+    cEngine = e;
+    
+    printf("cCore: engine replicated %i times\n",n);
+    return 0;
+}
+
+/***********************************************************************
+ * Returns the handle of replica r of the current engine.
+ * Python callable.
+***********************************************************************/
+engine* GetReplica(int r) {
+    
+    return cEngine->replicas[r];
+}
+
+/***********************************************************************
+ * The next circuit created will replace the parameters and internal
+ * state of circuit cindex, keeping its channels and connections.
+ * Used to give replicas their own construction parameters.
+ * Python callable.
+***********************************************************************/
+int RebuildCircuit(int cindex) {
+    
+    cEngine->rebuild = cindex;
+    return 0;
+}
+
 //deallocate resources
 int QUIT() {
   
@@ -128,9 +411,13 @@ int AddChannels( circuit *c ) {
       GlobalChannelCounter++;
     }
   }
-  //resize the global signals/buffers lists
-  GlobalSignals = (double*)realloc(GlobalSignals,sizeof(double)*GlobalChannelCounter);
-  GlobalBuffers = (double*)realloc(GlobalBuffers,sizeof(double)*GlobalChannelCounter);
+  //resize the global signals/buffers lists, doubling the capacity when full
+  if(GlobalChannelCounter > cEngine->channelcap) {
+    while(cEngine->channelcap < GlobalChannelCounter)
+      cEngine->channelcap *= 2;
+    GlobalSignals = (double*)realloc(GlobalSignals,sizeof(double)*cEngine->channelcap);
+    GlobalBuffers = (double*)realloc(GlobalBuffers,sizeof(double)*cEngine->channelcap);
+  }
 
     //zeroes all the new channels
     for (int i = GlobalChannelCounter-c->nO-c->nI; i < GlobalChannelCounter; i++)
@@ -159,10 +446,26 @@ circuit NewCircuit() {
     c.isContainer = 0;
     c.nI = 0;
     c.nO = 0;
+    c.vpsizes = NULL;
+    c.packed = 0;
     c.pushed = 0; //false by default
+    c.every = 1;
     
     return c;
 }
+/***********************************************************************
+ * Marks vpparams[i] of circuit c as an internal state buffer of the given
+ * size in bytes, owned by the circuit. Marked buffers are duplicated
+ * when the engine is replicated, and saved in checkpoints.
+ * With size STATE_VALUE, vpparams[i] is itself part of the state.
+***********************************************************************/
+void SetStateBuffer(circuit *c, int i, int bytes) {
+    
+    if(c->vpsizes == NULL)
+        c->vpsizes = (int*)calloc(c->vplen,sizeof(int));
+    c->vpsizes[i] = bytes;
+}
+
 /***********************************************************************
  * Sets the behaviour of the circuit with index cindex.
  * 0 is not pushed, 1 is pushed.
@@ -170,7 +473,34 @@ circuit NewCircuit() {
 ***********************************************************************/
 int SetPushed(int cindex, int pushed) {
     
+    //python only circuits have no cCore counterpart
+    if(cindex < 0 || cindex >= GlobalCircuitCounter)
+        return 1;
+    
     circuits[cindex].pushed = pushed;
+    cEngine->compiled = 0;
+    
+    return 0;
+}
+
+/***********************************************************************
+ * Makes circuit cindex update once every n steps of the engine, on the
+ * steps that are multiples of n. Its outputs hold their values in between,
+ * and the update sees a timestep n times longer.
+ * Python callable.
+***********************************************************************/
+int SetRate(int cindex, int n) {
+    
+    if(cindex < 0 || cindex >= GlobalCircuitCounter)
+        return 1;
+    if(n < 1) {
+        printf("cERROR: the rate divisor must be at least 1!\n");
+        errorflag++;
+        return 1;
+    }
+    
+    circuits[cindex].every = n;
+    cEngine->compiled = 0;
     
     return 0;
 }
@@ -182,6 +512,36 @@ int SetPushed(int cindex, int pushed) {
 ***********************************************************************/
 int AddToCircuits(circuit c, int containerindex) {
     
+    cEngine->compiled = 0;
+    
+    //replace the parameters of an existing circuit
+    if(cEngine->rebuild >= 0) {
+        
+        int index = cEngine->rebuild;
+        circuit *old = &(circuits[index]);
+        printf("cCore: rebuilding %i\n",index);
+        
+        c.nI = old->nI; c.inputs = old->inputs; c.oinputs = old->oinputs;
+        c.nO = old->nO; c.outputs = old->outputs;
+        c.pushed = old->pushed;
+        c.every = old->every;
+        old->nI = 0; old->nO = 0;
+        FreeCircuit(old);
+        
+        circuits[index] = c;
+        cEngine->rebuild = -1;
+        return index;
+    }
+    
+    //new channels would move the signal arrays under the views of python,
+    //or those shared by the replicas
+    if((cEngine->pinned == 1 || cEngine->stride > 1) && c.isContainer == 0 && c.nI+c.nO > 0) {
+        printf("cERROR: the signal arrays are pinned or shared by replicas, no channels can be added!\n");
+        c.nI = 0; c.nO = 0; //not allocated yet
+        FreeCircuit(&c);
+        return -1;
+    }
+
     printf("cCore: allocating %i\n",GlobalCircuitCounter);
 
     //containers do not get inputs/outputs allocated
@@ -189,7 +549,10 @@ int AddToCircuits(circuit c, int containerindex) {
         AddChannels(&c); //allocates the signals
     
     GlobalCircuitCounter++;
-    circuits = (circuit*)realloc(circuits, GlobalCircuitCounter*sizeof(circuit));
+    if(GlobalCircuitCounter > cEngine->circuitcap) {
+        cEngine->circuitcap *= 2;
+        circuits = (circuit*)realloc(circuits, cEngine->circuitcap*sizeof(circuit));
+    }
     circuits[GlobalCircuitCounter-1] = c; //add the circuit to the list
     
     int index = GlobalCircuitCounter-1;
@@ -277,6 +640,7 @@ int Connect(int c1, int out, int metaSrc, int c2, int in, int metaDst) {
     //printf("cCore Connecting: DST %i\n",*chin);
 
     *chin = *chout;
+    cEngine->compiled = 0;
     
     //circuits[c2].inputs[in] = circuits[c1].outputs[out];
 
@@ -285,6 +649,17 @@ int Connect(int c1, int out, int metaSrc, int c2, int in, int metaDst) {
 }
 
 
+///Makes n connections, given as 6 ints each with the arguments of Connect.
+///Called from python.
+int ConnectMany(int n, int *links) {
+    
+    for(int i=0; i<n; i++, links+=6)
+        Connect(links[0], links[1], links[2], links[3], links[4], links[5]);
+    
+    return 0;
+}
+
+
 ///Sets the value of an input channel. Called from python.
 ///Also sets the buffer to the same value. Maybe it is not used at all!
 int SetInput(int c, int inidx, double value){
@@ -320,6 +695,12 @@ double ChannelToPy(int cindex, int chindex, int isInput) {
     
     int idx;
     
+    //container channels are the output of their dummy relay
+    if(circuits[cindex].isContainer == 1) {
+        int dummy = (isInput == 1)? circuits[cindex].dummyin[chindex] : circuits[cindex].dummyout[chindex];
+        return GlobalBuffers[circuits[dummy].outputs[0]];
+    }
+    
     if(isInput == 1) {
         //printf("cCore: ChannelToPy reads feed: %d \n",idx);
         idx = circuits[cindex].inputs[chindex];
@@ -392,20 +773,264 @@ int* GetOutputs(int c) {
 //Update function of the virtual machine
 int Update(unsigned long long int  steps) {
  
+    if(cEngine->nreplicas > 1)
+        return UpdateReplicas(steps);
+    
+    if(cEngine->compiled == 0)
+        CompileEngine();
+    
     for(unsigned long long int t=0; t<steps; t++) {
         
         //printf("step %d\n",t);
-        circuits[0].updatef( &circuits[0] ); //this way is faster
-          
+        cEngine->runner(); //this way is faster
         
-        //now push all feeds
-        for (int i = 0; i < GlobalChannelCounter; i++)
-        {
-            GlobalSignals[i] = GlobalBuffers[i];
+    }
+    FlushBlock();
+
+    return 0;
+}
+
+/***********************************************************************
+ * Updates the engine for the given steps, in blocks of the given size.
+ * After each block the progress counter is increased and the cancel flag
+ * is checked, so that another thread can follow and stop the run.
+ * Returns the number of steps done. Python callable.
+***********************************************************************/
+unsigned long long int RunSteps(unsigned long long int steps, unsigned long long int block) {
+    
+    engine *e = cEngine;
+    unsigned long long int done = 0, n;
+    
+    if(block < 1) block = 1;
+    
+    while(done < steps && e->cancel == 0) {
+        
+        n = (steps-done < block)? steps-done : block;
+        Update(n);
+        done += n;
+        e->progress += n;
+    }
+    
+    return done;
+}
+///Steps done by RunSteps since the last ResetRun. Python callable.
+unsigned long long int RunProgress(void) {
+    
+    return cEngine->progress;
+}
+///Sets the cancel flag checked by RunSteps. Python callable.
+int CancelRun(void) {
+    
+    cEngine->cancel = 1;
+    return 0;
+}
+///Clears the progress counter and the cancel flag before a new run. Python callable.
+int ResetRun(void) {
+    
+    cEngine->progress = 0;
+    cEngine->cancel = 0;
+    return 0;
+}
+
+/***********************************************************************
+ * Turns profiling on (1) or off (0) for the current engine and its
+ * replicas, clearing the counters. The timed update loop is only used
+ * while profiling is on. Python callable.
+***********************************************************************/
+int SetProfiling(int on) {
+    
+    engine *e = cEngine;
+    
+    for(int r=0; r<e->nreplicas; r++) {
+        engine *re = e->replicas[r];
+        re->profiling = on;
+        re->compiled = 0;
+        free(re->proftime); re->proftime = NULL;
+        free(re->profcalls); re->profcalls = NULL;
+        re->proflen = 0;
+        re->profrelays = 0;
+        re->profpush = 0;
+    }
+    
+    return 0;
+}
+/***********************************************************************
+ * Copies the profiling counters, summed over the replicas: time in ns
+ * and number of updates for each circuit, and time in the relays and
+ * in the final push in extra[0] and extra[1]. The arrays must have
+ * CircuitCount() elements. Python callable.
+***********************************************************************/
+int GetProfile(double *times, unsigned long long int *calls, double *extra) {
+    
+    engine *e = cEngine;
+    
+    memset(times, 0, GlobalCircuitCounter*sizeof(double));
+    memset(calls, 0, GlobalCircuitCounter*sizeof(unsigned long long int));
+    extra[0] = 0; extra[1] = 0;
+    
+    for(int r=0; r<e->nreplicas; r++) {
+        engine *re = e->replicas[r];
+        for(int i=0; i<re->proflen && i<GlobalCircuitCounter; i++) {
+            times[i] += re->proftime[i];
+            calls[i] += re->profcalls[i];
         }
+        extra[0] += re->profrelays;
+        extra[1] += re->profpush;
+    }
+    
+    return 0;
+}
+///Number of circuits in the current engine. Python callable.
+int CircuitCount(void) {
+    
+    return GlobalCircuitCounter;
+}
 
+///Update all the replicas of the current engine in lockstep.
+int UpdateReplicas(unsigned long long int  steps) {
+    
+    engine *e = cEngine;
+    int n = e->nreplicas;
+    
+    CompileReplicas(e);
+    
+    for(unsigned long long int t=0; t<steps; t++)
+        StepReplicas(e);
+    
+    for(int r=0; r<n; r++) {
+        cEngine = e->replicas[r];
+        FlushBlock();
+    }
+    cEngine = e;
+    
+    return 0;
+}
+
+///Reads the value of a channel in all the replicas. Called from python.
+int ReplicasToPy(int cindex, int chindex, int isInput, double *values) {
+    
+    engine *e = cEngine;
+    
+    for(int r=0; r<e->nreplicas; r++) {
+        cEngine = e->replicas[r];
+        values[r] = ChannelToPy(cindex, chindex, isInput);
+    }
+    cEngine = e;
+    
+    return 0;
+}
+///Finds where channel chindex of circuit cindex is read and written.
+///feeds gets the feed to read, 1 if it is read from the buffers, the feed
+///to write and the write mode (FEED_BOTH, FEED_BUFFER or FEED_NONE).
+///Called from python.
+int ChannelFeeds(int cindex, int chindex, int isInput, int *feeds) {
+    
+    circuit *c = &(circuits[cindex]);
+    
+    //same rules of ChannelToPy and PyToChannel
+    if(c->isContainer == 1) {
+        int dummy = (isInput == 1)? c->dummyin[chindex] : c->dummyout[chindex];
+        feeds[0] = circuits[dummy].outputs[0];
+        feeds[1] = 1;
+        feeds[2] = (isInput == 1)? circuits[dummy].inputs[0] : -1;
+        feeds[3] = (isInput == 1)? FEED_BOTH : FEED_NONE;
+    }
+    else if(isInput == 1) {
+        feeds[0] = feeds[2] = c->inputs[chindex];
+        feeds[1] = 0;
+        feeds[3] = FEED_BOTH;
+    }
+    else {
+        feeds[0] = feeds[2] = c->outputs[chindex];
+        feeds[1] = 1;
+        feeds[3] = FEED_BUFFER;
+    }
+    
+    //python sees the channels of one replica at a time
+    feeds[0] /= cEngine->stride;
+    if(feeds[2] > 0) feeds[2] /= cEngine->stride;
+    
+    return 0;
+}
+///Reads n channels, given by ChannelFeeds, in all the replicas.
+///values gets n values for each replica. Called from python.
+int FeedsToPy(int n, int *feeds, double *values) {
+    
+    engine *e = cEngine;
+    
+    int s = e->stride;
+    
+    for(int r=0; r<e->nreplicas; r++) {
+        double *sig = e->replicas[r]->signals;
+        double *buf = e->replicas[r]->buffers;
+        for(int i=0; i<n; i++, values++)
+            *values = (feeds[4*i+1] == 1)? buf[feeds[4*i]*s] : sig[feeds[4*i]*s];
     }
+    
+    return 0;
+}
+///Writes n channels, given by ChannelFeeds, in all the replicas.
+///values has n values for each replica. Called from python.
+int PyToFeeds(int n, int *feeds, double *values) {
+    
+    engine *e = cEngine;
+    
+    int s = e->stride;
+    
+    for(int r=0; r<e->nreplicas; r++) {
+        double *sig = e->replicas[r]->signals;
+        double *buf = e->replicas[r]->buffers;
+        for(int i=0; i<n; i++, values++) {
+            int idx = feeds[4*i+2]*s;
+            if(feeds[4*i+3] == FEED_NONE) continue;
+            buf[idx] = *values;
+            if(feeds[4*i+3] == FEED_BOTH) sig[idx] = *values;
+        }
+    }
+    
+    return 0;
+}
+///Signals (which=0) or buffers (which=1) of replica r of the current engine.
+///Python callable, the number of channels is given by ChannelCount, and
+///consecutive channels are ChannelStride values apart.
+double* SignalArray(int r, int which) {
+    
+    engine *e = cEngine->replicas[r];
+    return (which == 0)? e->signals : e->buffers;
+}
+///Distance between consecutive channels in the signal arrays, the number
+///of replicas sharing them. Python callable.
+int ChannelStride(void) {
+    
+    return cEngine->stride;
+}
+/***********************************************************************
+ * Pins (on=1) or unpins (on=0) the signal arrays of the current engine.
+ * While pinned, circuits and channels that would resize them cannot be
+ * added. Python callable.
+***********************************************************************/
+int PinSignals(int on) {
+    
+    cEngine->pinned = on;
+    return 0;
+}
+///Number of channels in the current engine. Python callable.
+int ChannelCount(void) {
+    
+    return GlobalChannelCounter;
+}
 
+///Sets the value of a channel in all the replicas. Called from python.
+int PyToReplicas(int cindex, int chindex, int isInput, double *values) {
+    
+    engine *e = cEngine;
+    
+    for(int r=0; r<e->nreplicas; r++) {
+        cEngine = e->replicas[r];
+        PyToChannel(cindex, chindex, isInput, values[r]);
+    }
+    cEngine = e;
+    
     return 0;
 }
 
@@ -1,45 +1,73 @@
+#!/usr/bin/env python
+# Benchmark of the cCore: construction time and update speed
+# of a chain of adders, for different sizes of the setup.
+#
+# usage: python pybench.py [--native] [ncircuits ...]
+#
+import os, sys, time
 
-from ctypes import *
-import threading
-import math
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+from vafmcircuits import Machine
 
 
+## Redirect the stdout of python and cCore to /dev/null.
+def Silence():
+	sys.stdout.flush()
+	saved = os.dup(1)
+	null = os.open(os.devnull, os.O_WRONLY)
+	os.dup2(null, 1)
+	os.close(null)
+	return saved
 
-testlib = cdll.LoadLibrary("./vafmcore.so")
-print testlib
+def Restore(saved):
+	sys.stdout.flush()
+	os.dup2(saved, 1)
+	os.close(saved)
 
-#calls the function in the library
-testlib.INIT()
 
-widx = testlib.Add_waver()
-testlib.SetInput(widx,0,c_double(2.0))
-testlib.SetInput(widx,1,c_double(1.0))
+def Bench(ncircuits, nsteps, native=False):
 
+	saved = Silence()
 
+	t0 = time.time()
+	machine = Machine(name='machine', dt=0.01, pushed=True)
+	machine.AddCircuit(type='waver', name='wave', amp=2, freq=1)
 
-for i in range(1000):
-    idx = testlib.Add_Math("opADD",2)
-    testlib.Connect(0,i%2,idx,1)
-    testlib.Connect(idx-1,1,idx,0)
+	prev = 'wave.sin'
+	for i in xrange(ncircuits):
+		name = 'add'+str(i)
+		machine.AddCircuit(type='opAdd', name=name)
+		machine.Connect('wave.cos', name+'.in1')
+		machine.Connect(prev, name+'.in2')
+		prev = name+'.out'
+	tbuild = time.time() - t0
 
-#outidx = testlib.Add_output("log.log",2);
-#testlib.output_register(outidx,-1,0)
-#testlib.output_register(outidx,widx,0)
-#testlib.output_register(outidx,widx,1)
-#testlib.output_register(outidx,widx+1,0)
+	t0 = time.time()
+	machine.Compile(native=native)
+	tcompile = time.time() - t0
 
-#testlib.DebugCircuit(outidx)
+	t0 = time.time()
+	machine.WaitSteps(nsteps)
+	trun = time.time() - t0
 
-#testlib.Status()
-t = threading.Thread(target=testlib.Update, args=[10000000])
-t.daemon = True
-t.start()
-while t.is_alive(): # wait for the thread to exit
-    t.join(.1)
+	Restore(saved)
+	print "%8i circuits: build %8.3f s  compile %8.4f s  %12.1f steps/s" % (ncircuits,
+		tbuild, tcompile, nsteps/trun)
 
-#testlib.output_close(outidx);
 
-#print testlib.SUM()
+args = sys.argv[1:]
+native = '--native' in args
+if native:
+	args.remove('--native')
+
+sizes = [10, 1000, 100000]
+if len(args) > 0:
+	sizes = [int(a) for a in args]
+
+for n in sizes:
+	#about 1e7 circuit updates per size
+	Bench(n, max(10, 10000000/n), native)
+
 
 """
 Benchmark 10M steps
@@ -50,5 +78,17 @@ ADDs	time
 100		6.2
 1000	73
 1000	68 with function pointers updatef
-"""
 
+Chain of adders through the Machine interface, about 1e7 updates per size
+ADDs	build(s)	steps/s
+10		0.005		7.5e6
+1000	0.19		1.1e5
+10000	1.6			5.0e3
+100000	20.4		1.2e2
+
+Same with Compile(native=True), gcc -O2, library already in the cache
+ADDs	steps/s
+10		1.9e7
+1000	5.9e5
+10000	5.3e4
+"""
@@ -1,6 +1,8 @@
 from collections import OrderedDict
 from ctypes import *
 import os
+import hashlib
+import threading
 
 
 ## \package vafmbase
@@ -98,12 +100,12 @@ class Channel(object):
 	#@property
 	def value_get(self):
 		
-		return Circuit.cCore.ChannelToPy(self.owner.cCoreID, self.cCoreCHID, self.cisInput)
+		return self.owner.cCore.ChannelToPy(self.owner.cCoreID, self.cCoreCHID, self.cisInput)
 	#@value.setter
 	def value_set(self,value):
 		
 
-		Circuit.cCore.PyToChannel(self.owner.cCoreID, self.cCoreCHID, self.cisInput,c_double(value))
+		self.owner.cCore.PyToChannel(self.owner.cCoreID, self.cCoreCHID, self.cisInput,c_double(value))
 		
 
 		
@@ -126,6 +128,105 @@ class Channel(object):
 		
 
 
+## \internal
+## \brief cCore function bound to an engine.
+#
+# Calling it makes the engine current on the calling thread before
+# the actual cCore function is called. Attributes like restype and argtypes
+# are forwarded to the library function.
+class EngineFunction(object):
+
+	def __init__(self, engine, func):
+		object.__setattr__(self, '_engine', engine)
+		object.__setattr__(self, '_func', func)
+
+	def __getattr__(self, name):
+		return getattr(self._func, name)
+
+	def __setattr__(self, name, value):
+		setattr(self._func, name, value)
+
+	def __call__(self, *args):
+		self._engine.Select()
+		return self._func(*args)
+
+
+## \internal
+## \brief Engine context in the cCore.
+#
+# Each main Machine owns one engine, holding the signals, buffers and circuits
+# of its setup, so that several machines can be built and run side by side,
+# also from different threads.
+# Functions of the cCore library are accessed as attributes of this object,
+# and they act on this engine.
+class Engine(object):
+
+	## Engine currently selected in the cCore, for each thread.
+	_current = threading.local()
+
+	def __init__(self, lib, handle=None):
+		
+		self.lib = lib
+		if handle == None:
+			handle = lib.NewEngine()
+		self.handle = c_void_p(handle)
+		self._funcs = {}
+
+	## Make this engine the current one for the calling thread.
+	def Select(self):
+		
+		if getattr(Engine._current, 'engine', None) is not self:
+			if self.handle == None:
+				raise RuntimeError("The engine was freed!")
+			self.lib.UseEngine(self.handle)
+			Engine._current.engine = self
+
+	## Free the engine in the cCore, with its replicas and circuits.
+	def Free(self):
+		
+		if self.handle == None:
+			return
+		self.lib.FreeEngine(self.handle)
+		self.handle = None
+		if getattr(Engine._current, 'engine', None) is self:
+			Engine._current.engine = None
+
+	## Engine object for replica r of this engine.
+	def Replica(self, r):
+		
+		return Engine(self.lib, self.GetReplica(r))
+
+	def __getattr__(self, name):
+		
+		if name.startswith('__'):
+			raise AttributeError(name)
+		
+		if not (name in self._funcs):
+			self._funcs[name] = EngineFunction(self, getattr(self.lib, name))
+		return self._funcs[name]
+
+
+## Hash of some data for the run cache.
+#
+# Strings are taken as file names, other objects are hashed with their
+# bytes if they are numpy arrays, or their representation.
+# @return Hexadecimal hash.
+def DataKey(*items):
+	
+	key = hashlib.sha1()
+	for item in items:
+		if isinstance(item, basestring) and os.path.isfile(item):
+			f = open(item, 'rb')
+			for block in iter(lambda: f.read(1<<20), ''):
+				key.update(block)
+			f.close()
+		elif hasattr(item, 'tostring'):
+			key.update(item.tostring())
+		else:
+			key.update(repr(item))
+	return key.hexdigest()
+
+
 ## \brief Abstract circuit class.
 #
 #
@@ -134,6 +235,9 @@ class Circuit(object):
 
 	cCoreINIT = False
 	cCore = None
+	
+	## False for circuits with a state in python, that the run cache cannot save.
+	cacheable = True
 
 	
 	
@@ -160,6 +264,10 @@ class Circuit(object):
 		# expose the computed value right after the Update routine.
 		self.pushed = False
 		
+		## The circuit is updated once every this many steps of the main machine,
+		# see Machine.AddCircuit.
+		self.every = 1
+		
 		## Dictionary of input channels
 		self.I = OrderedDict()
 		
@@ -173,6 +281,10 @@ class Circuit(object):
 		## index of circuit in cCore
 		self.cCoreID = -1
 		
+		## Hash of the data used by the circuit outside of the cCore state,
+		# like force fields, see DataKey. It is part of the key of the run cache.
+		self.datakey = ''
+		
 		#init the cCore if itz the first time
 		if(Circuit.cCoreINIT == False):
 			print 'Initializing the cCore...'
@@ -182,10 +294,25 @@ class Circuit(object):
 
 			Circuit.cCore.INIT()
 			Circuit.cCore.ChannelToPy.restype = c_double
-			
+			Circuit.cCore.NewEngine.restype = c_void_p
+			Circuit.cCore.UseEngine.argtypes = [c_void_p]
+			Circuit.cCore.FreeEngine.argtypes = [c_void_p]
+			Circuit.cCore.GetReplica.restype = c_void_p
+			Circuit.cCore.StateSize.restype = c_longlong
+			Circuit.cCore.SignalArray.restype = POINTER(c_double)
+			Circuit.cCore.output_flush.restype = c_longlong
+			Circuit.cCore.recorder_info.restype = c_longlong
+			Circuit.cCore.recorder_data.restype = POINTER(c_double)
 			
 			Circuit.cCoreINIT = True
 		
+		## Engine of the machine this circuit belongs to.
+		# The main machine creates a new one.
+		if machine == None:
+			self.cCore = Engine(Circuit.cCore)
+		else:
+			self.cCore = machine.cCore
+		
 	
 	##\internal
 	## Default input channels initialisation.
@@ -214,7 +341,7 @@ class Circuit(object):
 		if 'pushed' in kwargs.keys():
 			self.pushed = bool(kwargs['pushed'])
 			if self.pushed:
-				Circuit.cCore.SetPushed(self.cCoreID, 1);
+				self.cCore.SetPushed(self.cCoreID, 1);
 			
 		print 'PY: circuit '+self.name+'('+self.__class__.__name__+') initiated.'
 	
@@ -230,7 +357,7 @@ class Circuit(object):
 				idx = self.I.keys().index(key) #find the position of the key
 				print "PY: "+key+" is an input channel, calling cCore:",idx,c_double(kwargs[key])
 				
-				Circuit.cCore.SetInput(self.cCoreID, idx, c_double(kwargs[key]))
+				self.cCore.SetInput(self.cCoreID, idx, c_double(kwargs[key]))
 				
 				
 				print "   input "+key+" -> "+str(kwargs[key])
@@ -249,9 +376,9 @@ class Circuit(object):
 		
 		print 'PY: setccorechannels...'
 		
-		getins = Circuit.cCore.GetInputs
+		getins = self.cCore.GetInputs
 		getins.restype = POINTER(c_int)
-		getouts = Circuit.cCore.GetOutputs
+		getouts = self.cCore.GetOutputs
 		getouts.restype = POINTER(c_int)
 		
 		
@@ -11,24 +11,103 @@ from vafmbase import Channel
 
 from ctypes import *
 import threading
+import numpy
 
-import vafmcircuits_math, vafmcircuits_output, vafmcircuits_signal_gens, vafmcircuits_Cantilever
-import vafmcircuits_Logic, vafmcircuits_Filters, vafmcircuits_control, vafmcircuits_Interpolation
-import vafmcircuits_signal_processing, vafmcircuits_Scanner, vafmcircuits_FlipFlop
-import vafmcircuits_pycirc, vafmcircuits_Comparison, vafmcircuits_avg
-import vafmcircuits_VDW
-import vafmcircuits_STM
-import vafmcircuits_Dipole
-import vafmcircuits_MechAFM
-import vafmcircuits_GaussSmear
-import vafmcircuits_DFTVDW
-import vafmcircuits_TutCircuit
+import importlib
+import hashlib
+import vafmnative
+import vafmruncache
 
 ## \package vafmcircuits
 # \brief This file contains the main Machine circuit.
 #
 
 
+## \internal
+## Circuit types defined in each module.
+# Modules are imported only when one of their circuits is first added to a
+# machine, so that scripts do not load scipy and matplotlib unless they
+# use circuits that need them.
+_circuitmodules = {
+	'vafmcircuits_math': ['opAdd', 'opSub', 'opMul', 'opDiv', 'opLinC', 'opAbs', 'opPow', 'opSin', 'opCos', 'Perlin', 'ComplexMagAndPhase', 'expr'],
+	'vafmcircuits_output': ['output', 'recorder', 'scope'],
+	'vafmcircuits_signal_gens': ['waver', 'square', 'noise'],
+	'vafmcircuits_Cantilever': ['Cantilever', 'AdvancedCantilever', 'AnalyticalCantilever'],
+	'vafmcircuits_Logic': ['NOT', 'AND', 'NAND', 'OR', 'XOR', 'NOR'],
+	'vafmcircuits_Filters': ['SKLP', 'SKHP', 'SKBP', 'RCLP', 'RCHP'],
+	'vafmcircuits_control': ['PI', 'PID'],
+	'vafmcircuits_Interpolation': ['i3Dlin', 'i1Dlin', 'i4DlinVasp', 'i4Dlin', 'MechAfmToPyVafm'],
+	'vafmcircuits_signal_processing': ['gain', 'minmax', 'derivative', 'integral', 'delay', 'peaker', 'phasor', 'limiter', 'flip'],
+	'vafmcircuits_Scanner': ['Scanner', 'CoordTransform'],
+	'vafmcircuits_FlipFlop': ['SRFlipFlop', 'JKFlipFlop', 'DFlipFlop', 'DRFlipFlop'],
+	'vafmcircuits_pycirc': ['PYCircuit', 'myCirc', 'BlockPYCircuit', 'myBlockCirc'],
+	'vafmcircuits_Comparison': ['GreaterOrEqual', 'LessOrEqual', 'Equal'],
+	'vafmcircuits_avg': ['avg'],
+	'vafmcircuits_VDW': ['VDW', 'VDWtorn', 'LJ'],
+	'vafmcircuits_STM': ['STM'],
+	'vafmcircuits_Dipole': ['PlotAtoms', 'ExtractPotential', 'LOCPOTShaping', 'Dipole'],
+	'vafmcircuits_MechAFM': ['MechAFM', 'SimpleAFM'],
+	'vafmcircuits_GaussSmear': ['GausSmear'],
+	'vafmcircuits_DFTVDW': ['DFTD3'],
+	'vafmcircuits_TutCircuit': ['TutCircuit'],
+}
+
+## Module of each circuit type, see RegisterCircuit.
+CircuitTypes = {'Machine': 'vafmcircuits'}
+for _module in _circuitmodules.keys():
+	for _ctype in _circuitmodules[_module]:
+		CircuitTypes[_ctype] = _module
+
+_circuitclasses = {}
+
+## Register a new circuit type.
+#
+# Circuits defined in modules named vafmcircuits_* are found anyway, once the
+# module is imported, but registering them avoids importing the module
+# before the circuit is used.
+#
+# @param ctype Name of the circuit type, used in Machine.AddCircuit.
+# @param target The circuit class, or the name of the module defining it.
+#
+# \b Example:
+# \code{.py}
+# vafmcircuits.RegisterCircuit('myFilter', 'mycircuits')
+# machine.AddCircuit(type='myFilter', name='filter')
+# \endcode
+#
+def RegisterCircuit(ctype, target):
+	
+	if isinstance(target, basestring):
+		CircuitTypes[ctype] = target
+		_circuitclasses.pop(ctype, None)
+	else:
+		_circuitclasses[ctype] = target
+
+## \internal
+## Class of the circuit type ctype, importing its module if needed.
+# Types that are not registered are searched in the vafmcircuits modules
+# already imported.
+def _CircuitClass(ctype):
+	
+	if ctype in _circuitclasses:
+		return _circuitclasses[ctype]
+	
+	classobj = None
+	if ctype in CircuitTypes:
+		classobj = getattr(importlib.import_module(CircuitTypes[ctype]), ctype, None)
+	else:
+		for name in sys.modules.keys():
+			if name.startswith('vafmcircuits') and sys.modules[name] != None:
+				c = getattr(sys.modules[name], ctype, None)
+				if inspect.isclass(c):
+					classobj = c
+					break
+	
+	if classobj != None:
+		_circuitclasses[ctype] = classobj
+	return classobj
+
+
 ## Virtual %Machine main class.
 #
 # This is the main virtual machine object. It can also be used as a conventional \link vafmbase.Circuit circuit \endlink, acting as a
@@ -38,6 +117,8 @@ import vafmcircuits_TutCircuit
 #
 # \b Initialisation \b parameters:
 #	- \a dt = timestep (only for main machine)
+#	- \a replicas = number of copies of the setup updated together (only for main machine)
+#	- \a seed = seed of the random numbers, see SetSeed (only for main machine)
 #	- \a assembly = constructor function (only for composites)
 # 	- \a pushed = True|False  push the output buffer immediately if True
 #
@@ -62,7 +143,7 @@ import vafmcircuits_TutCircuit
 #
 class Machine(Circuit):
 
-	singleton = False
+	## First main machine that was created.
 	main = None
 	
 	
@@ -77,20 +158,18 @@ class Machine(Circuit):
 	#
 	# \endcode
 	#
-	# \note Only one machine can be initialised this way.
+	# \note Each machine created this way gets its own engine in the cCore, so
+	# several independent setups can be built and run in the same script,
+	# also from different threads.
 	#
 	def __init__(self, machine=None, name="machine", **keys):
 		
 		isMain = 0
 		
-		if (Machine.singleton == True and machine == None):
-			raise NameError ("ERROR! Only one main machine can be initialised!")
-		
-		if(Machine.singleton == False and machine == None):
-			#if this is the absolute first machine to be added
+		if(machine == None):
 			print "Init main machine..."
-			Machine.singleton = True
-			Machine.main = self
+			if Machine.main == None:
+				Machine.main = self
 			isMain = 1
 			
 
@@ -100,6 +179,9 @@ class Machine(Circuit):
 		
 		super(self.__class__, self).__init__( machine, name )
 
+		#the subcircuits of a composite inherit its rate
+		if(machine != None):
+			self.every = machine.every*int(keys.get('every', 1))
 
 		## \brief Ordered dictionary of the circuits in the setup.
 		# Ordered dictionary of the circuits in the setup. The dictionary keys are the circuit names, the values are
@@ -127,8 +209,30 @@ class Machine(Circuit):
 		## Integer number of update steps so far.
 		self._idt = 0;
 		
+		## Number of replicas of the setup, updated together by the cCore.
+		#
+		# Replicas are copies of the whole setup with their own signals and
+		# circuit states. They are created when the machine is first run, after
+		# the setup is complete.
+		self.replicas = 1
+		if(machine == None and 'replicas' in keys.keys()):
+			self.replicas = int(keys['replicas'])
+		self._replicated = False
+		self._replicakeys = []
+		
+		## True while python holds views of the signal arrays, see SignalView.
+		self._pinned = False
+		
+		## Cache of completed runs, see EnableCache.
+		self._runcache = None
+		
+		## Steps in a block of the feed-forward region, see Compile.
+		self._block = 0
+		
 		if(machine == None):
-			Circuit.cCore.SetTimeStep(c_double(self.dt))
+			self.cCore.SetTimeStep(c_double(self.dt))
+			if 'seed' in keys.keys():
+				self.SetSeed(keys['seed'])
 		
 		self._MetaI = OrderedDict()
 		self.cCoreI = []
@@ -146,7 +250,7 @@ class Machine(Circuit):
 		else:
 			owneridx = self.machine.cCoreID
 		
-		self.cCoreID = Circuit.cCore.Add_Container(owneridx,isMain)
+		self.cCoreID = self.cCore.Add_Container(owneridx,isMain)
 		
 		
 		if self.machine == None:
@@ -170,13 +274,13 @@ class Machine(Circuit):
 	#
 	def SetCCoreChannels(self):
 		
-		#for a container, Circuit.cCore.GetInputs gives the indexes of the dummy
+		#for a container, self.cCore.GetInputs gives the indexes of the dummy
 		#relay circuits that represents external channels
 		
 		
-		getins = Circuit.cCore.GetInputs
+		getins = self.cCore.GetInputs
 		getins.restype = POINTER(c_int)
-		getouts = Circuit.cCore.GetOutputs
+		getouts = self.cCore.GetOutputs
 		getouts.restype = POINTER(c_int)
 		
 		# get the indexes of input(original) channels
@@ -216,7 +320,7 @@ class Machine(Circuit):
 				idx = self.I.keys().index(key) #find the position of the key
 				print "PY: "+key+" is an input channel, calling cCore(c):",idx,c_double(kwargs[key])
 				
-				Circuit.cCore.SetContainerInput(self.cCoreID, idx, c_double(kwargs[key]))
+				self.cCore.SetContainerInput(self.cCoreID, idx, c_double(kwargs[key]))
 				
 				
 				print "   input "+key+" -> "+str(kwargs[key])
@@ -303,11 +407,14 @@ class Machine(Circuit):
 		if name in self.I.keys() or name in self.O.keys():
 			raise NameError("A channel named "+name+" already exists in composite circuit "+ str(self))
 
+		# add the channel also on the cCore
+		dummy = self.cCore.Add_ChannelToContainer(self.cCoreID, 1) #1 for input
+		if dummy < 0:
+			raise RuntimeError("Channels cannot be added while the signal arrays are pinned by SignalView!")
+		self.cCoreI.append(dummy)
+
 		self.I[name] = Channel(name,self,True)
 		self._MetaI[name] = Channel(name,self,False)
-		
-		# add the channel also on the cCore
-		self.cCoreI.append(Circuit.cCore.Add_ChannelToContainer(self.cCoreID, 1)) #1 for input
 
 		print "Circuit ",self.name," added channel",name
 
@@ -333,11 +440,14 @@ class Machine(Circuit):
 		if name in self.I.keys() or name in self.O.keys():
 			raise NameError("A channel named "+name+" already exists in composite circuit "+ str(self))
 
+		# add the channel also on the cCore
+		dummy = self.cCore.Add_ChannelToContainer(self.cCoreID, 0) #1 for input
+		if dummy < 0:
+			raise RuntimeError("Channels cannot be added while the signal arrays are pinned by SignalView!")
+		self.cCoreO.append(dummy)
+
 		self.O[name] = Channel(name,self,False)
 		self._MetaO[name] = Channel(name,self,True)
-		
-		# add the channel also on the cCore
-		self.cCoreO.append(Circuit.cCore.Add_ChannelToContainer(self.cCoreID, 0))#1 for input
 
 		
 
@@ -354,8 +464,17 @@ class Machine(Circuit):
     #
 	# - Optional arguments:\n
     # 	- pushed = bool: defined the output behaviour model.\n
+    # 	- every = int: update the circuit only once every this many steps, see below.\n
     #	- others: specific arguments depending on the particular circuit to add.
     #
+    # Circuits that follow slow signals, like scanners, controllers of slow loops
+    # or outputs, can be updated at a lower rate with \a every. They are updated
+    # on the steps that are multiples of \a every, and their outputs hold the last
+    # value in between. Their timestep is \a every times the one of the machine,
+    # so filter coefficients, integrals and delay lengths are computed for the
+    # rate they actually run at. A composite Machine added with \a every runs all
+    # its subcircuits at the lower rate, and the divisors of nested composites
+    # are multiplied.
     # 
     # @param **argkw Keyworded arguments for circuit initialisation.
     #
@@ -367,15 +486,13 @@ class Machine(Circuit):
 	#
 	# machine.AddCircuit(type='opAdd',name='adder',factors=2, pushed=True)
 	# machine.AddCircuit(type='output',name='log',file='log.log', dump=1)
+	# machine.AddCircuit(type='PI',name='pi',set=1,Kp=0.5,Ki=10, every=16)
 	# \endcode
 	#
 	def AddCircuit(self, **argkw):
 		
 		
 		
-		lst = sys.modules.keys()
-		classobj = None
-
 		#check for mandatory arguments, type and name
 		if not ("type" in argkw.keys()):
 			raise SyntaxError("The circuit type was not specified.")
@@ -386,30 +503,76 @@ class Machine(Circuit):
 		cname = argkw["name"]
 
 		print "new circuit: " + ctype + "  " + cname
-		for i in range(len(lst)): #loop over the modules
-
-			if lst[i].startswith('vafmcircuits'): #if the module is a vafmcircuits module
-
-				#extract classes from the module, except the abstract one
-				c = [s for s in inspect.getmembers(sys.modules[lst[i]], inspect.isclass) if s[0]==ctype]
-
-				if len(c)!=0:
-					classobj = c[0]
-					break
+		classobj = _CircuitClass(ctype)
 
 		#check if the type was good
 		if classobj == None:
 			raise NotImplementedError("Circuit "+ctype+" was not implemented or imported!")
 
 		#check if the name was good
-		if cname in self.circuits.keys():
+		if cname in self.circuits:
 			raise NameError("A circuit named '"+cname+"' already exists in the setup!")
 
-		#instantiate
-		instance = classobj[1](machine=self, **argkw)
+		every = int(argkw.get('every', 1))
+		if every < 1:
+			raise ValueError("The rate divisor every of "+cname+" must be at least 1!")
+
+		main = self._Main()
+		if main._replicated:
+			raise RuntimeError("Circuits cannot be added after the replicas were created!")
+		if main._pinned:
+			raise RuntimeError("Circuits cannot be added while the signal arrays are pinned by SignalView!")
+
+		#parameters given per replica as numpy arrays
+		perreplica = []
+		if main.replicas > 1:
+			perreplica = [k for k in argkw.keys() if isinstance(argkw[k], numpy.ndarray)]
+		
+		if len(perreplica) > 0:
+			if ctype == 'Machine':
+				raise SyntaxError("Composite circuits cannot have per replica parameters.")
+			for k in perreplica:
+				if len(argkw[k]) != main.replicas:
+					raise ValueError("Parameter "+k+" of "+cname+" should have one value per replica!")
+			
+			#the circuit is built with the values of the first replica
+			instance = self._Instantiate(classobj, main._ReplicaKeys(argkw, 0))
+			main._replicakeys.append((self, classobj, instance, argkw))
+		else:
+			#instantiate
+			instance = self._Instantiate(classobj, argkw)
+		
 		self.circuits[cname] = instance
 		return instance
 
+	## \internal
+	## Create a circuit of class classobj in this machine. Circuits with a
+	# lower rate are built with their own timestep, both in python and in the
+	# cCore, so that everything derived from dt is computed for that rate.
+	def _Instantiate(self, classobj, keys):
+		
+		every = int(keys.get('every', 1))
+		rate = self.every*every
+		if rate == 1:
+			return classobj(machine=self, **keys)
+		
+		main = self._Main()
+		maindt, dt = main.dt, self.dt
+		self.dt = dt*every
+		self.cCore.SetTimeStep(c_double(maindt*rate))
+		try:
+			instance = classobj(machine=self, **keys)
+		finally:
+			self.dt = dt
+			self.cCore.SetTimeStep(c_double(maindt))
+		
+		#composites pass the rate to their subcircuits instead
+		instance.every = rate
+		if not isinstance(instance, Machine):
+			self.cCore.SetRate(instance.cCoreID, rate)
+		
+		return instance
+
 	##\internal
 	## Find the channel with the given tag among the subcircuits.
 	# The tag of a channel is a string containing the name of the circuit to which it belongs
@@ -446,7 +609,7 @@ class Machine(Circuit):
 			raise SyntaxError ("GetInternalChannel error: the VAFM can only perform connections between internal circuits")
 
 		#check the name of the circuit
-		if not(cname in self.circuits.keys()):
+		if not(cname in self.circuits):
 			raise NameError( "GetInternalChannel error: circuit "+cname+" not found." )
 
 		#get the circuit
@@ -648,12 +811,28 @@ class Machine(Circuit):
 
 			print 'PY: connecting ',ccSrcID,ccSrcCH,ccDstID,ccDstCH
 			
-			Circuit.cCore.Connect(ccSrcID,ccSrcCH, ccDstID, ccDstCH)
+			self.cCore.Connect(ccSrcID,ccSrcCH, ccDstID, ccDstCH)
 
 			print 'PY: connection done!'
 
 	def Connect(self, *args):
 
+		if self._Main()._replicated:
+			raise RuntimeError("Connections cannot be changed after the replicas were created!")
+
+		for link, outsignal, target in self._ResolveConnect(*args):
+			
+			target.signal = outsignal.signal
+			
+			#connect in cCore: Connect(int c1, int out, int c2, int in)
+			self.cCore.Connect(*link)
+
+	## \internal
+	## Find the cCore indexes of a connection, without connecting.
+	# @return List of (link, source, target): link holds the arguments
+	# of the cCore Connect, source and target are the python channels.
+	def _ResolveConnect(self, *args):
+
 		#if the output is a global, then it means that we want to connect
 		#the global input to input channels in the machine
 		
@@ -663,6 +842,7 @@ class Machine(Circuit):
 		ccDstCH = -1
 		
 		metaSrc = 0
+		links = []
 		
 		chname = args[0].split('.',2)[1];
 		#find the output channel
@@ -694,16 +874,39 @@ class Machine(Circuit):
 				ccDstID = target.owner.cCoreID
 				ccDstCH = target.owner.I.keys().index(chname)
 
+			links.append(((ccSrcID, ccSrcCH, metaSrc, ccDstID, ccDstCH, metaDst), outsignal, target))
 
-			
-			target.signal = outsignal.signal
-			
-			#connect in cCore: Connect(int c1, int out, int c2, int in)
+		return links
 
-			
-			Circuit.cCore.Connect(ccSrcID,ccSrcCH, metaSrc, ccDstID, ccDstCH,metaDst)
+	## \internal
+	## Make many connections in one cCore call.
+	# The python channels are connected as in Connect, finding them by
+	# their cCore indexes.
+	# @param links List of cCore links, the first item of each connection given by _ResolveConnect.
+	def _ConnectMany(self, links):
+
+		main = self._Main()
+		if main._replicated:
+			raise RuntimeError("Connections cannot be changed after the replicas were created!")
+
+		owners = dict([(circ.cCoreID, circ) for name, circ in main._AllCircuits()])
+		owners[main.cCoreID] = main
+		for src, srcch, metasrc, dst, dstch, metadst in links:
+			source, dest = owners[src], owners[dst]
+			if metasrc == 1:
+				outsignal = source._MetaI[source.I.keys()[srcch]]
+			else:
+				outsignal = source.O.values()[srcch]
+			if metadst == 1:
+				target = dest._MetaO[dest.O.keys()[dstch]]
+			else:
+				target = dest.I.values()[dstch]
+			target.signal = outsignal.signal
 
-			
+		flat = (c_int*(6*len(links)+1))()
+		for i in xrange(len(links)):
+			flat[6*i:6*i+6] = list(links[i])
+		self.cCore.ConnectMany(len(links), flat)
 
 	# Disconnects the input channels listed in the arguments. Each channel must be given as
 	# a string in the format "circuit.channel".
@@ -753,7 +956,7 @@ class Machine(Circuit):
 		else:
 			idx = circ.O.keys().index(key)
 		print "PY: setinput "+circ.name+"."+key+": "+str(value),circ.cCoreID,idx
-		Circuit.cCore.SetInput(circ.cCoreID, idx, c_double(value))
+		self.cCore.SetInput(circ.cCoreID, idx, c_double(value))
 		
 		
 
@@ -800,7 +1003,8 @@ class Machine(Circuit):
 
 	def Update(self):
 		
-		Circuit.cCore.Update(1)
+		self._PrepareReplicas()
+		self.cCore.Update(1)
 		
 		
 
@@ -835,7 +1039,8 @@ class Machine(Circuit):
 	# 
 	def Wait(self, dtime):
 		
-		Circuit.cCore.Update(c_ulonglong(int(math.floor(dtime/self.dt))))
+		self._PrepareReplicas()
+		self._Run(int(math.floor(dtime/self.dt)))
 	
 	## Integrate the machine.
 	#
@@ -843,12 +1048,705 @@ class Machine(Circuit):
 	# 
 	def WaitSteps(self, nsteps):
 		
-		Circuit.cCore.Update(c_ulonglong(int(nsteps)))
+		self._PrepareReplicas()
+		self._Run(int(nsteps))
+
+	## \internal
+	## Update for nsteps steps, going through the run cache if it is enabled.
+	def _Run(self, nsteps):
+		
+		main = self._Main()
+		if main._runcache == None:
+			self.cCore.Update(c_ulonglong(nsteps))
+			return
+		
+		key = main._RunKey(nsteps)
+		if key == None:
+			main._runcache.skipped += 1
+			self.cCore.Update(c_ulonglong(nsteps))
+			return
+		
+		outputs = [circ for name, circ in main._AllCircuits() if hasattr(circ, '_Replay')]
+		
+		entry = main._runcache.Get(key)
+		if entry != None:
+			main.Restore(entry['state'])
+			for circ in outputs:
+				circ._Replay(entry['outputs'].get(circ.cCoreID, None))
+			return
+		
+		start = [circ._Mark() for circ in outputs]
+		self.cCore.Update(c_ulonglong(nsteps))
+		
+		#what the outputs wrote during the run
+		written = {}
+		for circ, mark in zip(outputs, start):
+			written[circ.cCoreID] = circ._Since(mark)
+		
+		main._runcache.Put(key, {'state': main.Snapshot(), 'outputs': written, 'steps': nsteps})
+
+	## \internal
+	## Key of a run of nsteps steps from the current state, or None if the
+	# setup has circuits with a state in python.
+	def _RunKey(self, nsteps):
+		
+		key = hashlib.sha1()
+		key.update(repr(('vafm run', 3, nsteps, self.dt, self.replicas)))
+		
+		for name, circ in self._AllCircuits():
+			if not circ.cacheable:
+				return None
+			key.update(repr((name, circ.__class__.__name__, circ.cCoreID, circ.every, circ.datakey)))
+			if hasattr(circ, '_Replay'):
+				key.update(repr([(ch.owner.cCoreID, ch.cCoreCHID, ch.cisInput) for ch in circ.channels]))
+				key.update(repr(circ._tags))
+		
+		#feeds read and written by each circuit, that is the connections
+		nio = (c_int*3)()
+		for c in xrange(self.cCore.CircuitCount()):
+			self.cCore.CircuitInfo(c, nio, None, None)
+			ins, outs = (c_int*(nio[0]+1))(), (c_int*(nio[1]+1))()
+			self.cCore.CircuitInfo(c, nio, ins, outs)
+			key.update(repr((c, ins[:nio[0]], outs[:nio[1]])))
+		
+		#order of the updates and copies of the channels, then parameters and states
+		schedule, push = vafmnative._Schedule(self.cCore)
+		key.update(repr((schedule, push)))
+		key.update(self.Snapshot())
+		
+		return key.hexdigest()
+
+	## \internal
+	## List of (name, circuit) of all the circuits in the setup, including
+	# those inside composite circuits.
+	def _AllCircuits(self, prefix=""):
+		
+		circs = []
+		for name, circ in self.circuits.items():
+			circs.append((prefix+name, circ))
+			if isinstance(circ, Machine):
+				circs += circ._AllCircuits(prefix+name+".")
+		return circs
+
+	## Enable the cache of completed runs.
+	#
+	# Before each Wait or WaitSteps, the key of the run is computed from the number of
+	# steps, the timestep, the circuits with their connections, parameters and
+	# state, and the data they use, like force fields. If a run with the same key
+	# was done before, its final state is restored and what the output circuits
+	# wrote is written again in their files, instead of updating the setup.
+	# Setups with python circuits are never cached, since their state is
+	# not known to the cCore.
+	#
+	# @param directory Directory of the cache, shared by all the scripts using it.
+	# @param maxbytes Maximum size of the cache, least recently used runs are removed first.
+	#
+	# \b Example:
+	# \code{.py}
+	# machine.EnableCache(maxbytes=10*2**30)
+	# machine.Wait(0.1)	# fast when the script is run again
+	# print machine.cache_info()
+	# \endcode
+	#
+	def EnableCache(self, directory=None, maxbytes=1<<30):
+		
+		self._Main()._runcache = vafmruncache.RunCache(directory, maxbytes)
+
+	## Disable the cache of completed runs.
+	def DisableCache(self):
+		
+		self._Main()._runcache = None
+
+	## Statistics of the run cache.
+	# @return Dictionary with the hits, misses, runs that could not be cached,
+	# number and size of the stored runs, or None if the cache is disabled.
+	def cache_info(self):
+		
+		cache = self._Main()._runcache
+		if cache == None:
+			return None
+		return cache.Info()
+
+	## Integrate the machine until a condition on a channel is met.
+	#
+	# The condition is checked by the cCore after each step, and it is met when
+	# it has been true for \a hold_steps steps in a row.
+	# Available operators are '<', '<=', '>', '>=', 'abs<' and 'abs>', comparing
+	# the value of the channel with the threshold, and 'delta<' that checks the
+	# change of the channel during the last step.
+	# With replicas, the condition has to be met in all of them.
+	#
+	# @param channel Tag of the channel as a 'circuit.channel' string.
+	# @param op Comparison operator.
+	# @param threshold Value to compare with.
+	# @param hold_steps Number of consecutive steps the condition has to be true.
+	# @param timeout Maximum time to wait, no limit if None.
+	# @return Tuple with the number of steps done and the reason to stop: 'condition' or 'timeout'.
+	#
+	# \b Example:
+	# \code{.py}
+	# # wait for the PLL to lock, at most 10ms
+	# steps, reason = machine.WaitUntil('pll.df', 'delta<', 1.0e-3, hold_steps=1000, timeout=0.01)
+	# \endcode
+	#
+	def WaitUntil(self, channel, op, threshold, hold_steps=1, timeout=None):
+		
+		return self.WaitUntilAll([(channel, op, threshold, hold_steps)], timeout)
+
+	## Integrate the machine until all the given conditions are met at the same time.
+	#
+	# @param conditions List of tuples (channel, op, threshold) or (channel, op, threshold, hold_steps),
+	# as the arguments of WaitUntil.
+	# @param timeout Maximum time to wait, no limit if None.
+	# @return Tuple with the number of steps done and the reason to stop: 'condition' or 'timeout'.
+	#
+	# \b Example:
+	# \code{.py}
+	# machine.WaitUntilAll([('pll.df', 'delta<', 1.0e-3, 1000), ('agc.out', 'delta<', 1.0e-4, 1000)])
+	# \endcode
+	#
+	def WaitUntilAll(self, conditions, timeout=None):
+		
+		return self._WaitConditions(conditions, 0, timeout)
+
+	## Integrate the machine until any of the given conditions is met.
+	#
+	# @param conditions List of tuples (channel, op, threshold) or (channel, op, threshold, hold_steps),
+	# as the arguments of WaitUntil.
+	# @param timeout Maximum time to wait, no limit if None.
+	# @return Tuple with the number of steps done and the reason to stop: 'condition' or 'timeout'.
+	#
+	def WaitUntilAny(self, conditions, timeout=None):
+		
+		return self._WaitConditions(conditions, 1, timeout)
+
+	## \internal
+	## Operators of the wait conditions, with their code in the cCore.
+	_conditionops = {'<':0, '<=':1, '>':2, '>=':3, 'abs<':4, 'abs>':5, 'delta<':6}
+
+	## \internal
+	## Setup the conditions in the cCore and run until they are met.
+	def _WaitConditions(self, conditions, mode, timeout):
+		
+		main = self._Main()
+		main._PrepareReplicas()
+		
+		main.cCore.ClearConditions()
+		for cond in conditions:
+			
+			if len(cond) == 3:
+				channel, op, threshold = cond
+				hold = 1
+			else:
+				channel, op, threshold, hold = cond
+			
+			if not (op in Machine._conditionops):
+				raise ValueError("Unknown condition operator "+str(op)+"!")
+			
+			ch = self.GetChannel(channel)
+			main.cCore.AddCondition(ch.owner.cCoreID, ch.cCoreCHID, ch.cisInput,
+				Machine._conditionops[op], c_double(threshold), int(hold))
+		
+		maxsteps = 2**64-1
+		if timeout != None:
+			maxsteps = int(math.floor(timeout/main.dt))
+		
+		reason = c_int(0)
+		main.cCore.UpdateUntil.restype = c_ulonglong
+		steps = main.cCore.UpdateUntil(c_ulonglong(maxsteps), mode, byref(reason))
+		main.cCore.ClearConditions()
+		
+		if reason.value == 1:
+			return steps, 'condition'
+		return steps, 'timeout'
+
+	## Integrate the machine in a background thread.
+	#
+	# The cCore runs the steps in blocks, updating a progress counter and
+	# checking for cancel requests after each block, while the calling thread is
+	# free to do something else. The setup should not be changed while the run is going.
+	#
+	# @param steps Number of steps to do.
+	# @param callback Optional function called from the background thread every \a every steps,
+	# with the AsyncRun handle as argument.
+	# @param every Steps between callbacks.
+	# @param block Steps between progress updates and cancel checks in the cCore.
+	# @return AsyncRun handle of the run.
+	#
+	# \b Example:
+	# \code{.py}
+	# run = machine.RunAsync(1000000, callback=lambda r: plot(r.progress), every=10000)
+	# ...
+	# if userPressedStop:
+	#	run.cancel()
+	# steps = run.result()
+	# \endcode
+	#
+	def RunAsync(self, steps, callback=None, every=None, block=1000):
+		
+		main = self._Main()
+		main._PrepareReplicas()
+		
+		return AsyncRun(main, int(steps), callback, every, block)
+
+	## Turn profiling of the cCore on or off.
+	#
+	# While profiling is on, the cCore measures the time spent updating each
+	# circuit, relaying the channels of composite machines and pushing
+	# channels at the end of the step. Turning it on clears the counters.
+	# When it is off the normal update loop is used, without overhead.
+	#
+	# @param on True to start profiling, False to stop.
+	#
+	def Profiling(self, on=True):
+		
+		main = self._Main()
+		main._PrepareReplicas()
+		main.cCore.SetProfiling(int(bool(on)))
+
+	## Results of the profiling.
+	#
+	# @return Ordered dictionary of (calls, seconds) tuples, keyed by circuit name and sorted
+	# by time. Circuits inside composite machines are named 'composite.circuit'. The time
+	# spent in the relays of composites and in the final push of each step are
+	# given as '<relays>' and '<push>'. With replicas, the values are summed over all of them.
+	#
+	# \b Example:
+	# \code{.py}
+	# machine.Profiling(True)
+	# machine.Wait(0.01)
+	# for name, (calls, seconds) in machine.Profile().items():
+	#	print name, calls, seconds
+	# \endcode
+	#
+	def Profile(self):
+		
+		main = self._Main()
+		n = main.cCore.CircuitCount()
+		
+		times = numpy.zeros(n)
+		calls = numpy.zeros(n, dtype=numpy.uint64)
+		extra = numpy.zeros(2)
+		main.cCore.GetProfile(times.ctypes.data_as(POINTER(c_double)),
+			calls.ctypes.data_as(POINTER(c_ulonglong)), extra.ctypes.data_as(POINTER(c_double)))
+		
+		results = [(name, (int(calls[i]), times[i]*1.0e-9)) for i, name in main._CircuitNames().items()
+			if i >= 0 and i < n and calls[i] > 0]
+		results.append(('<relays>', (0, extra[0]*1.0e-9)))
+		results.append(('<push>', (0, extra[1]*1.0e-9)))
+		
+		results.sort(key=lambda r: r[1][1], reverse=True)
+		return OrderedDict(results)
+
+	## \internal
+	## Dictionary of the names of the circuits in this machine and its composites,
+	# keyed by cCore index.
+	def _CircuitNames(self, prefix=""):
+		
+		names = {}
+		for name, circ in self.circuits.items():
+			names[circ.cCoreID] = prefix+name
+			if isinstance(circ, Machine):
+				names.update(circ._CircuitNames(prefix+name+"."))
+		return names
+
+	## Compile the update schedule of the setup.
+	#
+	# The cCore flattens the tree of machines and circuits in a single list of
+	# update and copy operations, which is then executed at every step.
+	# The schedule is compiled automatically by the first Wait after circuits,
+	# connections or pushed flags were changed, so calling this is only needed
+	# to exclude the compilation from timings.
+	#
+	# With \a native=True the schedule is also translated into C code, compiled
+	# with gcc and loaded, so that each step runs without going through the
+	# generic task loop. The compiled library is cached (see \link vafmnative vafmnative\endlink),
+	# so building the same setup again does not call the compiler.
+	# Any later change to circuits or connections goes back to the normal schedule,
+	# until Compile(native=True) is called again.
+	#
+	# With \a block, the circuits that are not part of a feedback loop and only
+	# feed other such circuits, like filters, maths and outputs that process the
+	# signals of the oscillating loop, are taken out of the step by step schedule.
+	# They are updated every \a block steps, one circuit at a time over the whole
+	# block, which is faster for long processing chains and gives the same results.
+	# Their channels are up to date whenever a Wait returns.
+	# The block size is kept until it is changed, and 0 goes back to the step by
+	# step update. Blocks cannot be used together with native code, and are not
+	# used in machines with replicas, which are updated in lockstep instead (see Replicate).
+	#
+	# @param native If True, generate and load native code for the schedule.
+	# @param block Number of steps in a block of the feed-forward region, 0 to disable.
+	#
+	# \b Example:
+	# \code{.py}
+	# machine.Compile(native=True)
+	# machine.Wait(10)
+	# \endcode
+	#
+	def Compile(self, native=False, block=None):
+
+		main = self._Main()
+		main._PrepareReplicas()
+		if block != None:
+			main._block = int(block)
+			main.cCore.SetBlockSize(main._block)
+		if native and main._block > 0:
+			raise ValueError("Native code cannot run the feed-forward region in blocks, use block=0.")
+		main.cCore.Compile()
+		
+		if native:
+			main._native = vafmnative.Build(main)
+
+	## \internal
+	## Main machine of the setup.
+	def _Main(self):
+		
+		main = self
+		while main.machine != None:
+			main = main.machine
+		return main
+
+	## \internal
+	## Keyword arguments of a circuit for replica r: per replica arrays are
+	# replaced by their r-th value.
+	def _ReplicaKeys(self, keys, r):
+		
+		rkeys = dict(keys)
+		for k in keys.keys():
+			if isinstance(keys[k], numpy.ndarray):
+				rkeys[k] = keys[k][r]
+		return rkeys
+
+	## \internal
+	## Create the replicas if they were requested and not created yet.
+	def _PrepareReplicas(self):
+		
+		main = self._Main()
+		if main.replicas > 1 and not main._replicated:
+			main.Replicate()
+
+	## Create the replicas of the setup.
+	#
+	# The cCore makes \a replicas copies of the main machine, including the current
+	# values of all channels and circuit states. Circuits that were given per replica
+	# parameters are then rebuilt in each copy with their own values.
+	# This is called automatically when the machine is first run, and afterwards
+	# circuits and connections cannot be changed.
+	#
+	# The replicas share the signal arrays of the cCore, with the values of each
+	# channel in all the replicas next to each other, and they are updated in lockstep:
+	# each circuit of the schedule is updated in all the replicas before the next one.
+	# Arithmetic circuits, SKLP filters, PI controllers and cantilevers do it in a
+	# single loop over the replicas, the other circuits one replica at a time.
+	# With profiling or native code the replicas are updated one after the other.
+	#
+	# \b Example:
+	# \code{.py}
+	# machine = Machine(name='machine', dt=1.0e-8, replicas=4)
+	# canti = machine.AddCircuit(type='Cantilever',name='canti', Q=numpy.array([1e3,1e4,1e5,1e6]), k=10, f0=1.5e5)
+	# ...
+	# machine.SetReplicas('agc.set', numpy.linspace(0.5,2,4))
+	# machine.Wait(0.01)
+	# print machine.GetReplicas('canti.ztip')
+	# \endcode
+	#
+	def Replicate(self):
+		
+		if self.machine != None:
+			raise SyntaxError("Only the main machine can be replicated.")
+		
+		if self.cCore.MakeReplicas(self.replicas) < 0:
+			raise RuntimeError("The machine cannot be replicated while a SignalView is in use!")
+		self._replicated = True
+		
+		for owner, cclass, instance, keys in self._replicakeys:
+			
+			#rebuild the circuit in each replica, with the same channels
+			for r in xrange(1,self.replicas):
+				
+				engine = self.cCore.Replica(r)
+				cCore = owner.cCore
+				owner.cCore = engine
+				
+				engine.RebuildCircuit(instance.cCoreID)
+				owner._Instantiate(cclass, self._ReplicaKeys(keys, r))
+				
+				owner.cCore = cCore
+
+	## Set the value of an input channel in all the replicas.
+	#
+	# @param channel Tag of the channel to set as a 'circuit.channel' string.
+	# @param values Array with one value for each replica.
+	#
+	def SetReplicas(self, channel, values):
+		
+		self._PrepareReplicas()
+		values = numpy.ascontiguousarray(values, dtype=numpy.float64)
+		if len(values) != self.replicas:
+			raise ValueError("SetReplicas needs one value per replica!")
+		
+		ch = self.GetChannel(channel)
+		self.cCore.PyToReplicas(ch.owner.cCoreID, ch.cCoreCHID, ch.cisInput, 
+			values.ctypes.data_as(POINTER(c_double)))
+
+	## Get the value of a channel in all the replicas.
+	#
+	# @param channel Tag of the channel as a 'circuit.channel' string.
+	# @return numpy array with one value for each replica.
+	#
+	def GetReplicas(self, channel):
+		
+		self._PrepareReplicas()
+		values = numpy.zeros(self.replicas)
+		
+		ch = self.GetChannel(channel)
+		self.cCore.ReplicasToPy(ch.owner.cCoreID, ch.cCoreCHID, ch.cisInput, 
+			values.ctypes.data_as(POINTER(c_double)))
+		return values
+
+	## Resolve a list of channel tags to their feeds in the cCore.
+	#
+	# The result can be given to GetValues and SetValues instead of the tags,
+	# to avoid looking up the channels again, and it tells where each channel
+	# is found in the arrays returned by SignalView.
+	# It stays valid until the connections are changed.
+	#
+	# @param tags List of channel tags as 'circuit.channel' strings.
+	# @return ChannelList object.
+	#
+	def ChannelIndex(self, tags):
+		
+		if isinstance(tags, ChannelList):
+			return tags
+		if isinstance(tags, basestring):
+			tags = [tags]
+		
+		feeds = (c_int*(4*len(tags)))()
+		part = (c_int*4)()
+		for i in xrange(len(tags)):
+			ch = self.GetChannel(tags[i])
+			self.cCore.ChannelFeeds(ch.owner.cCoreID, ch.cCoreCHID, ch.cisInput, part)
+			feeds[4*i:4*i+4] = part[:]
+		
+		return ChannelList(tags, feeds)
+
+	## Read the value of many channels at once.
+	#
+	# @param tags List of channel tags, or a ChannelList from ChannelIndex.
+	# @return numpy array with the values of the channels, or with one row
+	# of values for each replica if the machine has replicas.
+	#
+	# \b Example:
+	# \code{.py}
+	# chans = machine.ChannelIndex(['canti.ztip', 'pll.df', 'agc.out'])
+	# for i in xrange(1000):
+	#	machine.Wait(0.001)
+	#	ztip, df, exc = machine.GetValues(chans)
+	# \endcode
+	#
+	def GetValues(self, tags):
+		
+		main = self._Main()
+		main._PrepareReplicas()
+		chans = self.ChannelIndex(tags)
+		
+		values = numpy.zeros((main.replicas, len(chans)))
+		self.cCore.FeedsToPy(len(chans), chans.feeds, values.ctypes.data_as(POINTER(c_double)))
+		if main.replicas == 1:
+			return values[0]
+		return values
+
+	## Set the value of many channels at once.
+	#
+	# Values given to output channels are written in their buffer, as
+	# when setting Channel.value, and outputs of composite circuits are ignored.
+	#
+	# @param tags List of channel tags, or a ChannelList from ChannelIndex.
+	# @param values Array with the values, or with one row of values for each replica.
+	#
+	def SetValues(self, tags, values):
+		
+		main = self._Main()
+		main._PrepareReplicas()
+		chans = self.ChannelIndex(tags)
+		
+		values = numpy.ascontiguousarray(values, dtype=numpy.float64)
+		values = numpy.ascontiguousarray(numpy.broadcast_to(values, (main.replicas, len(chans))))
+		self.cCore.PyToFeeds(len(chans), chans.feeds, values.ctypes.data_as(POINTER(c_double)))
+
+	## Get numpy arrays that share memory with the signals and buffers of the cCore.
+	#
+	# The schedule is compiled and the arrays are pinned: they do not move
+	# as long as no circuits are added, and adding circuits or channels raises an
+	# error until ReleaseView is called. Reading the arrays costs nothing, and writing
+	# them changes the channels directly. Inputs are read from the signals and
+	# outputs from the buffers, see ChannelList.
+	#
+	# @param replica Index of the replica to view.
+	# @return Tuple of two numpy arrays, signals and buffers.
+	#
+	# \b Example:
+	# \code{.py}
+	# sig, buf = machine.SignalView()
+	# chans = machine.ChannelIndex(['canti.ztip', 'canti.zabs'])
+	# for i in xrange(1000):
+	#	machine.WaitSteps(10)
+	#	z[i] = buf[chans.index]
+	# \endcode
+	#
+	def SignalView(self, replica=0):
+		
+		main = self._Main()
+		main.Compile()
+		if replica < 0 or replica >= main.replicas:
+			raise ValueError("Replica "+str(replica)+" does not exist!")
+		
+		#replicas share the arrays, with the values of a channel next to each other
+		n, stride = main.cCore.ChannelCount(), main.cCore.ChannelStride()
+		sig = numpy.ctypeslib.as_array(main.cCore.SignalArray(0, 0), shape=(n*stride,))[replica::stride]
+		buf = numpy.ctypeslib.as_array(main.cCore.SignalArray(0, 1), shape=(n*stride,))[replica::stride]
+		main.cCore.PinSignals(1)
+		main._pinned = True
+		
+		return sig, buf
+
+	## Unpin the signal arrays, so that circuits can be added again.
+	#
+	# Arrays returned by SignalView must not be used afterwards.
+	#
+	def ReleaseView(self):
+		
+		main = self._Main()
+		main.cCore.PinSignals(0)
+		main._pinned = False
+
+	## Free the setup in the cCore.
+	#
+	# The engine of the main machine is released with its replicas and circuits,
+	# and the machine cannot be used afterwards. Engines are not freed when the
+	# machines are garbage collected, so scripts that build many setups in the same
+	# process, like the workers of a sweep, should close them.
+	# Force fields are shared and they are not released.
+	#
+	def Close(self):
+
+		main = self._Main()
+		main.cCore.Free()
+		main._pinned = False
+		if Machine.main is main:
+			Machine.main = None
+
+	## Set the seed of the random numbers.
+	#
+	# Each circuit that draws random numbers (noise, Perlin) has its own
+	# stream, given by the seed, its position in the setup and the replica,
+	# so two runs of the same setup with the same seed give the same results.
+	# Without a seed, every machine gets a different one. Setups with no such circuits
+	# do not depend on the seed, and their snapshots and cached runs ignore it.
+	# Replicas start their own streams, also for the numbers drawn when circuits were added.
+	# Circuits draw their first numbers when they are added, so the seed
+	# should be set before building the setup, or given to the constructor.
+	#
+	# @param seed Integer between 0 and 2**64-1.
+	#
+	# \b Example:
+	# \code{.py}
+	# machine = Machine(name='machine', dt=1.0e-8, seed=1234)
+	# \endcode
+	#
+	def SetSeed(self, seed):
+		
+		self._Main().cCore.SetSeed(c_ulonglong(int(seed) & 0xFFFFFFFFFFFFFFFF))
+	
+	## Seed of the random numbers.
+	def GetSeed(self):
+		
+		main = self._Main()
+		main.cCore.GetSeed.restype = c_ulonglong
+		return main.cCore.GetSeed()
+
+	## Take a snapshot of the state of the whole setup.
+	#
+	# The snapshot contains the value of all channels, the parameters and
+	# the internal state of all circuits (filter histories, delay buffers,
+	# scanner position...) and the simulation time, for all the replicas.
+	# It can be restored later in the same setup, for example to start many
+	# scans from the same settled state.
+	# The state of python circuits is not included.
+	#
+	# @return String with the binary state.
+	#
+	# \b Example:
+	# \code{.py}
+	# machine.Wait(0.02) # let the PLL and AGC settle
+	# settled = machine.Snapshot()
+	# for line in lines:
+	#	machine.Restore(settled)
+	#	...
+	# \endcode
+	#
+	def Snapshot(self):
+		
+		main = self._Main()
+		main._PrepareReplicas()
+		
+		state = create_string_buffer(main.cCore.StateSize())
+		main.cCore.SaveState(state)
+		return state.raw
+
+	## Restore a state taken with Snapshot.
+	#
+	# The state must come from the same setup, with the same circuits
+	# and connections, and from the same build of the cCore.
+	#
+	# @param state String returned by Snapshot.
+	#
+	def Restore(self, state):
+		
+		main = self._Main()
+		main._PrepareReplicas()
+		
+		if main.cCore.LoadState(state, c_longlong(len(state))) != 0:
+			raise ValueError("The state does not match this setup!")
+
+	## Save the state of the whole setup to a file.
+	#
+	# The file can be loaded with LoadState in the same setup, also in a later run
+	# of the same script, to skip the initial transient or to resume a long scan.
+	#
+	# @param path Name of the file.
+	#
+	# \b Example:
+	# \code{.py}
+	# if os.path.exists('settled.state'):
+	#	machine.LoadState('settled.state')
+	# else:
+	#	machine.Wait(0.02)
+	#	machine.SaveState('settled.state')
+	# \endcode
+	#
+	def SaveState(self, path):
+		
+		f = open(path, 'wb')
+		f.write(self.Snapshot())
+		f.close()
+
+	## Load the state of the setup from a file written by SaveState.
+	#
+	# @param path Name of the file.
+	#
+	def LoadState(self, path):
+		
+		f = open(path, 'rb')
+		state = f.read()
+		f.close()
+		self.Restore(state)
 		
 	def Wait2(self, dtime):
 		
 		for i in xrange(int(math.floor(dtime/self.dt))):
-			Circuit.cCore.Update(1)
+			self.cCore.Update(1)
 	
 	def WaitPY(self, dtime):
 		
@@ -865,5 +1763,125 @@ class Machine(Circuit):
 	
 
 
+## Handle of a machine run in a background thread.
+#
+# Returned by Machine.RunAsync, it works like a future: the run can be
+# followed with \a progress, stopped with cancel() and waited for with result().
+#
+class AsyncRun(object):
+
+	def __init__(self, machine, steps, callback=None, every=None, block=1000):
+		
+		## Machine that is running.
+		self.machine = machine
+		
+		## Total number of steps requested.
+		self.steps = steps
+		
+		self._callback = callback
+		self._every = steps
+		if callback != None and every != None:
+			self._every = max(1, int(every))
+		self._block = max(1, int(block))
+		
+		self._done = 0
+		self._cancelled = False
+		self._error = None
+		
+		self.machine.cCore.RunSteps.restype = c_ulonglong
+		self.machine.cCore.RunProgress.restype = c_ulonglong
+		self.machine.cCore.ResetRun()
+		
+		self._thread = threading.Thread(target=self._Run)
+		self._thread.daemon = True
+		self._thread.start()
+
+	## \internal
+	## Body of the background thread.
+	def _Run(self):
+		
+		try:
+			while self._done < self.steps and not self._cancelled:
+				
+				n = min(self._every, self.steps - self._done)
+				self._done += self.machine.cCore.RunSteps(c_ulonglong(n), c_ulonglong(self._block))
+				
+				if self._callback != None and not self._cancelled:
+					self._callback(self)
+		except Exception, e:
+			self._error = e
 
+	## Number of steps done so far.
+	@property
+	def progress(self):
+		
+		if not self._thread.is_alive():
+			return self._done
+		return self.machine.cCore.RunProgress()
 
+	## Ask the run to stop.
+	#
+	# The cCore stops at the end of the current block of steps.
+	def cancel(self):
+		
+		self._cancelled = True
+		self.machine.cCore.CancelRun()
+
+	## True if the run was cancelled.
+	def cancelled(self):
+		
+		return self._cancelled
+
+	## True if the run is over, completed or cancelled.
+	def done(self):
+		
+		return not self._thread.is_alive()
+
+	## Wait for the run to finish.
+	#
+	# @param timeout Maximum time to wait in seconds, None waits until the end.
+	# @return Number of steps done, or None if the timeout expired first.
+	def result(self, timeout=None):
+		
+		#join in small chunks, so that the main thread can still get KeyboardInterrupt
+		if timeout == None:
+			while self._thread.is_alive():
+				self._thread.join(0.1)
+		else:
+			self._thread.join(timeout)
+		
+		if self._thread.is_alive():
+			return None
+		if self._error != None:
+			raise self._error
+		return self._done
+
+
+## List of channels resolved by Machine.ChannelIndex.
+#
+# Besides being passed to Machine.GetValues and Machine.SetValues, it gives
+# the position of each channel in the arrays of Machine.SignalView:
+# the value of channel i is found at index[i] in the buffers if isbuffer[i]
+# is True, in the signals otherwise.
+#
+class ChannelList(object):
+	
+	def __init__(self, tags, feeds):
+		
+		## Tags of the channels.
+		self.tags = list(tags)
+		
+		## \internal
+		## Feeds of the channels, 4 integers each as given by the cCore.
+		self.feeds = feeds
+		
+		raw = numpy.array(feeds[:], dtype=numpy.int32).reshape((len(self.tags), 4))
+		
+		## Index of each channel in the signal arrays.
+		self.index = raw[:,0].copy()
+		
+		## True for channels that are read from the buffers.
+		self.isbuffer = raw[:,1] == 1
+	
+	def __len__(self):
+		return len(self.tags)
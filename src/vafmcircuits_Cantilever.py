@@ -89,7 +89,7 @@ class Cantilever(Circuit):
 		self.AddOutput("zabs")
 		self.AddOutput("vz")
 
-		self.cCoreID = Circuit.cCore.Add_Cantilever(self.machine.cCoreID,        #CAREFUL HERE!
+		self.cCoreID = self.cCore.Add_Cantilever(self.machine.cCoreID,        #CAREFUL HERE!
 			ctypes.c_double(Q),ctypes.c_double(k),ctypes.c_double(M),
 			ctypes.c_double(F),ctypes.c_double(startingz),ctypes.c_double(0.0) )
 
@@ -215,7 +215,7 @@ class AdvancedCantilever(Circuit):
 
 
 		
-		self.cCoreID = Circuit.cCore.Add_AdvancedCantilever(self.machine.cCoreID, NumberOfModesV,NumberOfModesL)
+		self.cCoreID = self.cCore.Add_AdvancedCantilever(self.machine.cCoreID, NumberOfModesV,NumberOfModesL)
 		self.SetInputs(**keys);
 
 	def StartingPos(self, *args):
@@ -223,12 +223,12 @@ class AdvancedCantilever(Circuit):
 			raise NameError("Incorrect number of starting values entered")
 
 
-		Circuit.cCore.StartingPoint.argtypes = [ctypes.c_int, ctypes.POINTER(ctypes.c_double)]
+		self.cCore.StartingPoint.argtypes = [ctypes.c_int, ctypes.POINTER(ctypes.c_double)]
 		StartingPoint=[]
 		for i in args:
 			StartingPoint.append(i)
 		StartingPointarray = (ctypes.c_double * len(StartingPoint))(*StartingPoint)
-		Circuit.cCore.StartingPoint(self.cCoreID,StartingPointarray)
+		self.cCore.StartingPoint(self.cCoreID,StartingPointarray)
 
 
 	def AddMode(self, **kw):
@@ -276,17 +276,17 @@ class AdvancedCantilever(Circuit):
 			raise NameError("Incorrect number of lateral modes added check initialisation parameters")
 
 		karray = (ctypes.c_double * len(k))(*k)
-		Circuit.cCore.AddK(self.cCoreID, karray)
+		self.cCore.AddK(self.cCoreID, karray)
 
 		Qarray = (ctypes.c_double * len(Q))(*Q)
-		Circuit.cCore.AddQ(self.cCoreID, Qarray)
+		self.cCore.AddQ(self.cCoreID, Qarray)
 
 		Marray = (ctypes.c_double * len(M))(*M)
-		Circuit.cCore.AddM(self.cCoreID, Marray)
+		self.cCore.AddM(self.cCoreID, Marray)
 
 		farray = (ctypes.c_double * len(f))(*f)
 
-		Circuit.cCore.AddF(self.cCoreID,farray)		
+		self.cCore.AddF(self.cCoreID,farray)		
 
 
 
@@ -36,7 +36,7 @@ class GreaterOrEqual(Circuit):
 
 		self.AddOutput("out")
 
-		self.cCoreID = Circuit.cCore.Add_Comparison(self.machine.cCoreID,"GreaterOrEqual",2)
+		self.cCoreID = self.cCore.Add_Comparison(self.machine.cCoreID,"GreaterOrEqual",2)
 
 		self.SetInputs(**keys)
 
@@ -78,7 +78,7 @@ class LessOrEqual(Circuit):
 
 		self.AddOutput("out")
 		
-		self.cCoreID = Circuit.cCore.Add_Comparison(self.machine.cCoreID,"LessOrEqual",2)
+		self.cCoreID = self.cCore.Add_Comparison(self.machine.cCoreID,"LessOrEqual",2)
 
 		self.SetInputs(**keys)
 
@@ -120,7 +120,7 @@ class Equal(Circuit):
 
 		self.AddOutput("out")
 		
-		self.cCoreID = Circuit.cCore.Add_Comparison(self.machine.cCoreID,"Equal",2)
+		self.cCoreID = self.cCore.Add_Comparison(self.machine.cCoreID,"Equal",2)
 		
 		self.SetInputs(**keys)
 
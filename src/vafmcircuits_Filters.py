@@ -66,7 +66,7 @@ class SKLP(Circuit):
 
 		
 		
-		self.cCoreID = Circuit.cCore.Add_SKLP(self.machine.cCoreID,
+		self.cCoreID = self.cCore.Add_SKLP(self.machine.cCoreID,
 			c_double(self.fc), c_double(self.Q), c_double(self.Gain))
 
 		self.SetInputs(**keys)
@@ -134,7 +134,7 @@ class SKHP(Circuit):
 		else:
 			raise NameError("Missing fc!")
 
-		self.cCoreID = Circuit.cCore.Add_SKHP(self.machine.cCoreID,
+		self.cCoreID = self.cCore.Add_SKHP(self.machine.cCoreID,
 			c_double(self.fc), c_double(self.Q), c_double(self.Gain))
 
 		
@@ -198,7 +198,7 @@ class SKBP(Circuit):
 		else:
 			raise NameError("Missing band!")
 
-		self.cCoreID = Circuit.cCore.Add_SKBP(self.machine.cCoreID,
+		self.cCoreID = self.cCore.Add_SKBP(self.machine.cCoreID,
 			c_double(self.fc), c_double(self.band), c_double(self.Gain))
 
 
@@ -256,7 +256,7 @@ class RCLP(Circuit):
 		else:
 			print "WARNING! Filter order not specified, using default order = "+str(self.Order)
 
-		self.cCoreID = Circuit.cCore.Add_RCLP(self.machine.cCoreID,
+		self.cCoreID = self.cCore.Add_RCLP(self.machine.cCoreID,
 			c_double(self.fc), self.Order)
 		
 	def Initialize (self):
@@ -313,7 +313,7 @@ class RCHP(Circuit):
 		else:
 			print "WARNING! No order given, using default order = "+str(self.Order)
 
-		self.cCoreID = Circuit.cCore.Add_RCHP(self.machine.cCoreID,
+		self.cCoreID = self.cCore.Add_RCHP(self.machine.cCoreID,
 			c_double(self.fc), self.Order)
 		
 	def Initialize (self):
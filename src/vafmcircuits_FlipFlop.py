@@ -51,7 +51,7 @@ class SRFlipFlop(Circuit):
 		self.AddOutput("Q")
 		self.AddOutput("Qbar")
 		
-		self.cCoreID = Circuit.cCore.Add_SRFlipFLop(self.machine.cCoreID)
+		self.cCoreID = self.cCore.Add_SRFlipFLop(self.machine.cCoreID)
 
 
 	def Initialize (self):
@@ -105,7 +105,7 @@ class JKFlipFlop(Circuit):
 		self.AddOutput("Q")
 		self.AddOutput("Qbar")
 
-		self.cCoreID = Circuit.cCore.Add_JKFlipFLop(self.machine.cCoreID)
+		self.cCoreID = self.cCore.Add_JKFlipFLop(self.machine.cCoreID)
 	
 		self.SetInputs(**keys)
 
@@ -158,7 +158,7 @@ class DFlipFlop(Circuit):
 		self.AddOutput("Q")
 		self.AddOutput("Qbar")
 		
-		self.cCoreID = Circuit.cCore.Add_DFlipFLop(self.machine.cCoreID)
+		self.cCoreID = self.cCore.Add_DFlipFLop(self.machine.cCoreID)
 
 		self.SetInputs(**keys)
 
@@ -211,7 +211,7 @@ class DRFlipFlop(Circuit):
 		self.AddOutput("Q")
 		self.AddOutput("Qbar")
 		
-		self.cCoreID = Circuit.cCore.Add_DRFlipFLop(self.machine.cCoreID)
+		self.cCoreID = self.cCore.Add_DRFlipFLop(self.machine.cCoreID)
 		
 		self.SetInputs(**keys)
 
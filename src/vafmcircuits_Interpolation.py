@@ -6,12 +6,18 @@
 
 import numpy
 import math
-from vafmbase import Circuit
+from vafmbase import Circuit, DataKey
 from scipy.interpolate import LinearNDInterpolator
 import ctypes
 import sys
 import os
 import glob
+
+## \internal
+## Force fields read by the i3Dlin circuits of this process, with their data key,
+# by file and configuration.
+_fields = {}
+
 ## \brief Tri-linear interpolation circuit.
 #
 # \image html i3dlin.png "schema"
@@ -35,12 +41,16 @@ import glob
 #		- \a ForceMultipler = A global multipler for all the force field values, use this to change the units of the force field into what ever units are desired.
 #	-  ReadData(filename = string)
 #		- \a Filename is the force field being interpolated.
+#		  A file is read once in each process: circuits reading it again with the same configuration
+#		  share the same field, which is never freed, also after their machine is closed.
 # - \b Input \b channels:
 #	 - \a x : this is x the coordiante to calculate the interpolation.
 #	 - \a y : this is y the coordiante to calculate the interpolation.
 #	 - \a z : this is z the coordiante to calculate the interpolation.
 # - \b Output \b channels:
 # 	- \a Fn: The interpolated forces where n is the component for example F1 would be first first component.
+# 	- \a oob: 1 when the position is out of the bounds of a non periodic dimension, and the forces are 0, else 0.
+#	  It can trigger a scope circuit to capture what led there.
 #
 # \b Example:
 # \code
@@ -68,6 +78,8 @@ class i3Dlin(Circuit):
 		self.step = None; self.stepSET = False
 		self.pbc = None; self.pbcSET = False
 		self.data = None
+		#True when the field is shared with other circuits, see ReadData
+		self.shared = False
 
 		self.AddInput("x")
 		self.AddInput("y")
@@ -75,16 +87,18 @@ class i3Dlin(Circuit):
 
 		for i in range(0,self.components):
 			self.AddOutput("F"+str(i+1))
+		self.AddOutput("oob")
 
 		
-		self.cCoreID = Circuit.cCore.Add_i3Dlin(self.machine.cCoreID, self.components)
+		self.cCoreID = self.cCore.Add_i3Dlin(self.machine.cCoreID, self.components)
 		
-		Circuit.cCore.i3Dlin_step.argtypes = [
+		self.cCore.i3Dlin_step.argtypes = [
 			ctypes.c_int, #Core Id
 			ctypes.c_double, #xstep
 			ctypes.c_double, #ystep
 			ctypes.c_double] #zstep
-		Circuit.cCore.i3Dlin_npts.restype =  ctypes.POINTER(ctypes.POINTER(ctypes.c_double))
+		self.cCore.i3Dlin_npts.restype =  ctypes.POINTER(ctypes.POINTER(ctypes.c_double))
+		self.cCore.i3Dlin_share.argtypes = [ctypes.c_int, ctypes.POINTER(ctypes.POINTER(ctypes.c_double)), ctypes.c_int]
 		
 		self.SetInputs(**keys)
 
@@ -98,8 +112,9 @@ class i3Dlin(Circuit):
 				self.npts = [int(n) for n in keys['npoints']]
 				print "i3Dlin: npoints",self.npts
 				self.nptsSET = True
+				self._OwnField()
 				#send the changes to cCore
-				self.data = Circuit.cCore.i3Dlin_npts(self.cCoreID, self.npts[0], self.npts[1], self.npts[2])
+				self.data = self.cCore.i3Dlin_npts(self.cCoreID, self.npts[0], self.npts[1], self.npts[2])
 				
 				
 		#check for steps
@@ -111,7 +126,7 @@ class i3Dlin(Circuit):
 				print "i3Dlin: steps",self.step
 				self.stepSET = True
 				#call a cCore function to save the values
-				Circuit.cCore.i3Dlin_step(self.cCoreID, self.step[0], self.step[1], self.step[2])
+				self.cCore.i3Dlin_step(self.cCoreID, self.step[0], self.step[1], self.step[2])
 			
 		#check for pbc
 		if 'pbc' in keys.keys():
@@ -125,7 +140,7 @@ class i3Dlin(Circuit):
 					else:
 						self.pbc[i] = 0
 				
-				Circuit.cCore.i3Dlin_pbc(self.cCoreID, self.pbc[0], self.pbc[1], self.pbc[2])
+				self.cCore.i3Dlin_pbc(self.cCoreID, self.pbc[0], self.pbc[1], self.pbc[2])
 				self.pbcSET = True
 
 		if 'ForceMultiplier' in keys.keys():
@@ -146,6 +161,17 @@ class i3Dlin(Circuit):
 		yzsize = self.npts[1]*self.npts[2]
 		zsize = self.npts[2]
 		
+		#the field is already in memory if the file was read with the same grid
+		key = (os.path.abspath(filename), os.path.getmtime(filename), tuple(self.npts), tuple(self.step),
+			self.components, self.ForceMultiplier)
+		if key in _fields:
+			self.datakey, self.data = _fields[key]
+			self.cCore.i3Dlin_share(self.cCoreID, self.data, 0 if self.shared else 1)
+			self.shared = True
+			return
+		
+		self._OwnField()
+		self.datakey = DataKey(filename, self.npts, self.step, self.components, self.ForceMultiplier)
 		
 		f = open(filename, "r")
 		for line in f:
@@ -159,6 +185,20 @@ class i3Dlin(Circuit):
 				self.data[c][index] = words[c+3]
 		
 		f.close()
+		
+		#the components outlive the circuit, while the array holding them does not
+		self.data = (ctypes.POINTER(ctypes.c_double)*self.components)(*[self.data[c] for c in xrange(self.components)])
+		_fields[key] = (self.datakey, self.data)
+		self.shared = True
+
+	## \internal
+	## Give the circuit new field arrays, if it shares a field read before.
+	def _OwnField(self):
+		
+		if self.shared:
+			self.cCore.i3Dlin_share(self.cCoreID, None, 0)
+			self.shared = False
+			self.data = self.cCore.i3Dlin_npts(self.cCoreID, self.npts[0], self.npts[1], self.npts[2])
 
 
 ## \brief linear interpolation circuit.
@@ -236,8 +276,8 @@ class i1Dlin(Circuit):
 		for i in range(0,self.components):
 			self.AddOutput("F"+str(i+1))
 		
-		Circuit.cCore.Add_i1Dlin.argtypes = [ctypes.c_int,ctypes.c_int,ctypes.c_double,ctypes.c_int]
-		self.cCoreID = Circuit.cCore.Add_i1Dlin(machine.cCoreID
+		self.cCore.Add_i1Dlin.argtypes = [ctypes.c_int,ctypes.c_int,ctypes.c_double,ctypes.c_int]
+		self.cCoreID = self.cCore.Add_i1Dlin(machine.cCoreID
 			, ctypes.c_int(self.components)
 			, ctypes.c_double(step)
 			, ctypes.c_int(pbc))
@@ -247,6 +287,7 @@ class i1Dlin(Circuit):
 	def SetData(self, datapoints):
 		
 		npts = len(datapoints)
+		self.datakey = DataKey(numpy.array(datapoints, dtype=float), self.ForceUnits)
 
 		for i in range(0,len(datapoints)):
 			datapoints[i] = datapoints[i]*self.ForceUnits
@@ -255,7 +296,7 @@ class i1Dlin(Circuit):
 			raise ValueError("ERROR: there are less than 2 points in the field!")
 		
 		
-		Circuit.cCore.i1Dlin_SetData.argtypes = [ctypes.c_int,ctypes.c_int,
+		self.cCore.i1Dlin_SetData.argtypes = [ctypes.c_int,ctypes.c_int,
 			ctypes.POINTER(ctypes.c_double),ctypes.c_int]
 		
 		if self.components > 1:
@@ -265,10 +306,10 @@ class i1Dlin(Circuit):
 				
 				test_arr = (ctypes.c_double * npts)(*lst)
 				
-				Circuit.cCore.i1Dlin_SetData(self.cCoreID, c,test_arr,npts)
+				self.cCore.i1Dlin_SetData(self.cCoreID, c,test_arr,npts)
 		else:
 			test_arr = (ctypes.c_double * npts)(*datapoints)
-			Circuit.cCore.i1Dlin_SetData(self.cCoreID, 0,test_arr,npts)
+			self.cCore.i1Dlin_SetData(self.cCoreID, 0,test_arr,npts)
 
 
 ## \brief Vasp quad-linear interpolation circuit.
@@ -313,8 +354,8 @@ class i4DlinVasp(Circuit):
 		#Vasp files only have 1 component
 		self.components = 1
 
-		Circuit.cCore.Add_i4Dlin.argtypes = [ctypes.c_int,ctypes.c_int]
-		self.cCoreID = Circuit.cCore.Add_i4Dlin(machine.cCoreID, self.components)
+		self.cCore.Add_i4Dlin.argtypes = [ctypes.c_int,ctypes.c_int]
+		self.cCoreID = self.cCore.Add_i4Dlin(machine.cCoreID, self.components)
 		self.BiasStep=0
 		self.StartingV=-1
 		self.pbcSET = False
@@ -342,7 +383,7 @@ class i4DlinVasp(Circuit):
 					else:
 						self.pbc[i] = 0
 				
-				Circuit.cCore.i4DLinPBC(self.cCoreID, self.pbc[0], self.pbc[1], self.pbc[2], self.pbc[3])
+				self.cCore.i4DLinPBC(self.cCoreID, self.pbc[0], self.pbc[1], self.pbc[2], self.pbc[3])
 				self.pbcSET = True
 
 
@@ -364,7 +405,7 @@ class i4DlinVasp(Circuit):
 
 		Density=[]
 
-
+		self.datakey = DataKey(*(filename+(self.components, self.BiasStep, self.StartingV)))
 
 
 		for j in range(0,len(filename)):
@@ -432,13 +473,13 @@ class i4DlinVasp(Circuit):
 		nv = int(len(filename))
 
 		#Set up Ctypes
-		Circuit.cCore.i4Dlin_SetUpData.restype =  ctypes.POINTER(ctypes.POINTER(ctypes.c_double))
-		Circuit.cCore.i4Dlin_SetUpData.argtypes = [ctypes.c_int 
+		self.cCore.i4Dlin_SetUpData.restype =  ctypes.POINTER(ctypes.POINTER(ctypes.c_double))
+		self.cCore.i4Dlin_SetUpData.argtypes = [ctypes.c_int 
 												  ,ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int, 
 												   ctypes.c_double,  ctypes.c_double,  ctypes.c_double,  ctypes.c_double
 												   ,  ctypes.c_double]
 		#Pass some data to C
-		self.data = Circuit.cCore.i4Dlin_SetUpData(self.cCoreID, nx , ny , nz, nv , dx, dy, dz , dv,  self.StartingV)
+		self.data = self.cCore.i4Dlin_SetUpData(self.cCoreID, nx , ny , nz, nv , dx, dy, dz , dv,  self.StartingV)
 
 		#Move array from python to C
 		for c in range(0,self.components):
@@ -508,8 +549,8 @@ class i4Dlin(Circuit):
 			raise NameError("No components entered ")
 	
 
-		Circuit.cCore.Add_i4Dlin.argtypes = [ctypes.c_int,ctypes.c_int]
-		self.cCoreID = Circuit.cCore.Add_i4Dlin(machine.cCoreID, self.components)
+		self.cCore.Add_i4Dlin.argtypes = [ctypes.c_int,ctypes.c_int]
+		self.cCoreID = self.cCore.Add_i4Dlin(machine.cCoreID, self.components)
 		self.BiasStep=0
 		self.StartingV=1
 		self.pbcSET = False
@@ -538,7 +579,7 @@ class i4Dlin(Circuit):
 					else:
 						self.pbc[i] = 0
 				
-				Circuit.cCore.i4DLinPBC(self.cCoreID, self.pbc[0], self.pbc[1], self.pbc[2], self.pbc[3])
+				self.cCore.i4DLinPBC(self.cCoreID, self.pbc[0], self.pbc[1], self.pbc[2], self.pbc[3])
 				self.pbcSET = True
 
 		if 'points' in keys.keys():
@@ -591,15 +632,15 @@ class i4Dlin(Circuit):
 		nv = int(self.NPoints[3])
 
 		#Set up Ctypes
-		Circuit.cCore.i4Dlin_SetUpData.restype =  ctypes.POINTER(ctypes.POINTER(ctypes.c_double))
-		Circuit.cCore.i4Dlin_SetUpData.argtypes = [ctypes.c_int 
+		self.cCore.i4Dlin_SetUpData.restype =  ctypes.POINTER(ctypes.POINTER(ctypes.c_double))
+		self.cCore.i4Dlin_SetUpData.argtypes = [ctypes.c_int 
 												  ,ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int, 
 												   ctypes.c_double,  ctypes.c_double,  ctypes.c_double,  ctypes.c_double
 												   ,  ctypes.c_double]
 		#Pass some data to C
-		self.data = Circuit.cCore.i4Dlin_SetUpData(self.cCoreID, nx , ny , nz, nv , dx, dy, dz , dv,  self.StartingV)
-
+		self.data = self.cCore.i4Dlin_SetUpData(self.cCoreID, nx , ny , nz, nv , dx, dy, dz , dv,  self.StartingV)
 
+		self.datakey = DataKey(*(filename+(self.components, self.ForceMultiplier, self.NPoints, (dx, dy, dz, dv), self.StartingV)))
 
 		f = open(filename, "r")
 		for line in f:
@@ -37,7 +37,7 @@ class NOT(Circuit):
 		self.AddInput("signal")
 		self.AddOutput("out")
 
-		self.cCoreID = Circuit.cCore.Add_Logic(self.machine.cCoreID,"opNOT",1)
+		self.cCoreID = self.cCore.Add_Logic(self.machine.cCoreID,"opNOT",1)
 
 		self.SetInputs(**keys)
 
@@ -96,7 +96,7 @@ class AND(Circuit):
 		
 		self.AddOutput("out")
 
-		self.cCoreID = Circuit.cCore.Add_Logic(self.machine.cCoreID,"opAND",self.factors)
+		self.cCoreID = self.cCore.Add_Logic(self.machine.cCoreID,"opAND",self.factors)
 
 		self.SetInputs(**keys)
 
@@ -121,7 +121,7 @@ class NAND(Circuit):
 		
 		self.AddOutput("out")
 
-		self.cCoreID = Circuit.cCore.Add_Logic(self.machine.cCoreID,"opNAND",2)
+		self.cCoreID = self.cCore.Add_Logic(self.machine.cCoreID,"opNAND",2)
 
 		self.SetInputs(**keys)
 
@@ -180,7 +180,7 @@ class OR(Circuit):
 
 		self.AddOutput("out")
 
-		self.cCoreID = Circuit.cCore.Add_Logic(self.machine.cCoreID,"opOR",self.factors)
+		self.cCoreID = self.cCore.Add_Logic(self.machine.cCoreID,"opOR",self.factors)
 
 		self.SetInputs(**keys)
 
@@ -239,7 +239,7 @@ class XOR(Circuit):
 		
 		self.AddOutput("out")
 
-		self.cCoreID = Circuit.cCore.Add_Logic(self.machine.cCoreID,"opXOR",self.factors)
+		self.cCoreID = self.cCore.Add_Logic(self.machine.cCoreID,"opXOR",self.factors)
 
 		self.SetInputs(**keys)
 
@@ -300,7 +300,7 @@ class NOR(Circuit):
 
 		self.AddOutput("out")
 
-		self.cCoreID = Circuit.cCore.Add_Logic(self.machine.cCoreID,"opNOR",self.factors)
+		self.cCoreID = self.cCore.Add_Logic(self.machine.cCoreID,"opNOR",self.factors)
 
 		self.SetInputs(**keys)
 
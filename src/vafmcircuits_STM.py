@@ -51,7 +51,7 @@ class STM(Circuit):
 			self.WaveFunctionOverlap=2
 
 
-		self.cCoreID = Circuit.cCore.Add_STM(machine.cCoreID, ctypes.c_double(self.WF), ctypes.c_double(self.WaveFunctionOverlap) )
+		self.cCoreID = self.cCore.Add_STM(machine.cCoreID, ctypes.c_double(self.WF), ctypes.c_double(self.WaveFunctionOverlap) )
 
 
 		self.AddInput("Density")
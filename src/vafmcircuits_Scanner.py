@@ -76,22 +76,22 @@ class Scanner(Circuit):
 		#
 		self.BlankLines = False
 		
-		Circuit.cCore.Scanner_Place.argtypes = [c_int, c_double, c_double, c_double]
-		self.GetParams = Circuit.cCore.ScannerParams
+		self.cCore.Scanner_Place.argtypes = [c_int, c_double, c_double, c_double]
+		self.GetParams = self.cCore.ScannerParams
 		self.GetParams.restype = POINTER(c_double)
 		
-		self.cCoreID = Circuit.cCore.Scanner( self.machine.cCoreID )
+		self.cCoreID = self.cCore.Scanner( self.machine.cCoreID )
 		self.SetInputs(**keys)
 
 
 
 
 	def Move(self, x = 0, y = 0, z = 0, v = 1): #default arguments, make the input lighter
-		Circuit.cCore.Scanner_Move.restype = c_ulonglong
+		self.cCore.Scanner_Move.restype = c_ulonglong
 		
-		steps = Circuit.cCore.Scanner_Move(self.cCoreID, c_double(x), c_double(y) ,c_double(z),c_double(v) )
+		steps = self.cCore.Scanner_Move(self.cCoreID, c_double(x), c_double(y) ,c_double(z),c_double(v) )
 
-		self.machine.main.WaitSteps( (steps) )
+		self.machine._Main().WaitSteps( (steps) )
 		print "Scanner moved by " +str(x) + "," + str(y)+ "," + str(z)
 
 	def Place(self,**kw): #all parameters required
@@ -110,8 +110,8 @@ class Scanner(Circuit):
 		if 'z' in kw.keys():
 			z = kw['z']
 		
-		steps = Circuit.cCore.Scanner_Place(self.cCoreID, c_double(x), c_double(y), c_double(z))
-		self.machine.main.WaitSteps(1)
+		steps = self.cCore.Scanner_Place(self.cCoreID, c_double(x), c_double(y), c_double(z))
+		self.machine._Main().WaitSteps(1)
 		print "Scanner Placed at ", x, y, z
 
 	def MoveTo(self,**kw):
@@ -132,9 +132,9 @@ class Scanner(Circuit):
 		else:
 			raise NameError ("ERROR! Scanner MoveTo requires v.")
 
-		Circuit.cCore.Scanner_MoveTo.restype = c_ulonglong
-		steps = Circuit.cCore.Scanner_MoveTo(self.cCoreID, c_double(x), c_double(y), c_double(z), c_double(v))
-		self.machine.main.WaitSteps(steps)                
+		self.cCore.Scanner_MoveTo.restype = c_ulonglong
+		steps = self.cCore.Scanner_MoveTo(self.cCoreID, c_double(x), c_double(y), c_double(z), c_double(v))
+		self.machine._Main().WaitSteps(steps)                
 		print "Scanner moved to " +str(x) + "," + str(y)+ "," + str(z)
 
 
@@ -214,10 +214,10 @@ class Scanner(Circuit):
 			print "PY Scanner: starting line number "+str(linenum) + "..."
 			
 			#move to the end of fast scanline
-			Circuit.cCore.Scanner_Move_Record.restype = c_ulonglong
-			steps = Circuit.cCore.Scanner_Move_Record(self.cCoreID, dfast[0],dfast[1],dfast[2],
+			self.cCore.Scanner_Move_Record.restype = c_ulonglong
+			steps = self.cCore.Scanner_Move_Record(self.cCoreID, dfast[0],dfast[1],dfast[2],
 				c_double(self.FastSpeed), c_int(self.Resolution[0]) )
-			self.machine.main.WaitSteps(steps)
+			self.machine._Main().WaitSteps(steps)
 			
 			print "PY Scanner: done. Repositioning..."
 			
@@ -228,19 +228,19 @@ class Scanner(Circuit):
 			#move to initial pos + step along slowscan
 			repos = [c_double(x0[i]+linenum*dslow[i]) for i in range(3)]
 			
-			Circuit.cCore.Scanner_MoveTo.restype = c_ulonglong
-			steps = Circuit.cCore.Scanner_MoveTo(self.cCoreID, repos[0], repos[1], repos[2],
+			self.cCore.Scanner_MoveTo.restype = c_ulonglong
+			steps = self.cCore.Scanner_MoveTo(self.cCoreID, repos[0], repos[1], repos[2],
 				c_double(self.SlowSpeed))
-			self.machine.main.WaitSteps(steps)
+			self.machine._Main().WaitSteps(steps)
 			print "PY Scanner: done."
 			
 		
 		#now go back to the original position
 		print "PY Scanner: Moving to starting location..."
 		repos = [c_double(x0[i]) for i in range(3)]
-		steps = Circuit.cCore.Scanner_MoveTo(self.cCoreID, repos[0], repos[1], repos[2],
+		steps = self.cCore.Scanner_MoveTo(self.cCoreID, repos[0], repos[1], repos[2],
 				c_double(self.SlowSpeed))
-		self.machine.main.WaitSteps(steps)
+		self.machine._Main().WaitSteps(steps)
 		
 		print "done!"
 
@@ -265,9 +265,9 @@ class Scanner(Circuit):
 		else:
 			raise NameError ("ERROR! Scanner MoveRecord requires number of points.")
 
-		Circuit.cCore.Scanner_Move_Record.restype = c_ulonglong
-		steps = Circuit.cCore.Scanner_Move_Record(self.cCoreID, c_double(x), c_double(y), c_double(z), c_double(v), c_int(npts)) 
-		self.machine.main.WaitSteps(steps)                
+		self.cCore.Scanner_Move_Record.restype = c_ulonglong
+		steps = self.cCore.Scanner_Move_Record(self.cCoreID, c_double(x), c_double(y), c_double(z), c_double(v), c_int(npts)) 
+		self.machine._Main().WaitSteps(steps)                
 		print "Scanner moved by " +str(x) + "," + str(y)+ "," + str(z)
 
 
@@ -288,10 +288,10 @@ class Scanner(Circuit):
 		else:
 			raise NameError ("ERROR! enter a number of cycles.")
 
-		Circuit.cCore.SinScan.restype = c_ulonglong
-		steps = Circuit.cCore.SinScan(self.cCoreID, c_double(freq), c_double(amp), c_int(cycle)) 
+		self.cCore.SinScan.restype = c_ulonglong
+		steps = self.cCore.SinScan(self.cCoreID, c_double(freq), c_double(amp), c_int(cycle)) 
 
-		self.machine.main.WaitSteps(steps)     
+		self.machine._Main().WaitSteps(steps)     
 
 ## \brief CoordTransform circuit.
 #
@@ -354,11 +354,11 @@ class CoordTransform(Circuit):
 			raise NameError("Missing LatticeVectorX parameter!")					
 		
 
-		Circuit.cCore.CoordTransform.argtypes = [c_int, c_double, c_double, c_double
+		self.cCore.CoordTransform.argtypes = [c_int, c_double, c_double, c_double
 													  , c_double, c_double, c_double
 													  , c_double, c_double, c_double ]
 		
-		self.cCoreID = Circuit.cCore.CoordTransform(self.machine.cCoreID
+		self.cCoreID = self.cCore.CoordTransform(self.machine.cCoreID
 																			,self.LatticeVectorX[0],self.LatticeVectorX[1],self.LatticeVectorX[2]
 																			,self.LatticeVectorY[0],self.LatticeVectorY[1],self.LatticeVectorY[2]
 																			,self.LatticeVectorZ[0],self.LatticeVectorZ[1],self.LatticeVectorZ[2])
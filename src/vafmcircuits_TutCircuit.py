@@ -15,7 +15,7 @@ class TutCircuit(Circuit):
 		self.AddInput("in")
 		self.AddOutput("out")
 
-		self.cCoreID = Circuit.cCore.Add_TutCirc(self.machine.cCoreID,c_double(gain))
+		self.cCoreID = self.cCore.Add_TutCirc(self.machine.cCoreID,c_double(gain))
 		print self.cCoreID
 		self.SetInputs(**keys)
 
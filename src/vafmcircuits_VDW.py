@@ -62,14 +62,14 @@ class VDW(Circuit):
 		self.AddInput("ztip")
 		self.AddOutput("fz")
 
-		Circuit.cCore.Add_VDW.argtypes = [
+		self.cCore.Add_VDW.argtypes = [
 			ctypes.c_int, #Core Id
 			ctypes.c_double, #alpha
 			ctypes.c_double, #hamaker
 			ctypes.c_double, #radius
 			ctypes.c_double] #offset
 
-		self.cCoreID = Circuit.cCore.Add_VDW(self.machine.cCoreID,alpha,hamaker,radius,offset)
+		self.cCoreID = self.cCore.Add_VDW(self.machine.cCoreID,alpha,hamaker,radius,offset)
 
 		self.SetInputs(**keys)
 
@@ -137,7 +137,7 @@ class VDWtorn(Circuit):
 		self.AddOutput("debug1")
 		self.AddOutput("debug2")
 
-		Circuit.cCore.Add_VDWtorn.argtypes = [
+		self.cCore.Add_VDWtorn.argtypes = [
 		ctypes.c_int, #Core Id
 		ctypes.c_double, #A1
 		ctypes.c_double, #A2
@@ -148,7 +148,7 @@ class VDWtorn(Circuit):
 		ctypes.c_double] #tipoffset
 
 
-		self.cCoreID = Circuit.cCore.Add_VDWtorn(self.machine.cCoreID,A1,A2,A3,A4,A5,A6,tipoffset)
+		self.cCoreID = self.cCore.Add_VDWtorn(self.machine.cCoreID,A1,A2,A3,A4,A5,A6,tipoffset)
 		
 		self.SetInputs(**keys)
 
@@ -214,12 +214,12 @@ class LJ(Circuit):
 		self.AddOutput("Attractive")
 
 
-		Circuit.cCore.Add_LJ.argtypes = [
+		self.cCore.Add_LJ.argtypes = [
 		ctypes.c_int, #owner
 		ctypes.c_double, #ep
 		ctypes.c_double] #sig
 
-		self.cCoreID = Circuit.cCore.Add_LJ(self.machine.cCoreID,ep,sig)
+		self.cCoreID = self.cCore.Add_LJ(self.machine.cCoreID,ep,sig)
 		
 		self.SetInputs(**keys)
 
@@ -60,7 +60,7 @@ class avg(Circuit):
 		if(self._moving == True):
 			m = c_int(1)
 		
-		self.cCoreID = Circuit.cCore.Add_avg(machine.cCoreID, int(self._steps), m)
+		self.cCoreID = self.cCore.Add_avg(machine.cCoreID, int(self._steps), m)
 
 		
 		self.SetInputs(**keys)
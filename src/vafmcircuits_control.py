@@ -49,7 +49,7 @@ class PI(Circuit):
 		
 		self.AddOutput("out")
 
-		self.cCoreID = Circuit.cCore.Add_PI(machine.cCoreID)
+		self.cCoreID = self.cCore.Add_PI(machine.cCoreID)
 		
 		self.SetInputs(**keys)
 
@@ -103,7 +103,7 @@ class PID(Circuit):
 		self.AddInput("Kd")
 		self.AddOutput("out")
 		
-		self.cCoreID = Circuit.cCore.Add_PID(machine.cCoreID)
+		self.cCoreID = self.cCore.Add_PID(machine.cCoreID)
 		
 		self.SetInputs(**keys)
 
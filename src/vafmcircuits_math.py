@@ -1,6 +1,7 @@
 from vafmbase import Circuit
 import math
-from ctypes import c_double
+import ast
+from ctypes import c_double, c_int
 
 ## \package vafmcircuits_math
 # This file contains the basic arithmetic operator circuits.
@@ -54,7 +55,7 @@ class opAdd(Circuit):
 		#create output channels
 		self.AddOutput("out")
 		
-		self.cCoreID = Circuit.cCore.Add_Math(self.machine.cCoreID,"opADD",self.factors)
+		self.cCoreID = self.cCore.Add_Math(self.machine.cCoreID,"opADD",self.factors)
 
 		
 		
@@ -104,7 +105,7 @@ class opSub(Circuit):
 		#create output channels
 		self.AddOutput("out")
 		
-		self.cCoreID = Circuit.cCore.Add_Math(self.machine.cCoreID,"opSUB",2)
+		self.cCoreID = self.cCore.Add_Math(self.machine.cCoreID,"opSUB",2)
 		
 		self.SetInputs(**keys)
 
@@ -160,7 +161,7 @@ class opMul(Circuit):
 		#create output channels
 		self.AddOutput("out")
 		
-		self.cCoreID = Circuit.cCore.Add_Math(self.machine.cCoreID,"opMUL",self.factors)
+		self.cCoreID = self.cCore.Add_Math(self.machine.cCoreID,"opMUL",self.factors)
 		
 		self.SetInputs(**keys)
 		
@@ -208,7 +209,7 @@ class opDiv(Circuit):
 		#create output channels
 		self.AddOutput("out")
 		
-		self.cCoreID = Circuit.cCore.Add_Math(self.machine.cCoreID,"opDIV",2)
+		self.cCoreID = self.cCore.Add_Math(self.machine.cCoreID,"opDIV",2)
 		
 		self.SetInputs(**keys)
 
@@ -266,7 +267,7 @@ class opLinC(Circuit):
 		#create output channels
 		self.AddOutput("out")
 		
-		self.cCoreID = Circuit.cCore.Add_Math(self.machine.cCoreID,"opLINC",self.factors*2)
+		self.cCoreID = self.cCore.Add_Math(self.machine.cCoreID,"opLINC",self.factors*2)
 		
 		self.SetInputs(**keys)
 		
@@ -311,7 +312,7 @@ class opAbs(Circuit):
 		self.AddOutput("out")
 		
 		
-		self.cCoreID = Circuit.cCore.Add_Math(self.machine.cCoreID,"opABS",1)
+		self.cCoreID = self.cCore.Add_Math(self.machine.cCoreID,"opABS",1)
 		
 		self.SetInputs(**keys)
 
@@ -360,7 +361,7 @@ class opPow(Circuit):
 		#create output channels
 		self.AddOutput("out")
 		
-		self.cCoreID = Circuit.cCore.Add_Math(self.machine.cCoreID,"opPOW",2)
+		self.cCoreID = self.cCore.Add_Math(self.machine.cCoreID,"opPOW",2)
 		
 		self.SetInputs(**keys)
 
@@ -404,7 +405,7 @@ class opSin(Circuit):
 		#create output channels
 		self.AddOutput("out")
 		
-		self.cCoreID = Circuit.cCore.Add_Math(self.machine.cCoreID,"opSIN",1)
+		self.cCoreID = self.cCore.Add_Math(self.machine.cCoreID,"opSIN",1)
 		
 		self.SetInputs(**keys)
 
@@ -446,7 +447,7 @@ class opCos(Circuit):
 		#create output channels
 		self.AddOutput("out")
 		
-		self.cCoreID = Circuit.cCore.Add_Math(self.machine.cCoreID,"opCOS",1)
+		self.cCoreID = self.cCore.Add_Math(self.machine.cCoreID,"opCOS",1)
 		
 		self.SetInputs(**keys)
 
@@ -514,7 +515,7 @@ class Perlin(Circuit):
 		#create output channels
 		self.AddOutput("out")
 		
-		self.cCoreID = Circuit.cCore.Add_Perlin(self.machine.cCoreID,
+		self.cCoreID = self.cCore.Add_Perlin(self.machine.cCoreID,
 			c_double(self.amp),c_double(self.persist),self.octaves, c_double(self.period))
 		
 		self.SetInputs(**keys)
@@ -560,7 +561,7 @@ class ComplexMagAndPhase(Circuit):
 		self.AddOutput("Phase")
 
 		
-		self.cCoreID = Circuit.cCore.Add_ComplexMagAndPhase(self.machine.cCoreID)
+		self.cCoreID = self.cCore.Add_ComplexMagAndPhase(self.machine.cCoreID)
 		
 		self.SetInputs(**keys)
 
@@ -572,3 +573,203 @@ class ComplexMagAndPhase(Circuit):
 	
 	def Update (self):
 		pass
+
+
+## \brief Expression circuit.
+#
+# Evaluates an algebraic formula of its inputs at every step, in the cCore.
+# The formula is written with the python syntax and it is compiled once, when
+# the circuit is created: constant parts are computed in advance and repeated
+# subexpressions are evaluated only once. One expression circuit can replace a chain
+# of arithmetic circuits, or a python circuit that computes a formula.
+#
+# Available operators are +, -, *, /, ** and %, and the functions
+# abs, sqrt, exp, log, log10, sin, cos, tan, asin, acos, atan, sinh, cosh, tanh,
+# floor, ceil, atan2, min, max and pow. The names pi and e are constants.
+# Division is always between real numbers, also for integer constants.
+#
+# \b Initialisation \b parameters:
+# 	- \a formula = string with the expression to compute
+# 	- \a inputs = list of names of the input channels, by default the names used in the formula, in order of appearance
+# 	- \a pushed = True|False  push the output buffer immediately if True
+#
+# \b Input \b channels:
+# 	- one channel for each name in \a inputs
+#
+# \b Output \b channels:
+# 	- \a out = value of the formula
+#
+#\b Examples:
+# \code{.py}
+# machine.AddCircuit(type='expr', name='f', formula='a*sin(b)+c**2', inputs=['a','b','c'])
+# machine.AddCircuit(type='expr', name='lj', formula='4*eps*((s/z)**12-(s/z)**6)', eps=1.0, s=0.3)
+# \endcode
+#
+class expr(Circuit):
+	
+	## Codes of the operations, same as core_expr.h.
+	ops = {'+':0, '-':1, '*':2, '/':3, 'pow':4, '%':5, 'neg':6, 'abs':7, 'sqrt':8,
+		'exp':9, 'log':10, 'sin':11, 'cos':12, 'tan':13, 'asin':14, 'acos':15,
+		'atan':16, 'sinh':17, 'cosh':18, 'tanh':19, 'floor':20, 'atan2':21,
+		'min':22, 'max':23, 'log10':24, 'ceil':25}
+	
+	## Python version of each operation, used to compute constant parts.
+	pyops = {'+':lambda a,b: a+b, '-':lambda a,b: a-b, '*':lambda a,b: a*b,
+		'/':lambda a,b: a/b, 'pow':math.pow, '%':math.fmod, 'neg':lambda a,b: -a,
+		'abs':lambda a,b: abs(a), 'sqrt':lambda a,b: math.sqrt(a),
+		'exp':lambda a,b: math.exp(a), 'log':lambda a,b: math.log(a),
+		'sin':lambda a,b: math.sin(a), 'cos':lambda a,b: math.cos(a),
+		'tan':lambda a,b: math.tan(a), 'asin':lambda a,b: math.asin(a),
+		'acos':lambda a,b: math.acos(a), 'atan':lambda a,b: math.atan(a),
+		'sinh':lambda a,b: math.sinh(a), 'cosh':lambda a,b: math.cosh(a),
+		'tanh':lambda a,b: math.tanh(a), 'floor':lambda a,b: math.floor(a),
+		'atan2':math.atan2, 'min':min, 'max':max,
+		'log10':lambda a,b: math.log10(a), 'ceil':lambda a,b: math.ceil(a)}
+	
+	## Number of arguments of the functions.
+	nargs = {'abs':1, 'sqrt':1, 'exp':1, 'log':1, 'log10':1, 'sin':1, 'cos':1, 'tan':1,
+		'asin':1, 'acos':1, 'atan':1, 'sinh':1, 'cosh':1, 'tanh':1, 'floor':1, 'ceil':1,
+		'atan2':2, 'min':2, 'max':2, 'pow':2}
+	
+	constants = {'pi':math.pi, 'e':math.e}
+	
+	_binops = {ast.Add:'+', ast.Sub:'-', ast.Mult:'*', ast.Div:'/', ast.Pow:'pow', ast.Mod:'%'}
+	
+	def __init__(self, machine, name, **keys):
+		
+		super(self.__class__, self).__init__( machine, name )
+		
+		if not ('formula' in keys.keys()):
+			raise SyntaxError("expr: the formula was not specified.")
+		self.formula = keys['formula']
+		
+		try:
+			tree = ast.parse(self.formula.strip(), mode='eval').body
+		except SyntaxError:
+			raise SyntaxError("expr: invalid formula '"+self.formula+"'.")
+		
+		if 'inputs' in keys.keys():
+			self.inputs = list(keys['inputs'])
+		else:
+			self.inputs = []
+			self._Names(tree, self.inputs)
+		
+		for ch in self.inputs:
+			self.AddInput(ch)
+		self.AddOutput("out")
+		
+		#slots are inputs, constants, then intermediate results
+		self._consts = []
+		self._code = []
+		self._cse = {}
+		result = self._Compile(tree)
+		
+		nI = len(self.inputs)
+		nconst = len(self._consts)
+		ntemp = len(self._code)
+		
+		def slot(s):
+			if s[0] == 'in': return s[1]
+			if s[0] == 'const': return nI + s[1]
+			return nI + nconst + s[1]
+		
+		code = (c_int*(4*ntemp+1))()
+		for i in range(ntemp):
+			op, a, b = self._code[i]
+			code[4*i:4*i+4] = [self.ops[op], nI+nconst+i, slot(a), slot(b)]
+		consts = (c_double*(nconst+1))(*self._consts)
+		
+		self.cCoreID = self.cCore.Add_Expr(self.machine.cCoreID, nI, nI+nconst+ntemp,
+			consts, nconst, code, ntemp, slot(result))
+		
+		self.SetInputs(**keys)
+	
+	## \internal
+	## Add to names the variables of the formula, in the order they appear.
+	# Function names, known functions and constants are not variables.
+	def _Names(self, node, names):
+		
+		if isinstance(node, ast.Name):
+			if not (node.id in self.constants) and not (node.id in self.nargs) and not (node.id in names):
+				names.append(node.id)
+			return
+		
+		children = list(ast.iter_child_nodes(node))
+		if isinstance(node, ast.Call):
+			children = node.args
+		for child in children:
+			self._Names(child, names)
+	
+	## \internal
+	## Slot of a constant, added if new.
+	def _Const(self, value):
+		
+		value = float(value)
+		for i in range(len(self._consts)):
+			if repr(self._consts[i]) == repr(value):
+				return ('const', i, value)
+		self._consts.append(value)
+		return ('const', len(self._consts)-1, value)
+	
+	## \internal
+	## Slot of an operation on slots a and b, computed in advance if they are
+	# constants and shared with identical operations.
+	def _Op(self, op, a, b=None):
+		
+		if b == None:
+			b = a
+		if a[0] == 'const' and b[0] == 'const':
+			try:
+				return self._Const(self.pyops[op](a[2], b[2]))
+			except (ValueError, ZeroDivisionError, OverflowError):
+				pass #left to the cCore, which gives inf or nan
+		
+		#x**2 is faster as x*x
+		if op == 'pow' and b[0] == 'const' and b[2] == 2.0:
+			op, b = '*', a
+		
+		key = (op, a[:2], b[:2])
+		if op in ('+', '*', 'min', 'max'):
+			key = (op,) + tuple(sorted([a[:2], b[:2]]))
+		if not (key in self._cse):
+			self._code.append((op, a, b))
+			self._cse[key] = ('tmp', len(self._code)-1)
+		return self._cse[key]
+	
+	## \internal
+	## Compile a node of the formula, returning the slot with its value.
+	def _Compile(self, node):
+		
+		if isinstance(node, ast.Num):
+			return self._Const(node.n)
+		
+		if isinstance(node, ast.Name):
+			if node.id in self.inputs:
+				return ('in', self.inputs.index(node.id))
+			if node.id in self.constants:
+				return self._Const(self.constants[node.id])
+			raise NameError("expr: "+node.id+" is not an input of "+self.name+".")
+		
+		if isinstance(node, ast.BinOp) and type(node.op) in self._binops:
+			return self._Op(self._binops[type(node.op)], self._Compile(node.left), self._Compile(node.right))
+		
+		if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.UAdd):
+			return self._Compile(node.operand)
+		if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+			return self._Op('neg', self._Compile(node.operand))
+		
+		if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+			f = node.func.id
+			if not (f in self.nargs):
+				raise NameError("expr: unknown function "+f+" in "+self.name+".")
+			if len(node.args) != self.nargs[f] or len(node.keywords) > 0:
+				raise SyntaxError("expr: function "+f+" takes "+str(self.nargs[f])+" arguments.")
+			return self._Op(f, *[self._Compile(a) for a in node.args])
+		
+		raise SyntaxError("expr: unsupported operation in '"+self.formula+"'.")
+	
+	def Initialize (self):
+		pass
+	
+	def Update (self):
+		pass
@@ -3,8 +3,11 @@ from vafmbase import Circuit
 from vafmbase import ChannelType
 from vafmbase import Channel
 from ctypes import *
-import matplotlib.pyplot as plt
 import numpy as np
+import ast
+import atexit
+import os
+import struct
 
 
 ## \package vafmcircuits_output
@@ -21,9 +24,18 @@ import numpy as np
 # functions. The input channel \a record, if connected will make the circuit
 # print to file only when its value is positive.
 #
+# The binary formats write one fixed size record of values per dump, after a
+# header with the registered tags, dt and the dump rate. They are much faster
+# to write and smaller than text, and ReadOutput maps them into a numpy
+# structured array with one field per tag. Channels must be registered before
+# the first record is written.
+#
 # \b Initialisation \b parameters:
 # 	- \a file = name of the log file
 # 	- \a dump = #  rate at which data is printed in the file
+# 	- \a format = 'text' (default) one line of values per record, 'npy' numpy
+#	array file, that numpy.load can also read, or 'raw' binary records after a text header
+# 	- \a dtype = 'float64' (default) or 'float32', type of the values in the binary formats
 #
 # \b Input \b channels:
 # 	- \a record = if connected, the output will be printed only when this input is 1
@@ -36,6 +48,7 @@ import numpy as np
 # \code
 # logger = machine.AddCircuit(type='output', name='logger', dump=1)
 # logger = machine.AddCircuit(type='output', name='logger', dump=100)
+# logger = machine.AddCircuit(type='output', name='logger', file='log.npy', dump=10, format='npy')
 # \endcode
 #
 class output(Circuit):
@@ -56,51 +69,80 @@ class output(Circuit):
 		## List of channels to dump in the file.
 		self.channels = []
 
+		##\internal
+		## Tags of the channels, for the header of the binary formats.
+		self._tags = []
+
 		##\internal
 		## Dump rate.
 		self.dump = keys['dump']
 
-	
+		## Format of the records: 'text', 'npy' or 'raw'.
+		self.format = keys.get('format', 'text')
+		if not (self.format in _formats):
+			raise ValueError("Output circuit format must be one of "+str(_formats)+"!")
+
+		## Type of the values in the binary formats.
+		self.dtype = np.dtype(keys.get('dtype', 'float64')).newbyteorder('<')
+		if not (self.dtype.str in ['<f8', '<f4']):
+			raise ValueError("Output circuit dtype must be float64 or float32!")
+		self.datakey = self.format+self.dtype.str
+
+		#timestep of the circuit, written in the header
+		self._dt = self.machine.dt
 
 		self._cnt = 0
 
 		self.AddInput("record")
 		
-		self.cCoreID = Circuit.cCore.Add_output(self.machine.cCoreID,self.filename,c_int(self.dump))
+		self.cCoreID = self.cCore.Add_output(self.machine.cCoreID,self.filename,c_int(self.dump))
 		
 
 		self.SetInputs(**keys)
 
+		if self.format != 'text':
+			self._Header()
+			#the record count of npy files is updated when they are flushed
+			atexit.register(self.Flush)
+
 
 	def Start(self):
-		Circuit.cCore.output_start(self.cCoreID);
+		self.cCore.output_start(self.cCoreID);
 	
 	def Stop(self):
-		Circuit.cCore.output_stop(self.cCoreID);
+		self.cCore.output_stop(self.cCoreID);
 
 	## Register an output channel for file output.
 	#
 	# If the channel is already registered in this output circuit, it won't be registered again.
 	#
-	# @param *args Channel tags to be printed in the output.
+	# Instead of their value when the record is written, channels can give
+	# a reduction of their values at every step since the previous record:
+	# 'mean', 'min', 'max', 'rms', or 'count' for the number of steps.
+	# 'last' is the value at the record.
+	# The reduction is computed in the cCore as the simulation goes, so the
+	# file gets one record per window, with \a dump steps or between
+	# two positive values of \a record.
+	#
+	# @param *args Channel tags to be printed in the output, or (tag, reducer) pairs.
+	# @param reduce Reducer of the tags given without one, 'last' by default.
 	#
 	# \b Example:
 	# \code{.py}
 	# logger = machine.AddCircuit(type='output', name='logger', dump=100)
 	# logger.Register('global.time','waver.sin','adder.out', ...)
+	# logger.Register(('canti.ztip', 'min'), ('canti.ztip', 'max'), 'pll.df', reduce='mean')
 	# \endcode
 	#
-	def Register(self, *args):
+	def Register(self, *args, **keys):
 
-		
-		cclist = [self.machine.GetChannel(tag) for tag in args]
-		self.channels.extend(cclist)
-		
-		for ch in cclist:
+		for tag, reducer, ch in _Channels(self, args, keys):
 			print 'PY: registering channel:',ch.owner.cCoreID,ch.cCoreCHID, ch.cisInput
 
-			Circuit.cCore.output_register(self.cCoreID,ch.owner.cCoreID,ch.cCoreCHID, ch.cisInput)
+			self.cCore.output_register(self.cCoreID,ch.owner.cCoreID,ch.cCoreCHID, ch.cisInput, _reducers[reducer])
 
+		if self.format != 'text':
+			self._Header()
 
 
 	## Unregister a channel from the output.
@@ -156,6 +198,9 @@ class output(Circuit):
 
 
 	def PlotImage(self,interpolation='none',xtickfreq=10,ytickfreq=10):
+		#matplotlib is slow to import, and only needed here
+		import matplotlib.pyplot as plt
+		self.Flush()
 		f = open(self.filename,'r')
 
 		Data = []
@@ -218,9 +263,42 @@ class output(Circuit):
 		plt.yticks(tick_locs, tick_lbls)
 		plt.savefig(self.filename.split('.')[0]+'.png')
 
+	## \internal
+	## Write the header of the binary formats in the file.
+	def _Header(self):
+
+		_BinaryHeader(self, 'dt=%r dump=%r' % (self._dt, self.dump))
+
+	## Write the buffered records to the file.
+	#
+	# The records are kept in memory and written to the file by a thread of the
+	# cCore while the simulation goes on. Flush waits until all the records
+	# so far are in the file, so call it before reading the file during the run.
+	# @return Size of the file in bytes, -1 if it was closed.
+	def Flush(self):
+		return self.cCore.output_flush(self.cCoreID)
+
+	## Write the buffered records and close the file.
+	# Nothing is written after this.
 	def CloseFile(self):
 		self.cCore.output_close(self.cCoreID)
 
+	## \internal
+	## Size of the file, to get what is written from now on with _Since.
+	def _Mark(self):
+		return self.Flush()
+
+	## \internal
+	## Bytes written in the file since _Mark returned mark.
+	def _Since(self, mark):
+		return _FileSince(self, mark)
+
+	## \internal
+	## Write again what _Since returned, for the run cache.
+	def _Replay(self, data):
+		if data:
+			self.cCore.output_write(self.cCoreID, data, len(data))
+
 		
 	def Update (self):
 
@@ -250,3 +328,577 @@ class output(Circuit):
 					self._file.write(str(i.value)+" ")
 				self._file.write('\n')
 
+
+## \brief In memory recorder circuit.
+#
+# Records the values of channels in memory, like the output circuit does in a
+# file, and gives them as a numpy structured array with one field per
+# registered tag, without going through the disk.
+# The records are kept in a buffer of the cCore that doubles when it is full,
+# or, with \a ring, in a buffer of fixed size where the oldest records are
+# replaced by the new ones. Only the first replica is recorded.
+#
+# \b Initialisation \b parameters:
+# 	- \a dump = #  rate at which records are taken, 0 to record only when \a record is positive
+# 	- \a capacity = number of records in the buffer at first, 1024 by default
+# 	- \a ring = True|False  keep only the last \a capacity records if True
+#
+# \b Input \b channels:
+# 	- \a record = if connected, the values will be recorded only when this input is positive
+#
+# \b Output channels:
+# This circuit has no output channel.
+#
+# 
+# \b Example:
+# \code
+# rec = machine.AddCircuit(type='recorder', name='rec', dump=10)
+# rec.Register('global.time', 'canti.ztip', 'pll.df')
+# machine.Wait(0.01)
+# data = rec.Data()
+# plt.plot(data['global.time'], data['pll.df'])
+# \endcode
+#
+class recorder(Circuit):
+    
+    
+	def __init__(self, machine, name, **keys):
+
+		super(self.__class__, self).__init__( machine, name )
+
+		if not('dump' in keys.keys()):
+			raise SyntaxError("Recorder circuit dump rate not specified!")
+
+		##\internal
+		## List of channels to record.
+		self.channels = []
+
+		##\internal
+		## Tags of the channels, the fields of the records.
+		self._tags = []
+
+		##\internal
+		## Dump rate.
+		self.dump = keys['dump']
+
+		## Records in the buffer at first, or always for a ring.
+		self.capacity = int(keys.get('capacity', 1024))
+		if self.capacity < 1:
+			raise ValueError("Recorder circuit capacity must be at least 1!")
+
+		## Keep only the last capacity records.
+		self.ring = bool(keys.get('ring', False))
+		self.datakey = repr((self.capacity, self.ring))
+
+		self.AddInput("record")
+
+		self.cCoreID = self.cCore.Add_recorder(self.machine.cCoreID, c_int(self.dump),
+			c_int(self.capacity), c_int(int(self.ring)))
+
+		self.SetInputs(**keys)
+
+	def Start(self):
+		self.cCore.output_start(self.cCoreID);
+	
+	def Stop(self):
+		self.cCore.output_stop(self.cCoreID);
+
+	## Register channels to record.
+	#
+	# The channels must be registered before the first record, or after Clear.
+	#
+	# Channels can give a reduction of their values since the previous record
+	# instead of their value, as in output.Register.
+	#
+	# @param *args Channel tags to record, or (tag, reducer) pairs.
+	# @param reduce Reducer of the tags given without one, 'last' by default.
+	#
+	# \b Example:
+	# \code{.py}
+	# rec = machine.AddCircuit(type='recorder', name='rec', dump=100)
+	# rec.Register('global.time','waver.sin','adder.out', ...)
+	# rec.Register(('pll.df', 'mean'), ('amp.amp', 'rms'))
+	# \endcode
+	#
+	def Register(self, *args, **keys):
+
+		if self._Info()[1] > 0:
+			raise RuntimeError("Recorder circuit "+self.name+" already has records, clear it before registering channels!")
+
+		for tag, reducer, ch in _Channels(self, args, keys):
+			self.cCore.output_register(self.cCoreID,ch.owner.cCoreID,ch.cCoreCHID, ch.cisInput, _reducers[reducer])
+
+	##\internal
+	## Number of records kept, records written, capacity and index of the oldest record.
+	def _Info(self):
+
+		info = (c_longlong*3)()
+		kept = self.cCore.recorder_info(self.cCoreID, info)
+		return kept, info[0], info[1], info[2]
+
+	## Records taken so far.
+	#
+	# The array is a view of the buffer in the cCore, without copies, unless
+	# the ring went around. It does not grow with further records: call Data
+	# again to get them. With a ring, further records overwrite the oldest ones
+	# in the view. It must not be used after Clear.
+	#
+	# @param copy If True, return a copy of the records.
+	# @return numpy structured array with one record per dump, and one field per
+	# registered tag.
+	#
+	def Data(self, copy=False):
+
+		kept, total, capacity, first = self._Info()
+		dtype = np.dtype([(n, '<f8') for n in _FieldNames(self._tags)])
+		if kept == 0 or len(self._tags) == 0:
+			return np.zeros(0, dtype=dtype)
+
+		ptr = self.cCore.recorder_data(self.cCoreID)
+		data = np.ctypeslib.as_array(ptr, shape=(capacity*len(self._tags),)).view(dtype)
+		if first > 0:
+			return np.concatenate((data[first:], data[:first]))
+
+		data = data[:kept]
+		if copy:
+			data = data.copy()
+		return data
+
+	## Remove all the records.
+	# Arrays returned by Data before this must not be used afterwards.
+	def Clear(self):
+
+		self.cCore.recorder_clear(self.cCoreID)
+
+	def Initialize (self):
+
+		pass
+
+	def Update (self):
+		pass
+
+	## \internal
+	## Number of records written, to get the new ones with _Since.
+	def _Mark(self):
+		return self._Info()[1]
+
+	## \internal
+	## Records taken since _Mark returned mark.
+	def _Since(self, mark):
+		total = self._Info()[1]
+		data = self.Data()
+		kept = min(total-mark, len(data))
+		return (total-mark, data[len(data)-kept:].tostring())
+
+	## \internal
+	## Append again what _Since returned, for the run cache.
+	def _Replay(self, entry):
+		if entry == None:
+			return
+		total, raw = entry
+		data = np.frombuffer(raw, dtype=np.float64)
+		self.cCore.recorder_append(self.cCoreID, data.ctypes.data_as(POINTER(c_double)),
+			c_longlong(len(data)//max(len(self._tags), 1)), c_longlong(total))
+
+
+## \brief Triggered capture circuit, like an oscilloscope.
+#
+# Keeps the last \a pre + \a post samples of the registered channels in a ring
+# buffer of fixed size, and when the \a trigger input crosses \a level, captures
+# an event: the \a pre samples before the trigger, the trigger sample and the
+# following \a post - 1 ones.
+# After an event, the trigger is ignored for \a holdoff steps, and the scope
+# stops after \a maxevents events, until it is armed again.
+# The events are kept in memory, in a buffer allocated once with room for
+# \a maxevents events, that Events gives as a numpy array, or written in a
+# binary file as in the output circuit, that ReadOutput reads. Samples taken before the ring was
+# first filled are NaN. Only the first replica is captured.
+#
+# Logic signals trigger with the default \a level 0.5, for example the \a oob
+# output of i3Dlin, to see the motion of the tip that led out of the force field.
+#
+# \b Initialisation \b parameters:
+# 	- \a pre = number of samples before the trigger
+# 	- \a post = number of samples from the trigger on, at least 1
+# 	- \a level = trigger level, 0.5 by default
+# 	- \a edge = 'rising' (default), 'falling' or 'both'
+# 	- \a holdoff = steps after an event when the trigger is ignored, 0 by default
+# 	- \a maxevents = maximum number of events, required without \a file, 0 (default) for no limit with a file
+# 	- \a file = name of a file to write the events in, instead of the memory
+# 	- \a format = 'npy' (default) or 'raw', format of the file
+# 	- \a dtype = 'float64' (default) or 'float32', type of the values in the file
+#
+# \b Input \b channels:
+# 	- \a trigger = signal compared to \a level
+#
+# \b Output \b channels:
+# 	- \a events = number of events captured
+#
+# 
+# \b Example:
+# \code
+# scope = machine.AddCircuit(type='scope', name='scope', pre=500, post=200, maxevents=10)
+# scope.Register('global.time', 'canti.ztip', 'inter.F3')
+# machine.Connect('inter.oob', 'scope.trigger')
+# machine.WaitUntil('scope.events', '>=', 1, timeout=1.0)
+# ev = scope.Events()
+# plt.plot(ev['global.time'][0], ev['canti.ztip'][0])
+# \endcode
+#
+class scope(Circuit):
+    
+    
+	def __init__(self, machine, name, **keys):
+
+		super(self.__class__, self).__init__( machine, name )
+
+		##\internal
+		## List of channels to capture.
+		self.channels = []
+
+		##\internal
+		## Tags of the channels, the fields of the samples.
+		self._tags = []
+
+		## Samples before the trigger.
+		self.pre = int(keys.get('pre', 0))
+		## Samples from the trigger on.
+		self.post = int(keys.get('post', 1))
+		if self.pre < 0 or self.post < 1:
+			raise ValueError("Scope circuit needs pre >= 0 and post >= 1!")
+
+		self.holdoff = int(keys.get('holdoff', 0))
+		self.maxevents = int(keys.get('maxevents', 0))
+		self.level = float(keys.get('level', 0.5))
+
+		## Name of the file of the events, None to keep them in memory.
+		self.filename = keys.get('file', None)
+		if self.filename == None and self.maxevents < 1:
+			raise ValueError("Scope circuit needs maxevents >= 1 to keep the events in memory!")
+
+		self.edge = keys.get('edge', 'rising')
+		if not (self.edge in _edges):
+			raise ValueError("Scope circuit edge must be one of "+str(sorted(_edges.keys()))+"!")
+
+		## Format of the file: 'npy' or 'raw'.
+		self.format = keys.get('format', 'npy')
+		if not (self.format in _formats[1:]):
+			raise ValueError("Scope circuit format must be one of "+str(_formats[1:])+"!")
+
+		## Type of the values in the file.
+		self.dtype = np.dtype(keys.get('dtype', 'float64')).newbyteorder('<')
+		if not (self.dtype.str in ['<f8', '<f4']):
+			raise ValueError("Scope circuit dtype must be float64 or float32!")
+		self.datakey = repr((self.pre, self.post, self.holdoff, self.maxevents, self.level,
+			self.edge, self.filename, self.format, self.dtype.str))
+
+		#timestep of the circuit, written in the header
+		self._dt = self.machine.dt
+
+		self.AddInput("trigger")
+		self.AddOutput("events")
+
+		self.cCoreID = self.cCore.Add_scope(self.machine.cCoreID, self.filename,
+			c_int(self.pre), c_int(self.post), c_int(self.holdoff), c_int(self.maxevents),
+			c_int(_edges[self.edge]), c_double(self.level))
+
+		self.SetInputs(**keys)
+
+		if self.filename != None:
+			self._Header()
+			#the event count of npy files is updated when they are flushed
+			atexit.register(self.Flush)
+
+	def Start(self):
+		self.cCore.output_start(self.cCoreID);
+	
+	def Stop(self):
+		self.cCore.output_stop(self.cCoreID);
+
+	## Arm the scope again after \a maxevents events.
+	# The event count restarts from 0, and the events captured are kept.
+	# The ring starts empty, so the next event has no samples from before.
+	# In memory, Clear the events before arming, or the buffer has no room for new ones.
+	def Arm(self):
+		if self.filename == None and self._Info()[0] >= self.maxevents:
+			print "WARNING! scope "+self.name+" is full, Clear it to capture new events."
+		self.cCore.scope_arm(self.cCoreID)
+
+	## Register channels to capture.
+	#
+	# The channels must be registered before the first event, or after Clear.
+	# Registering empties the ring buffer.
+	#
+	# @param *args Channel tags to capture.
+	#
+	# \b Example:
+	# \code{.py}
+	# scope = machine.AddCircuit(type='scope', name='scope', pre=100, post=100)
+	# scope.Register('global.time','canti.ztip', ...)
+	# \endcode
+	#
+	def Register(self, *args, **keys):
+
+		if self._Info()[1] > 0:
+			raise RuntimeError("Scope circuit "+self.name+" already has events, clear it before registering channels!")
+
+		for tag, reducer, ch in _Channels(self, args, keys):
+			if reducer != 'last':
+				raise ValueError("Scope circuit "+self.name+" captures the values of the channels, it has no reducers!")
+			self.cCore.scope_register(self.cCoreID,ch.owner.cCoreID,ch.cCoreCHID, ch.cisInput)
+
+		if self.filename != None:
+			self._Header()
+
+	##\internal
+	## Number of events kept, events captured, capacity and index of the oldest event.
+	def _Info(self):
+
+		if self.filename != None:
+			return 0, 0, 0, 0
+		info = (c_longlong*3)()
+		kept = self.cCore.recorder_info(self.cCoreID, info)
+		return kept, info[0], info[1], info[2]
+
+	## Events captured so far.
+	#
+	# The array is a view of the buffer in the cCore, without copies, and it
+	# does not grow with further events: call Events again to get them.
+	# It must not be used after Clear.
+	# With a file, the events are read from it with ReadOutput.
+	#
+	# @param copy If True, return a copy of the events.
+	# @return numpy structured array of shape (events, pre+post), with one
+	# field per registered tag. The trigger sample of each event is at index \a pre.
+	#
+	def Events(self, copy=False):
+
+		if self.filename != None:
+			self.Flush()
+			return ReadOutput(self.filename)
+
+		kept, total, capacity, first = self._Info()
+		length = self.pre + self.post
+		dtype = np.dtype([(n, '<f8') for n in _FieldNames(self._tags)])
+		if kept == 0 or len(self._tags) == 0:
+			return np.zeros((0, length), dtype=dtype)
+
+		ptr = self.cCore.recorder_data(self.cCoreID)
+		data = np.ctypeslib.as_array(ptr, shape=(capacity*length*len(self._tags),)).view(dtype)
+		data = data[:kept*length].reshape(kept, length)
+		if copy:
+			data = data.copy()
+		return data
+
+	## Remove the events kept in memory.
+	# Arrays returned by Events before this must not be used afterwards.
+	def Clear(self):
+
+		if self.filename == None:
+			self.cCore.recorder_clear(self.cCoreID)
+
+	## \internal
+	## Write the header of the file.
+	def _Header(self):
+
+		_BinaryHeader(self, 'dt=%r pre=%d post=%d' % (self._dt, self.pre, self.post), self.pre+self.post)
+
+	## Write the buffered events to the file.
+	# @return Size of the file in bytes, -1 if it was closed or there is no file.
+	def Flush(self):
+		return self.cCore.output_flush(self.cCoreID)
+
+	## Write the buffered events and close the file.
+	def CloseFile(self):
+		if self.filename != None:
+			self.cCore.output_close(self.cCoreID)
+
+	def Initialize (self):
+
+		pass
+
+	def Update (self):
+		pass
+
+	## \internal
+	## Events captured, or size of the file, to get the new ones with _Since.
+	def _Mark(self):
+		if self.filename != None:
+			return self.Flush()
+		return self._Info()[1]
+
+	## \internal
+	## Events captured since _Mark returned mark.
+	def _Since(self, mark):
+		if self.filename != None:
+			return _FileSince(self, mark)
+		total = self._Info()[1]
+		data = self.Events()
+		return (total-mark, data[len(data)-(total-mark):].tostring())
+
+	## \internal
+	## Store again what _Since returned, for the run cache.
+	def _Replay(self, entry):
+		if entry == None:
+			return
+		if self.filename != None:
+			if entry:
+				self.cCore.output_write(self.cCoreID, entry, len(entry))
+			return
+		total, raw = entry
+		data = np.frombuffer(raw, dtype=np.float64)
+		length = (self.pre + self.post)*max(len(self._tags), 1)
+		self.cCore.recorder_append(self.cCoreID, data.ctypes.data_as(POINTER(c_double)),
+			c_longlong(len(data)//length), c_longlong(total))
+
+
+## Edges of the trigger of the scope circuit, with their code in the cCore.
+_edges = {'rising': 1, 'falling': -1, 'both': 0}
+
+## Formats of the output circuit.
+_formats = ['text', 'npy', 'raw']
+
+## Read a file written by an output circuit.
+#
+# The binary formats are memory mapped, so large files are not loaded in memory,
+# and the number of records is taken from the size of the file.
+# Flush the output circuit before reading a file that is still being written.
+#
+# @param filename Name of the file.
+# @param info If True, also return a dictionary with the format, dt, dump,
+# names, dtype, number of records of the file and samples of each event for a scope.
+# @return numpy structured array with one field for each registered tag, or a
+# 2D array of values for the text format. The file of a scope gives one row
+# of pre+post records per event.
+#
+# \b Example:
+# \code{.py}
+# from vafmcircuits_output import ReadOutput
+# data = ReadOutput('log.npy')
+# plt.plot(data['global.time'], data['pll.df'])
+# \endcode
+#
+def ReadOutput(filename, info=False):
+
+	f = open(filename, 'rb')
+	start = f.read(10)
+
+	if start.startswith('\x93NUMPY'):
+		size = struct.unpack('<H', start[8:10])[0]
+		head = f.read(size)
+		offset = 10 + size
+		fields = ast.literal_eval(head)
+		dtype = np.dtype(fields['descr'])
+		samples = fields['shape'][1] if len(fields['shape']) > 1 else None
+		meta = head.split('#vafm', 1)[1].split() if '#vafm' in head else []
+		fmt = 'npy'
+	elif start.startswith('#vafm raw'):
+		head = start + f.readline()
+		offset = len(head)
+		meta = head.split()[2:]
+		fields = dict([m.split('=', 1) for m in meta])
+		dtype = np.dtype([(n, fields['type']) for n in fields['names'].split(',')])
+		samples = int(fields['samples']) if 'samples' in fields else None
+		fmt = 'raw'
+	else:
+		head, meta, fmt, samples = None, [], 'text', None
+	f.close()
+
+	if fmt == 'text':
+		data = np.loadtxt(filename, ndmin=2)
+		records = data.shape[0]
+	else:
+		#the events of a scope are records of samples records
+		shape = (samples,) if samples != None else ()
+		records = (os.path.getsize(filename) - offset) // (dtype.itemsize*max(samples, 1))
+		if records > 0:
+			data = np.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=(records,)+shape)
+		else:
+			data = np.zeros((0,)+shape, dtype=dtype)
+
+	if not info:
+		return data
+
+	fields = dict([m.split('=', 1) for m in meta])
+	details = {'format': fmt, 'records': records,
+		'dt': float(fields['dt']) if 'dt' in fields else None,
+		'dump': int(float(fields['dump'])) if 'dump' in fields else None,
+		'names': list(data.dtype.names) if fmt != 'text' else None,
+		'samples': samples,
+		'dtype': data.dtype[0].str if fmt != 'text' else data.dtype.str}
+	return data, details
+
+
+## Reducers of the registered channels, with their code in the cCore.
+_reducers = {'last': 0, 'mean': 1, 'min': 2, 'max': 3, 'rms': 4, 'count': 5}
+
+## \internal
+## Add the channels given to Register to the channels of circ.
+# @return List of (tag, reducer, channel).
+def _Channels(circ, args, keys):
+
+	default = keys.get('reduce', 'last')
+	items = []
+	for arg in args:
+		tag, reducer = (arg[0], arg[1]) if isinstance(arg, (tuple, list)) else (arg, default)
+		if not (reducer in _reducers):
+			raise ValueError("Unknown reducer "+str(reducer)+", use one of "+str(sorted(_reducers.keys()))+"!")
+		items.append((str(tag), str(reducer), circ.machine.GetChannel(tag)))
+
+	for tag, reducer, ch in items:
+		circ.channels.append(ch)
+		circ._tags.append(tag if reducer == 'last' else tag+':'+reducer)
+
+	return items
+
+## \internal
+## Names of the fields for the tags, made unique.
+def _FieldNames(tags):
+
+	names = []
+	for tag in tags:
+		name, k = tag, 1
+		while name in names:
+			k += 1
+			name = tag+'#'+str(k)
+		names.append(name)
+	return names
+
+## \internal
+## Write the header of the binary formats in the file of circ, an output or
+## a scope, with info in the comment. The records of a scope are events of
+## \a samples records.
+def _BinaryHeader(circ, info, samples=None):
+
+	names = _FieldNames(circ._tags)
+
+	if circ.format == 'npy':
+		count = ' '*20
+		descr = [(n, circ.dtype.str) for n in names]
+		shape = count+',' if samples == None else count+', '+str(samples)
+		head = "{'descr': %r, 'fortran_order': False, 'shape': (%s), } #vafm %s" % (descr, shape, info)
+		countpos = 10 + head.index('('+count) + 1
+		head += ' '*(63 - (10+len(head)) % 64) + '\n'
+		if len(head) > 65535:
+			raise ValueError("Circuit "+circ.name+" has too many channels for the npy format!")
+		head = '\x93NUMPY\x01\x00' + struct.pack('<H', len(head)) + head
+	else:
+		countpos = -1
+		if samples != None:
+			info += ' samples=%d' % samples
+		head = '#vafm raw %s type=%s names=%s' % (info, circ.dtype.str, ','.join(names))
+		head += ' '*(63 - len(head) % 64) + '\n'
+
+	if circ.cCore.output_format(circ.cCoreID, 1, circ.dtype.itemsize, head, len(head), countpos) != 0:
+		raise RuntimeError("Circuit "+circ.name+" already wrote some records, register the channels before running!")
+
+## \internal
+## Bytes written in the file of circ, an output or a scope, since its _Mark returned mark.
+def _FileSince(circ, mark):
+
+	end = circ.Flush()
+	f = open(circ.filename, 'rb')
+	f.seek(mark)
+	data = f.read(end-mark)
+	f.close()
+	return data
@@ -4,6 +4,7 @@ from vafmbase import Channel
 import ctypes as c
 
 import math
+import numpy
 
 ## \package vafmcircuits_pycirc.py
 # This file contains the controller circuits.
@@ -12,6 +13,7 @@ import math
 
 class PYCircuit(Circuit):
     
+	cacheable = False
     
 	def __init__(self, machine, name, **keys):
 		#print "PY: initing PYCircuit!"
@@ -25,7 +27,7 @@ class PYCircuit(Circuit):
 		CBFunc = c.CFUNCTYPE(None)
 		self.callback = CBFunc(self.Update)
 		
-		self.cCoreID = Circuit.cCore.Add_PYCircuit(self.machine.cCoreID, (c.py_object(self)),
+		self.cCoreID = self.cCore.Add_PYCircuit(self.machine.cCoreID, (c.py_object(self)),
 			self.callback, len(self.I),len(self.O))
 		
 		self.SetInputs(**keys)
@@ -53,3 +55,95 @@ class myCirc(PYCircuit):
 		
 		self.O["out"].value = self.I["in1"].value*self.I["in2"].value
 		
+		
+
+## \brief Python circuit working on blocks of samples.
+#
+# Calling python at every step is slow, so this circuit collects \a block
+# steps of its inputs in the cCore and calls UpdateBlock only once per block,
+# with numpy arrays holding the whole block of inputs and outputs.
+# The outputs computed from a block are given out during the next block,
+# so they are delayed by \a block steps: this is fine for analysis circuits
+# at the end of the chain, or inside feedback loops that are much slower
+# than the block.
+#
+# Custom circuits derive from this class, add their channels, call
+# Create with the block length and implement UpdateBlock.
+# With replicas, UpdateBlock is called with the blocks of each replica in turn.
+#
+# \b Example:
+# \code{.py}
+# class myBlockCirc(BlockPYCircuit):
+#	def __init__(self, machine, name, **keys):
+#		super(self.__class__, self).__init__( machine, name )
+#		self.AddInput("in1")
+#		self.AddInput("in2")
+#		self.AddOutput("out")
+#		self.Create(block=1000, **keys)
+#	def UpdateBlock(self, inputs, outputs):
+#		outputs[0] = inputs[0]*inputs[1]
+# \endcode
+#
+class BlockPYCircuit(Circuit):
+	
+	cacheable = False
+	
+	def __init__(self, machine, name, **keys):
+		
+		super(BlockPYCircuit, self).__init__( machine, name )
+	
+	## Create the circuit in the cCore, after the channels were added.
+	# @param block Number of steps in each block.
+	def Create(self, block=1000, **keys):
+		
+		## Number of steps in each block, which is also the delay of the outputs.
+		self.block = int(block)
+		if self.block < 1:
+			raise ValueError("The block length of "+self.name+" must be positive!")
+		
+		#the callback gets the input and output blocks
+		CBFunc = c.CFUNCTYPE(None, c.POINTER(c.c_double), c.POINTER(c.c_double))
+		self.callback = CBFunc(self._Block)
+		
+		self.cCoreID = self.cCore.Add_BlockPYCircuit(self.machine.cCoreID, self.callback,
+			len(self.I), len(self.O), self.block)
+		
+		self.SetInputs(**keys)
+	
+	## \internal
+	## Wraps the blocks of the cCore in numpy arrays and calls UpdateBlock.
+	def _Block(self, inblock, outblock):
+		
+		inputs = numpy.ctypeslib.as_array(inblock, shape=(max(len(self.I),1), self.block))
+		outputs = numpy.ctypeslib.as_array(outblock, shape=(max(len(self.O),1), self.block))
+		self.UpdateBlock(inputs[:len(self.I)], outputs[:len(self.O)])
+	
+	## Process one block.
+	#
+	# @param inputs numpy array with one row for each input channel, in the order
+	# they were added, holding their values during the last \a block steps.
+	# @param outputs numpy array with one row for each output channel, to be filled
+	# with the values to output during the next \a block steps.
+	def UpdateBlock(self, inputs, outputs):
+		pass
+	
+	def Initialize (self):
+		pass
+
+
+## Block version of myCirc: multiplies its two inputs, with a delay of \a block steps.
+class myBlockCirc(BlockPYCircuit):
+	
+	def __init__(self, machine, name, **keys):
+		
+		super(self.__class__, self).__init__( machine, name )
+		
+		self.AddInput("in1")
+		self.AddInput("in2")
+		self.AddOutput("out")
+		
+		self.Create(**keys)
+	
+	def UpdateBlock(self, inputs, outputs):
+		
+		outputs[0] = inputs[0]*inputs[1]
@@ -25,12 +25,12 @@ class RSA(Circuit):
 		self.AddOutput("theta")
 		self.AddOutput("x2")
 
-		Circuit.cCore.RSA_SetMasses.argtypes = [c_int, c_double, c_double, c_double]
-		Circuit.cCore.RSA_SetGammas.argtypes = [c_int, c_double, c_double, c_double]
-		Circuit.cCore.RSA_SetPoints.argtypes = [c_int, c_double, c_double, c_double]
-		Circuit.cCore.RSA_SetSprings.argtypes = [c_int, c_double, c_double, c_double]
+		self.cCore.RSA_SetMasses.argtypes = [c_int, c_double, c_double, c_double]
+		self.cCore.RSA_SetGammas.argtypes = [c_int, c_double, c_double, c_double]
+		self.cCore.RSA_SetPoints.argtypes = [c_int, c_double, c_double, c_double]
+		self.cCore.RSA_SetSprings.argtypes = [c_int, c_double, c_double, c_double]
 		
-		self.cCoreID = Circuit.cCore.Add_RSA(machine.cCoreID)
+		self.cCoreID = self.cCore.Add_RSA(machine.cCoreID)
 		
 		self.masses = [1,1,1]
 		if "masses" in keys.keys():
@@ -60,25 +60,25 @@ class RSA(Circuit):
 		pass
 
 	def _SetSprings(self):
-		Circuit.cCore.RSA_SetSprings(self.cCoreID, self.springs[0], self.springs[1], self.springs[2])
+		self.cCore.RSA_SetSprings(self.cCoreID, self.springs[0], self.springs[1], self.springs[2])
 	def SetSprings(self, k1,k1z,k2):
 		self.springs = [k1,k1z,k2]
 		self._SetSprings()
 	
 	def _SetPoints(self):
-		Circuit.cCore.RSA_SetPoints(self.cCoreID, self.points[0], self.points[1], self.points[2])
+		self.cCore.RSA_SetPoints(self.cCoreID, self.points[0], self.points[1], self.points[2])
 	def SetPoints(self,springx,springy,forcep):
 		self.points = [springx,springy,forcep]
 		self._SetPoints()
 		
 	def _SetGammas(self):
-		Circuit.cCore.RSA_SetGammas(self.cCoreID, self.gammas[0], self.gammas[1], self.gammas[2])
+		self.cCore.RSA_SetGammas(self.cCoreID, self.gammas[0], self.gammas[1], self.gammas[2])
 	def SetGammas(self,g1,g2,grot):
 		self.gammas = [g1,g2,grot]
 		self._SetGammas()
 	
 	def _SetMasses(self):
-		Circuit.cCore.RSA_SetMasses(self.cCoreID, self.masses[0], self.masses[1], self.masses[2])
+		self.cCore.RSA_SetMasses(self.cCoreID, self.masses[0], self.masses[1], self.masses[2])
 	def SetMasses(self,m1,m2,mi):
 		self.masses = [m1,m2,mi]
 		self._SetMasses()
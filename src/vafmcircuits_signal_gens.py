@@ -3,6 +3,7 @@ from vafmbase import Circuit
 from vafmbase import ChannelType
 from vafmbase import Channel
 import math
+from ctypes import c_double
 
 
 ## \package vafmcircuits_signal_gens
@@ -125,3 +126,57 @@ class square(Circuit):
 	def Update (self):
 		pass
 
+
+## \brief Gaussian white noise circuit.
+#
+# Adds gaussian white noise to the input signal, for example the thermal
+# force on a cantilever. The numbers come from the random stream of the
+# circuit, so runs with the same seed (see Machine.SetSeed) are reproducible.
+#
+# \b Initialisation \b parameters:
+# - \a pushed = True|False  push the output buffer immediately if True
+# - \a sigma = standard deviation of the noise added at each step
+# - \a density = one sided power spectral density of the noise, instead of sigma:
+# \f$\sigma = \sqrt{density/(2 dt)} \f$
+#
+# \b Input \b channels:
+# - \a signal = incoming signal
+#
+# \b Output \b channels:
+# - \a out = signal plus noise
+#
+# 
+# \b Example:
+# \code{.py}
+# machine.AddCircuit(type='noise', name='thermal', sigma=1e-12)
+# machine.AddCircuit(type='noise', name='thermal', density=4*kB*T*gamma)
+# \endcode
+#
+class noise(Circuit):
+    
+    
+	def __init__(self, machine, name, **keys):
+
+		super(self.__class__, self).__init__( machine, name )
+
+		if 'density' in keys.keys():
+			self.sigma = math.sqrt(float(keys['density'])/(2*self.machine.dt))
+		elif 'sigma' in keys.keys():
+			self.sigma = float(keys['sigma'])
+		else:
+			raise ValueError("ERROR: noise sigma or density not specified!")
+
+		self.AddInput("signal")
+
+		self.AddOutput("out")
+
+		self.cCoreID = self.machine.cCore.Add_noise(self.machine.cCoreID, c_double(self.sigma))
+
+		self.SetInputs(**keys)
+
+	def Initialize (self):
+
+		pass
+
+	def Update (self):
+		pass
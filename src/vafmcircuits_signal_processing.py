@@ -45,7 +45,7 @@ class gain(Circuit):
 		else:
 			raise NameError("Missing gain parameter!")
 
-		self.cCoreID = Circuit.cCore.Add_gain(self.machine.cCoreID, c_double(self.gain))
+		self.cCoreID = self.cCore.Add_gain(self.machine.cCoreID, c_double(self.gain))
 		
 		self.SetInputs(**keys)
 
@@ -109,7 +109,7 @@ class minmax(Circuit):
 		self.AddOutput("amp")
 		self.AddOutput("offset")
 
-		self.cCoreID = Circuit.cCore.Add_minmax(self.machine.cCoreID, c_double(self.checktime))
+		self.cCoreID = self.cCore.Add_minmax(self.machine.cCoreID, c_double(self.checktime))
 
 		self.SetInputs(**keys)
 
@@ -258,7 +258,7 @@ class delay(Circuit):
 
 		self.steps = int(self.delaytime/self.machine.dt)
 		
-		self.cCoreID = Circuit.cCore.Add_delay(machine.cCoreID, self.steps)
+		self.cCoreID = self.cCore.Add_delay(machine.cCoreID, self.steps)
 		
 		self.SetInputs(**keys)
 		
@@ -317,7 +317,7 @@ class peaker(Circuit):
 		self.AddOutput("tick")
 		self.AddOutput("delay")
 
-		self.cCoreID = Circuit.cCore.Add_peaker(machine.cCoreID, self.up)
+		self.cCoreID = self.cCore.Add_peaker(machine.cCoreID, self.up)
 		
 		self.SetInputs(**keys)
 
@@ -364,7 +364,7 @@ class phasor(Circuit):
 		self.counter= 0
 		self.check = False
 		
-		self.cCoreID = Circuit.cCore.Add_phasor(machine.cCoreID)
+		self.cCoreID = self.cCore.Add_phasor(machine.cCoreID)
 		
 		self.SetInputs(**keys)
 
@@ -414,7 +414,7 @@ class limiter(Circuit):
 		self.AddInput("min")
 		self.AddOutput("out")
 
-		self.cCoreID = Circuit.cCore.Add_limiter(machine.cCoreID)
+		self.cCoreID = self.cCore.Add_limiter(machine.cCoreID)
 
 		self.SetInputs(**keys)
 
@@ -457,7 +457,7 @@ class flip(Circuit):
 		self.AddOutput("tick")
 		self.yo= 0
 		
-		self.cCoreID = Circuit.cCore.Add_flip(machine.cCoreID)
+		self.cCoreID = self.cCore.Add_flip(machine.cCoreID)
 		
 		self.SetInputs(**keys)
 	
@@ -0,0 +1,245 @@
+import os
+import math
+import hashlib
+import subprocess
+import tempfile
+from ctypes import *
+
+## \package vafmnative
+# \brief Native code generation for compiled schedules.
+#
+# The compiled schedule of a setup (see Machine.Compile) is translated into a
+# C function that performs one step with the channel indexes written as
+# constants, and the arithmetic circuits, SKLP filters, PI controllers and
+# cantilevers written inline. The function is compiled with gcc into a small
+# shared library, which is cached on disk and reused when the same setup is
+# built again.
+#
+# Parameters of the inlined circuits that are fixed when they are built (the
+# coefficients of the filter, the damping and mass of the cantilever) are also
+# written as constants, unless they are different in the replicas. Their internal
+# state stays in the engine, and so do the channels, so they can still be read
+# and written from python as usual.
+#
+
+## Directory of the cached libraries, can be changed with the VAFM_CACHE
+# environment variable.
+CacheDir = os.environ.get('VAFM_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'vafm'))
+
+## Compiler command, the source and output files are appended.
+Compiler = ['gcc', '-O2', '-shared', '-fpic', '-std=gnu99', '-w']
+
+## Number of tasks written in each step function, larger setups are split
+# in several functions to keep gcc fast.
+ChunkSize = 250
+
+_task_none, _task_push, _task_relay, _task_relayout, _task_time, _task_capture = range(6)
+
+## \internal
+## C code of the circuits that are written inline, by name of their update
+# function in the cCore. Each one takes the lists of input and output channels,
+# and a function giving the C expression of each parameter. The operations are
+# the same of the cCore, in the same order, so the results are the same.
+_inline = {
+	'opADD': lambda i, o, p: "buf[%i] = %s;" % (o[0], ''.join(['(']*len(i)) + '0.0' +
+		''.join([' + sig[%i])' % k for k in i])),
+	'opSUB': lambda i, o, p: "buf[%i] = sig[%i] - sig[%i];" % (o[0], i[0], i[1]),
+	'opMUL': lambda i, o, p: "buf[%i] = %s;" % (o[0], ''.join(['(']*len(i)) + '1.0' +
+		''.join([' * sig[%i])' % k for k in i])),
+	'opDIV': lambda i, o, p: "buf[%i] = sig[%i] / sig[%i];" % (o[0], i[0], i[1]),
+	'opABS': lambda i, o, p: "buf[%i] = fabs(sig[%i]);" % (o[0], i[0]),
+	'opPOW': lambda i, o, p: "buf[%i] = pow(sig[%i], sig[%i]);" % (o[0], i[0], i[1]),
+	'opLINC': lambda i, o, p: "buf[%i] = %s;" % (o[0], ''.join(['(']*(len(i)/2)) + '0.0' +
+		''.join([' + sig[%i]*sig[%i])' % (i[k], i[k+1]) for k in range(0, len(i)-1, 2)])),
+	'opSIN': lambda i, o, p: "buf[%i] = sin(sig[%i]);" % (o[0], i[0]),
+	'opCOS': lambda i, o, p: "buf[%i] = cos(sig[%i]);" % (o[0], i[0]),
+	'SKLP': lambda i, o, p: ("{ double v = %s*%s*sig[%i] + (2.0*%s-%s) + %s*%s; v = v * %s; " +
+		"buf[%i] = v; %s = %s; %s = v; }") % (p(2), p(3), i[0], p(6), p(7), p(4), p(7), p(5),
+		o[0], p(7), p(6), p(6)),
+	'PIC': lambda i, o, p: ("{ double delta = buf[%i] - buf[%i], KI = sig[%i]; " +
+		"%s += 0.5*( %s + KI*delta )*e->timestep; buf[%i] = delta*sig[%i] + %s; %s = KI*delta; }") % (
+		i[1], i[0], i[3], p(0), p(1), o[0], i[2], p(0), p(1)),
+	'RunCantilever': lambda i, o, p: ("if (%s == 1) { double az = sig[%i] + sig[%i]; " +
+		"%s = az*%s - %s*%s*%s; %s /= e->timestep; %s = %s*(1.0-%s) + 0.5*%s; } " +
+		"%s += %s*e->timestep*(1.0-%s) + 0.5*%s*e->timestep; %s = %s*(1.0-%s) + 0.5*%s; %s = 1; " +
+		"buf[%i] = %s; buf[%i] = %s; buf[%i] = sig[%i] + %s + %s; sig[%i] = buf[%i];") % (
+		p(9), i[1], i[2],
+		p(4), p(1), p(2), p(6), p(6), p(4), p(3), p(3), p(0), p(4),
+		p(2), p(3), p(0), p(4), p(3), p(3), p(0), p(4), p(9),
+		o[0], p(2), o[2], p(3), o[1], i[0], p(5), p(2), o[1], o[1]),
+}
+
+## \internal
+## Parameters of the inlined circuits that do not change after they are built,
+# written in the code as constants.
+_constants = {
+	'SKLP': (2, 3, 4, 5),
+	'RunCantilever': (0, 1, 5, 6),
+}
+
+
+## \internal
+## Reads the compiled schedule of the current engine.
+# @return List of tasks (circuit index, type, indexes) and the push list.
+def _Schedule(engine):
+
+	sizes = (c_int*4)()
+	engine.ScheduleInfo(sizes)
+	ntasks, ndata, npush = sizes[0], sizes[1], sizes[2]
+
+	tasks = (c_int*(4*ntasks+1))()
+	data = (c_int*(ndata+1))()
+	push = (c_int*(npush+1))()
+	engine.GetSchedule(tasks, data, push)
+
+	schedule = []
+	for t in range(ntasks):
+		c, ttype, n, offset = tasks[4*t:4*t+4]
+		schedule.append((c, ttype, data[offset:offset+n]))
+
+	return schedule, push[:npush]
+
+
+## \internal
+## Function giving the C expression of parameter k of circuit c: a constant
+# if it is fixed and the same in all the replicas, or the engine value.
+def _Params(engine, c, name, replicas):
+
+	n = engine.CircuitParams(c, None)
+	values = []
+	for r in range(replicas):
+		p = (c_double*(n+1))()
+		engine.Replica(r).CircuitParams(c, p)
+		values.append(p[:n])
+
+	def param(k):
+		v = values[0][k]
+		if k in _constants.get(name, ()) and not (math.isinf(v) or math.isnan(v)) and \
+			all([vr[k] == v for vr in values]):
+			return "%.17g" % v
+		return "cs[%i].params[%i]" % (c, k)
+
+	return param
+
+
+## \internal
+## Writes the C source of the step function for the current engine.
+# @param replicas Number of replicas that will run it.
+def Source(engine, replicas=1):
+
+	schedule, push = _Schedule(engine)
+
+	#address of the inlined update functions
+	inline = {}
+	for name in _inline.keys():
+		inline[cast(getattr(engine.lib, name), c_void_p).value] = name
+
+	nio = (c_int*3)()
+	body = []
+	for c, ttype, idx in schedule:
+
+		code = []
+		if c >= 0:
+			engine.CircuitInfo.restype = c_void_p
+			f = engine.CircuitInfo(c, nio, None, None)
+			ins, outs = (c_int*(nio[0]+1))(), (c_int*(nio[1]+1))()
+			engine.CircuitInfo(c, nio, ins, outs)
+
+			if f in inline:
+				name = inline[f]
+				code.append(_inline[name](ins[:nio[0]], outs[:nio[1]], _Params(engine, c, name, replicas)))
+			else:
+				code.append("cs[%i].updatef(&cs[%i]);" % (c, c))
+
+			#circuits with a lower rate see a longer timestep
+			if nio[2] > 1:
+				code = ["if(e->step %% %i == 0) {" % nio[2], "\tdouble h = e->timestep;",
+					"\te->timestep = h*%i;" % nio[2], "\t"+code[0], "\te->timestep = h;", "}"]
+
+		if ttype == _task_push:
+			code += ["sig[%i] = buf[%i];" % (k, k) for k in idx]
+		elif ttype == _task_relay:
+			code += ["sig[%i] = buf[%i] = sig[%i];" % (idx[k+1], idx[k+1], idx[k]) for k in range(0, len(idx), 2)]
+		elif ttype == _task_relayout:
+			code += ["buf[%i] = sig[%i];" % (idx[k+1], idx[k]) for k in range(0, len(idx), 2)]
+		elif ttype == _task_time:
+			code += ["buf[%i] += e->timestep;" % idx[0], "sig[%i] += e->timestep;" % idx[0]]
+		elif ttype == _task_capture:
+			raise RuntimeError("vafmnative: the schedule runs a feed-forward region in blocks.")
+
+		body.append(code)
+
+	body.append(["sig[%i] = buf[%i];" % (k, k) for k in push])
+
+	src = ["#include <math.h>", '#include "circuit.h"', ""]
+	nchunks = (len(body)+ChunkSize-1)/ChunkSize
+	for n in range(nchunks):
+		src.append("static void NativeChunk%i(engine *e, double *sig, double *buf, circuit *cs) {" % n)
+		for code in body[n*ChunkSize:(n+1)*ChunkSize]:
+			src += ["\t"+line for line in code]
+		src += ["}", ""]
+
+	src.append("void NativeStep(engine *e) {")
+	src.append("\tdouble *sig = e->signals, *buf = e->buffers;")
+	src.append("\tcircuit *cs = e->circuitlist;")
+	src += ["\tNativeChunk%i(e, sig, buf, cs);" % n for n in range(nchunks)]
+	src += ["\te->step++;", "}", ""]
+
+	return "\n".join(src)
+
+
+## \internal
+## Returns the path of the library for the given source, compiling it
+# if it is not in the cache yet.
+def Library(source):
+
+	incdir = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'cCore')
+	header = os.path.join(incdir, 'circuit.h')
+	if not os.path.exists(header):
+		raise IOError("vafmnative: cannot find the cCore header "+header)
+
+	key = hashlib.sha1(source)
+	key.update(open(header).read())
+	key.update(' '.join(Compiler))
+	path = os.path.join(CacheDir, 'step_'+key.hexdigest()+'.so')
+	if os.path.exists(path):
+		return path
+
+	if not os.path.isdir(CacheDir):
+		os.makedirs(CacheDir)
+
+	#build in a temporary file, then move it in place
+	fd, csrc = tempfile.mkstemp(suffix='.c', dir=CacheDir)
+	os.write(fd, source)
+	os.close(fd)
+	fd, tmp = tempfile.mkstemp(suffix='.so', dir=CacheDir)
+	os.close(fd)
+
+	try:
+		cmd = Compiler + ['-I'+incdir, csrc, '-o', tmp, '-lm']
+		proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+		out = proc.communicate()[0]
+		if proc.returncode != 0:
+			raise RuntimeError("vafmnative: compilation failed:\n"+out)
+		os.rename(tmp, path)
+	finally:
+		os.remove(csrc)
+		if os.path.exists(tmp):
+			os.remove(tmp)
+
+	return path
+
+
+## Generate, build and load the step function for the setup of the main
+# machine, and make its engine use it. The schedule must be compiled.
+# @return The loaded library, which must be kept alive while it is used.
+def Build(machine):
+
+	engine = machine.cCore
+	path = Library(Source(engine, machine.replicas))
+	print "PY: native step function in "+path
+
+	lib = cdll.LoadLibrary(path)
+	engine.SetNative(cast(lib.NativeStep, c_void_p))
+
+	return lib
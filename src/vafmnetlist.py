@@ -0,0 +1,277 @@
+import os
+import json
+import hashlib
+import importlib
+import numpy
+
+import vafmnative
+import vafmcircuits
+from vafmcircuits import Machine
+
+## \package vafmnetlist
+# \brief Setups described by netlist files.
+#
+# A netlist is a JSON (or YAML, if PyYAML is installed) file describing the main
+# machine, its circuits with their parameters, composite circuits and connections.
+# It is loaded with Load, which builds the setup and returns the main machine.
+#
+# The connections are resolved to cCore indexes the first time a netlist is
+# loaded, and the result is cached on disk by the hash of the netlist, in the
+# same directory used by vafmnative. Later loads of the same netlist skip the
+# lookup of all the channel tags and make all the connections in one cCore call.
+# The cache is used only if the circuits built, with their names, types and
+# channels, are the same, since assemblies of composites may have changed.
+# Netlists can also be given as python dictionaries, so they can be sent to
+# other processes and built there.
+#
+# \b Example:
+# \code{.json}
+# {
+#  "machine": {"name": "machine", "dt": 1e-8, "pushed": true},
+#  "modules": ["customs"],
+#  "circuits": [
+#   {"type": "waver", "name": "wave", "freq": 1.0e5, "amp": 1, "pushed": true},
+#   {"type": "Machine", "name": "pll", "assembly": "customs.aPLL", "filters": [1000, 500],
+#    "gain": 600.0, "f0": 1.0e5, "Kp": 0.4, "Ki": 500, "pushed": true},
+#   {"type": "Machine", "name": "amp", "inputs": ["x"], "outputs": ["y"],
+#    "circuits": [{"type": "gain", "name": "g", "gain": 2}],
+#    "connections": [["global.x", "g.signal"], ["g.out", "global.y"]]},
+#   {"type": "output", "name": "log", "file": "pll.dat", "dump": 100,
+#    "register": ["global.time", "pll.df", "amp.y"]}
+#  ],
+#  "connections": [["wave.sin", "pll.signal1", "amp.x"], ["pll.sin", "pll.signal2"]]
+# }
+# \endcode
+#
+# Besides its type, name and initialisation parameters, each circuit can have:
+# 	- \a register = list of channel tags, or [tag, reducer] pairs, to register, for output, recorder and scope circuits
+# 	- \a configure = dictionary of arguments for the Configure method of the circuit
+# 	- \a data = file name, or list of arguments, for the ReadData method of the circuit, called after Configure
+# 	- \a inputs, \a outputs, \a circuits, \a connections = channels and content of a composite Machine
+#
+# Parameters given as {"replicas": [...]} become numpy arrays, with one value per replica,
+# and \a assembly functions are given as "module.function".
+#
+# \code{.py}
+# import vafmnetlist
+# machine = vafmnetlist.Load('fmafm.json')
+# machine.Wait(0.01)
+# \endcode
+#
+
+## Version of the cached data, changed when its format changes.
+CacheVersion = 2
+
+_toplevel = ['machine', 'modules', 'circuits', 'connections']
+_structure = ['type', 'name', 'inputs', 'outputs', 'circuits', 'connections', 'register', 'configure', 'data']
+
+
+## Read a netlist file.
+# @param path Name of the file, YAML if it ends with .yaml or .yml, JSON otherwise.
+# @return Dictionary with the netlist.
+def Read(path):
+
+	f = open(path, 'r')
+	text = f.read()
+	f.close()
+
+	if path.endswith('.yaml') or path.endswith('.yml'):
+		try:
+			import yaml
+		except ImportError:
+			raise ImportError("vafmnetlist: PyYAML is needed to read "+path)
+		return yaml.safe_load(text)
+
+	return json.loads(text)
+
+
+## Check the structure of a netlist.
+#
+# Circuit types, names and connection tags are checked, while the existence
+# of the channels is checked when the netlist is built.
+# Raises ValueError if something is wrong.
+# @param net Dictionary with the netlist.
+def Validate(net):
+
+	if not isinstance(net, dict):
+		raise ValueError("netlist: the netlist must be a dictionary.")
+	for key in net.keys():
+		if not (key in _toplevel):
+			raise ValueError("netlist: unknown section '"+key+"'.")
+	if not isinstance(net.get('machine', {}), dict):
+		raise ValueError("netlist: 'machine' must be a dictionary of parameters.")
+
+	for module in net.get('modules', []):
+		importlib.import_module(module)
+
+	_ValidateLevel(net, 'machine')
+
+
+## \internal
+## Check circuits and connections of one machine.
+def _ValidateLevel(level, where):
+
+	names = []
+	for entry in level.get('circuits', []):
+
+		if not isinstance(entry, dict) or not ('type' in entry) or not ('name' in entry):
+			raise ValueError("netlist: each circuit in "+where+" needs a type and a name.")
+		name = entry['name']
+		if name in names:
+			raise ValueError("netlist: circuit "+name+" appears twice in "+where+".")
+		names.append(name)
+
+		if vafmcircuits._CircuitClass(entry['type']) == None:
+			raise ValueError("netlist: unknown circuit type "+entry['type']+" for "+name+".")
+		if not isinstance(entry.get('register', []), list):
+			raise ValueError("netlist: 'register' of "+name+" must be a list of tags.")
+		if not isinstance(entry.get('configure', {}), dict):
+			raise ValueError("netlist: 'configure' of "+name+" must be a dictionary.")
+		if 'data' in entry and not hasattr(vafmcircuits._CircuitClass(entry['type']), 'ReadData'):
+			raise ValueError("netlist: circuit "+name+" cannot read data.")
+
+		if entry['type'] == 'Machine':
+			_ValidateLevel(entry, where+"."+name)
+		elif 'circuits' in entry or 'connections' in entry:
+			raise ValueError("netlist: only Machine circuits can contain circuits, in "+name+".")
+
+	for conn in level.get('connections', []):
+		if not isinstance(conn, list) or len(conn) < 2:
+			raise ValueError("netlist: connections in "+where+" must be lists of two or more tags.")
+		for tag in conn:
+			if len(tag.split('.')) != 2:
+				raise ValueError("netlist: invalid channel tag "+str(tag)+" in "+where+".")
+
+
+## \internal
+## Convert the unicode strings given by the json parser, since the cCore
+# needs byte strings.
+def _Str(obj):
+
+	if isinstance(obj, unicode):
+		return str(obj)
+	if isinstance(obj, list):
+		return [_Str(x) for x in obj]
+	if isinstance(obj, dict):
+		return dict([(_Str(k), _Str(v)) for k, v in obj.items()])
+	return obj
+
+
+## \internal
+## Initialisation parameters of a circuit entry.
+def _Keys(entry):
+
+	keys = {}
+	for k in entry.keys():
+		if k in _structure:
+			continue
+		v = entry[k]
+		if isinstance(v, dict) and v.keys() == ['replicas']:
+			v = numpy.array(v['replicas'])
+		if k == 'assembly' and isinstance(v, basestring):
+			module, func = v.rsplit('.', 1)
+			v = getattr(importlib.import_module(module), func)
+		keys[k] = v
+	return keys
+
+
+## \internal
+## Add the circuits of one level to machine. Circuits to register,
+# configure or fill with data are put in post.
+def _Build(machine, level, post):
+
+	for entry in level.get('circuits', []):
+
+		circ = machine.AddCircuit(type=entry['type'], name=entry['name'], **_Keys(entry))
+
+		if entry['type'] == 'Machine':
+			for ch in entry.get('inputs', []):
+				circ.AddInput(ch)
+			for ch in entry.get('outputs', []):
+				circ.AddOutput(ch)
+			_Build(circ, entry, post)
+
+		if 'register' in entry or 'configure' in entry or 'data' in entry:
+			post.append((circ, entry))
+
+
+## \internal
+## Cache file of a netlist.
+def _CachePath(net):
+
+	key = hashlib.sha1(json.dumps(net, sort_keys=True))
+	key.update(str(CacheVersion))
+	return os.path.join(vafmnative.CacheDir, 'netlist_'+key.hexdigest()+'.json')
+
+
+## Build the setup described by a netlist.
+#
+# @param netlist Name of the netlist file, or dictionary with the netlist.
+# @param cache If True, use and update the cache of resolved connections.
+# @return The main machine.
+def Load(netlist, cache=True):
+
+	if isinstance(netlist, basestring):
+		netlist = Read(netlist)
+	netlist = _Str(netlist)
+	Validate(netlist)
+
+	path = _CachePath(netlist)
+	cached = None
+	if cache and os.path.exists(path):
+		f = open(path, 'r')
+		cached = json.load(f)
+		f.close()
+
+	machine = Machine(**netlist.get('machine', {}))
+
+	post = []
+	_Build(machine, netlist, post)
+
+	#the cache is good only if it describes the same circuits, which
+	# can change with the code of the assemblies even if the netlist does not
+	circuits = _Circuits(machine)
+	if cached != None and cached['circuits'] == circuits:
+		links = cached['links']
+	else:
+		cached = None
+		links = []
+		_Resolve(machine, netlist, links)
+	machine._ConnectMany(links)
+
+	for circ, entry in post:
+		if 'configure' in entry:
+			circ.Configure(**entry['configure'])
+		if 'data' in entry:
+			data = entry['data']
+			circ.ReadData(*(data if isinstance(data, list) else [data]))
+		if 'register' in entry:
+			circ.Register(*entry['register'])
+
+	if cache and cached == None:
+		if not os.path.isdir(vafmnative.CacheDir):
+			os.makedirs(vafmnative.CacheDir)
+		f = open(path, 'w')
+		json.dump({'circuits': circuits, 'links': links}, f)
+		f.close()
+
+	return machine
+
+
+## \internal
+## Name, type and number of input and output channels of all the circuits of a setup.
+def _Circuits(machine):
+
+	return [[name, type(circ).__name__, len(circ.I), len(circ.O)] for name, circ in machine._AllCircuits()]
+
+
+## \internal
+## Resolve the connections of a setup that was already built.
+def _Resolve(machine, level, links):
+
+	for entry in level.get('circuits', []):
+		if entry['type'] == 'Machine':
+			_Resolve(machine.circuits[entry['name']], entry, links)
+
+	for conn in level.get('connections', []):
+		links += [l[0] for l in machine._ResolveConnect(*conn)]
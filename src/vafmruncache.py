@@ -0,0 +1,110 @@
+import os
+import cPickle
+import tempfile
+
+import vafmnative
+
+## \package vafmruncache
+# \brief Cache of completed runs.
+#
+# The cache maps the key of a run, which is the hash of everything that
+# determines its result (see Machine.EnableCache), to the final state of the
+# setup and to what the output circuits wrote during the run.
+# Each run is stored in its own file, and when the files take more than
+# \a maxbytes the least recently used ones are removed.
+#
+
+## Cache of completed runs in a directory.
+class RunCache(object):
+
+	## @param directory Directory of the cache, by default 'runs' in the vafmnative cache directory.
+	# @param maxbytes Maximum size of the cache in bytes.
+	def __init__(self, directory=None, maxbytes=1<<30):
+
+		if directory == None:
+			directory = os.path.join(vafmnative.CacheDir, 'runs')
+
+		## Directory of the cache.
+		self.directory = directory
+
+		## Maximum size of the cache in bytes.
+		self.maxbytes = maxbytes
+
+		self.hits = 0
+		self.misses = 0
+		self.skipped = 0
+
+		if not os.path.isdir(self.directory):
+			os.makedirs(self.directory)
+
+	def _Path(self, key):
+		return os.path.join(self.directory, 'run_'+key+'.pkl')
+
+	## Get the run with the given key.
+	# @return Dictionary stored by Put, or None if it is not in the cache.
+	def Get(self, key):
+
+		path = self._Path(key)
+		try:
+			f = open(path, 'rb')
+			entry = cPickle.load(f)
+			f.close()
+		except (IOError, EOFError, cPickle.UnpicklingError):
+			self.misses += 1
+			return None
+
+		#the modification time is the last use
+		os.utime(path, None)
+		self.hits += 1
+		return entry
+
+	## Store a run, then remove old runs if the cache is too big.
+	def Put(self, key, entry):
+
+		fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+		f = os.fdopen(fd, 'wb')
+		cPickle.dump(entry, f, 2)
+		f.close()
+		os.rename(tmp, self._Path(key))
+
+		self.Evict()
+
+	## \internal
+	## Files of the cache, from the least recently used.
+	def _Files(self):
+
+		files = []
+		for name in os.listdir(self.directory):
+			if name.startswith('run_') and name.endswith('.pkl'):
+				path = os.path.join(self.directory, name)
+				st = os.stat(path)
+				files.append((st.st_mtime, st.st_size, path))
+		files.sort()
+		return files
+
+	## Remove the least recently used runs until the cache fits in maxbytes.
+	def Evict(self):
+
+		files = self._Files()
+		total = sum([f[1] for f in files])
+		for mtime, size, path in files:
+			if total <= self.maxbytes:
+				break
+			os.remove(path)
+			total -= size
+
+	## Remove all the runs.
+	def Clear(self):
+
+		for mtime, size, path in self._Files():
+			os.remove(path)
+
+	## Statistics of the cache.
+	# @return Dictionary with hits, misses, runs that could not be cached,
+	# number of stored runs, their size in bytes, maxbytes and directory.
+	def Info(self):
+
+		files = self._Files()
+		return {'hits': self.hits, 'misses': self.misses, 'skipped': self.skipped,
+			'runs': len(files), 'bytes': sum([f[1] for f in files]),
+			'maxbytes': self.maxbytes, 'directory': self.directory}
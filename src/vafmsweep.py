@@ -0,0 +1,234 @@
+import os
+import sys
+import copy
+import itertools
+import multiprocessing
+from collections import OrderedDict
+import numpy
+
+import vafmnetlist
+
+## \package vafmsweep
+# \brief Parameter sweeps over a pool of processes.
+#
+# Sweep builds the same setup for each point of a grid of parameters, runs it
+# for a given time or until some conditions are met, and collects the value of
+# some channels at the end, in a numpy structured array.
+# The points are run in parallel by a multiprocessing pool. On Linux the workers
+# are forked, so force fields and other data loaded by the script before calling
+# Sweep are shared with them without copies, as long as they are only read.
+# Force fields of i3Dlin circuits are read only once in each process, so a field
+# read before calling Sweep, or in the \a initializer, is not read again at each point.
+# The setup of each point is closed when the point is done.
+# With \a output, the partial results are saved after each point, and a sweep that
+# was interrupted continues from where it stopped when it is run again.
+#
+# \b Example:
+# \code{.py}
+# import vafmsweep
+# grid = {'canti.Q': [1e3, 1e4, 1e5], 'agc.set': numpy.linspace(0.5, 2, 8)}
+# res = vafmsweep.Sweep('fmafm.json', grid, measure=['pll.df', 'agc.out'],
+#	wait=0.02, workers=4, output='sweep.npz')
+# print res['canti.Q'], res['pll.df']
+# \endcode
+#
+
+
+## Run a parameter sweep.
+#
+# @param setup Netlist (file name or dictionary, see vafmnetlist) or builder function.
+# With a netlist, the parameters are named 'circuit.parameter', with the path of
+# composite circuits as in 'pll.pump.Kp', and they replace the initialisation
+# parameters of the circuits; names without a dot are parameters of the main machine.
+# A builder is called with a dictionary of the parameters of the point, and it
+# returns the main machine. It must be a module level function, so that the
+# workers can find it.
+# @param grid Dictionary with the list of values of each parameter, for a sweep over
+# all their combinations, or list of dictionaries with the parameters of each point.
+# @param measure List of tags of the channels to read at the end of each point.
+# @param wait Time to run each point for, or the timeout when \a until is given.
+# @param until List of conditions (channel, op, threshold[, hold_steps]) as in
+# Machine.WaitUntilAll, to stop each point when they are met.
+# @param workers Number of processes, by default the number of cpus.
+# With 1, the points are run in this process.
+# @param output Name of a .npz file where the results are saved after each point.
+# @param initializer Function called once in each worker when it starts, for
+# example to load data used by the builder.
+# @return numpy structured array with one record for each point, with the
+# parameters, the measured channels (averaged over the replicas, if any) and
+# the number of steps done.
+# Records of the saved file are in the same order, and its 'done' array tells which
+# points were completed.
+#
+def Sweep(setup, grid, measure, wait=None, until=None, workers=None, output=None, initializer=None):
+
+	if wait == None and until == None:
+		raise ValueError("Sweep: give the time to wait or the conditions to wait for.")
+
+	points = _Points(grid)
+	names = []
+	for p in points:
+		names += [k for k in p.keys() if not (k in names)]
+
+	if isinstance(setup, basestring):
+		setup = vafmnetlist._Str(vafmnetlist.Read(setup))
+
+	results, done = _Results(points, names, measure, output)
+
+	task = (setup, measure, wait, until)
+	todo = [(i, points[i]) for i in xrange(len(points)) if not done[i]]
+	print "PY: sweep of "+str(len(points))+" points, "+str(len(todo))+" to run"
+
+	if workers == None:
+		workers = multiprocessing.cpu_count()
+
+	if workers == 1:
+		if initializer != None:
+			initializer()
+		outcome = itertools.imap(_RunPoint, [(task, i, p) for i, p in todo])
+		pool = None
+	else:
+		pool = multiprocessing.Pool(workers, initializer, maxtasksperchild=100)
+		outcome = pool.imap_unordered(_RunPoint, [(task, i, p) for i, p in todo])
+
+	try:
+		for i, values, steps in outcome:
+
+			for k in xrange(len(measure)):
+				results[measure[k]][i] = values[k]
+			results['steps'][i] = steps
+			done[i] = True
+
+			if output != None:
+				_Save(output, results, done)
+	finally:
+		if pool != None:
+			pool.terminate()
+
+	return results
+
+
+## \internal
+## List of points of the grid.
+def _Points(grid):
+
+	if isinstance(grid, dict):
+		keys = sorted(grid.keys())
+		return [OrderedDict(zip(keys, values)) for values in itertools.product(*[grid[k] for k in keys])]
+
+	return [OrderedDict(sorted(p.items())) for p in grid]
+
+
+## \internal
+## Empty results, or the ones saved in output if they belong to the same sweep.
+def _Results(points, names, measure, output):
+
+	fields = [(n, numpy.float64) for n in names]
+	fields += [(m, numpy.float64) for m in measure if not (m in names)]
+	fields += [('steps', numpy.int64)]
+
+	results = numpy.zeros(len(points), dtype=fields)
+	for m in measure:
+		results[m] = numpy.nan
+	for i in xrange(len(points)):
+		for n in points[i].keys():
+			results[n][i] = points[i][n]
+	done = numpy.zeros(len(points), dtype=bool)
+
+	if output != None and os.path.exists(output):
+		saved = numpy.load(output)
+		old = saved['results']
+		if old.dtype == results.dtype and len(old) == len(results) and \
+			all([numpy.array_equal(old[n], results[n]) for n in names]):
+			results, done = old.copy(), saved['done'].copy()
+			print "PY: resuming the sweep saved in "+output
+		else:
+			print "WARNING! "+output+" contains a different sweep, starting again."
+		saved.close()
+
+	return results, done
+
+
+## \internal
+## Save the partial results, replacing the file only when it is complete.
+def _Save(output, results, done):
+
+	tmp = output+'.tmp.npz'
+	numpy.savez(tmp, results=results, done=done)
+	os.rename(tmp, output)
+
+
+## \internal
+## Netlist with the parameters of a point.
+def _Apply(net, point):
+
+	net = copy.deepcopy(net)
+
+	for name, value in point.items():
+
+		path = name.split('.')
+		if len(path) == 1:
+			net.setdefault('machine', {})[name] = value
+			continue
+
+		level = net
+		for cname in path[:-1]:
+			entries = [e for e in level.get('circuits', []) if e.get('name') == cname]
+			if len(entries) == 0:
+				raise NameError("Sweep: circuit "+cname+" of parameter "+name+" is not in the netlist.")
+			level = entries[0]
+		level[path[-1]] = value
+
+	return net
+
+
+## \internal
+## Build and run one point, in a worker.
+# @return Index of the point, measured values and number of steps.
+def _RunPoint(args):
+
+	(setup, measure, wait, until), index, point = args
+
+	#values from numpy arrays are given as python numbers
+	point = OrderedDict([(k, getattr(v, 'item', lambda: v)()) for k, v in point.items()])
+
+	#the workers print nothing, or the output of the cCore would be mixed up
+	saved = _Silence()
+	machine = None
+	try:
+		if callable(setup):
+			machine = setup(point)
+		else:
+			machine = vafmnetlist.Load(_Apply(setup, point), cache=False)
+
+		if until != None:
+			steps, reason = machine.WaitUntilAll(until, wait)
+		else:
+			steps = int(wait/machine.dt)
+			machine.WaitSteps(steps)
+
+		values = [float(numpy.mean(v)) for v in machine.GetValues(measure).T] if len(measure) > 0 else []
+	finally:
+		if machine != None:
+			machine.Close()
+		_Restore(saved)
+
+	return index, values, steps
+
+
+## \internal
+## Redirect the stdout of python and cCore to /dev/null.
+def _Silence():
+
+	sys.stdout.flush()
+	saved = os.dup(1)
+	null = os.open(os.devnull, os.O_WRONLY)
+	os.dup2(null, 1)
+	os.close(null)
+	return saved
+
+def _Restore(saved):
+
+	sys.stdout.flush()
+	os.dup2(saved, 1)
+	os.close(saved)